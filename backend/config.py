@@ -2,6 +2,7 @@
 Application Configuration
 """
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -35,19 +36,99 @@ class Settings(BaseSettings):
     DEFAULT_TEMPERATURE: float = 0.3
     DEFAULT_MAX_TOKENS: int = 2048
     
-    # Embedding Configuration
+    # LLM Client Pooling
+    LLM_CLIENT_CACHE_SIZE: int = 32
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 60.0
+    LLM_TIMEOUT: float = 60.0
+    CHAIN_CACHE_SIZE: int = 256
+    
+    # Embedding Configuration (backends: torch, onnx, onnx_int8)
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DEVICE: str = "cpu"
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_THREADS: int = 0
+    EMBEDDING_ONNX_QUANTIZATION: str = "avx2"
+    EMBEDDING_ONNX_DIR: str = "data/onnx"
+    EMBEDDING_WARMUP: bool = True
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
     
     # Document Processing
     CHUNK_SIZE: int = 4000
     CHUNK_OVERLAP: int = 500
     
+    # Embedding Cache (shared across sessions)
+    EMBEDDING_CACHE_MAX_CHUNKS: int = 50000
+    
+    # Upload Limits (enforced before and while buffering uploads)
+    PDF_MAX_FILE_MB: int = 200
+    PDF_MAX_REQUEST_MB: int = 500
+    PDF_INTAKE_CHUNK_BYTES: int = 1024 * 1024
+    
+    # PDF Parsing (process pool; pages per task bounds how large PDFs are sharded)
+    PARSE_MAX_WORKERS: int = 4
+    PARSE_PAGES_PER_TASK: int = 100
+    
+    # Ingestion Concurrency (threads for parsing, embedding and indexing)
+    INGEST_MAX_WORKERS: int = 2
+    INGEST_EMBED_BATCH_SIZE: int = 64
+    INGEST_MAX_CONCURRENT_JOBS: int = 1
+    INGEST_JOB_HISTORY: int = 1000
+    
+    # Session Persistence (state backend: "local" or "package.module:Class")
+    SESSION_PERSISTENCE_ENABLED: bool = True
+    SESSION_STORE_DIR: str = "data/sessions"
+    SESSION_INDEX_MMAP: bool = True
+    SESSION_STATE_BACKEND: str = "local"
+    
+    # Session Lifecycle (LRU eviction under a global memory budget)
+    SESSION_MEMORY_BUDGET_MB: int = 2048
+    SESSION_IDLE_TTL_SECONDS: int = 3600
+    SESSION_OFFLOAD_ON_EVICT: bool = True
+    
+    # Vector Index (types: flat, hnsw, ivf_flat, ivf_pq; storage: float32, fp16, sq8, pq)
+    INDEX_TYPE: str = "flat"
+    INDEX_UPGRADE_TYPE: str = "hnsw"
+    INDEX_UPGRADE_THRESHOLD: int = 50000
+    INDEX_HNSW_M: int = 32
+    INDEX_HNSW_EF_CONSTRUCTION: int = 80
+    INDEX_HNSW_EF_SEARCH: int = 64
+    INDEX_NPROBE: int = 16
+    INDEX_PQ_M: int = 48
+    INDEX_STORAGE: str = "float32"
+    INDEX_RERANK_OVERSAMPLE: int = 2
+    
     # Search Configuration
     DEFAULT_SEARCH_K: int = 4
     FETCH_K_MULTIPLIER: int = 3
+    FETCH_K_MAX: int = 500
     MMR_LAMBDA: float = 0.5
     
+    # Hybrid Retrieval (BM25 + dense)
+    HYBRID_ALPHA: float = 0.5
+    HYBRID_PREFILTER_K: int = 200
+    
+    # Context Assembly (retrieved chunks merged and trimmed before the answer prompt)
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    CONTEXT_MIN_TOKENS_PER_PAGE: int = 150
+    
+    # Chat History (recent turns verbatim, older turns summarized in the background)
+    HISTORY_MAX_TURNS: int = 6
+    HISTORY_TOKEN_BUDGET: int = 2000
+    HISTORY_SUMMARY_ENABLED: bool = True
+    HISTORY_SUMMARY_MAX_TOKENS: int = 400
+    
+    # Question Rewrite (history-aware contextualization)
+    REWRITE_CACHE_SIZE: int = 2048
+    REWRITE_HISTORY_WINDOW: int = 6
+    
+    # Semantic Answer Cache (keyed by document set and question similarity)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 5000
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    
     # CORS Configuration
     CORS_ORIGINS: list = ["*"]
     CORS_CREDENTIALS: bool = True
@@ -60,6 +141,23 @@ class Settings(BaseSettings):
     WIKI_MAX_RESULTS: int = 3
     WIKI_MAX_CHARS: int = 500
     
+    # Fast Search Mode (parallel tool fan-out)
+    SEARCH_TOOL_TIMEOUT: float = 8.0
+    SEARCH_RESULT_MAX_CHARS: int = 4000
+    
+    # Metrics (set METRICS_SHARED_DIR to merge the metrics of several API workers)
+    METRICS_SHARED_DIR: Optional[str] = None
+    METRICS_FLUSH_SECONDS: float = 5.0
+    
+    # Search Tool Result Cache (set SEARCH_CACHE_DB_PATH empty for memory only)
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_MAX_ENTRIES: int = 2048
+    SEARCH_CACHE_DB_PATH: Optional[str] = "data/search_cache.sqlite3"
+    SEARCH_CACHE_TTL_ARXIV: int = 86400
+    SEARCH_CACHE_TTL_WIKI: int = 21600
+    SEARCH_CACHE_TTL_WEB: int = 900
+    SEARCH_CACHE_TTL_FAILURE: int = 60
+    
     class Config:
         env_file = ".env"
 
@@ -2,11 +2,19 @@
 AI Assistant Pro - FastAPI Backend
 Main application entry point
 """
-from fastapi import FastAPI
+import time
+import asyncio
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from backend.config import settings
-from backend.routes import pdf_router, search_router, system_router
+from backend.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS, HTTP_REQUESTS_IN_FLIGHT, REGISTRY
+from backend.routes import pdf_router, search_router, system_router, metrics_router
+from backend.routes.pdf_routes import pdf_service
+from backend.routes.search_routes import search_service
+from backend.services.llm_pool import llm_pool
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -26,10 +34,64 @@ app.add_middleware(
     allow_headers=settings.CORS_HEADERS,
 )
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads from Content-Length before the body is buffered"""
+    if request.url.path.startswith("/pdf/upload"):
+        content_length = request.headers.get("content-length")
+        # Allow one extra MB for multipart framing around the files
+        limit = (settings.PDF_MAX_REQUEST_MB + 1) * 1024 * 1024
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds the request limit of {settings.PDF_MAX_REQUEST_MB} MB"}
+            )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Count in-flight requests and record per-route latency"""
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        # Label by route template, not raw path, to keep label cardinality bounded
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_SECONDS.labels(method=request.method, route=route_path).observe(
+            time.perf_counter() - started
+        )
+        HTTP_REQUESTS.labels(method=request.method, route=route_path, status=status).inc()
+
+
 # Include routers
 app.include_router(system_router)
 app.include_router(pdf_router)
 app.include_router(search_router)
+app.include_router(metrics_router)
+
+
+@app.on_event("startup")
+async def startup():
+    """Share metrics between workers and warm up the embedding model before serving requests"""
+    if settings.METRICS_SHARED_DIR:
+        REGISTRY.share(settings.METRICS_SHARED_DIR, settings.METRICS_FLUSH_SECONDS)
+    if settings.EMBEDDING_WARMUP:
+        await asyncio.to_thread(pdf_service.warm_up)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close pooled LLM connections, stop ingestion workers and close caches"""
+    await llm_pool.aclose()
+    pdf_service.shutdown()
+    search_service.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,464 @@
+"""
+Prometheus Metrics
+"""
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """A named metric family with a fixed set of label names"""
+
+    kind = ""
+    suffix = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Unlabelled metrics are exported from the start, so rate() has a zero to begin at
+            self._children[()] = self._new_child()
+        REGISTRY.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels: str):
+        """Get the child for one combination of label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def _sample(self, child) -> Any:
+        """JSON-serializable value of one child"""
+        return child.value
+
+    def samples(self) -> Dict[Tuple[str, ...], Any]:
+        """Current value of every child, keyed by label values"""
+        return {key: self._sample(child) for key, child in list(self._children.items())}
+
+    @staticmethod
+    def merge(total: Any, value: Any) -> Any:
+        """Combine the values of two workers"""
+        return (total or 0) + value
+
+    def _render_samples(self, samples: Dict[Tuple[str, ...], Any], labelnames: Sequence[str]) -> List[str]:
+        return [
+            f"{self.name}{self.suffix}{_format_labels(labelnames, key)} {_format_value(value)}"
+            for key, value in samples.items()
+        ]
+
+    def render(
+        self,
+        samples: Optional[Dict[Tuple[str, ...], Any]] = None,
+        labelnames: Optional[Sequence[str]] = None
+    ) -> str:
+        """Render this process's values, or the given (merged) samples"""
+        lines = [
+            f"# HELP {self.name}{self.suffix} {self.documentation}",
+            f"# TYPE {self.name}{self.suffix} {self.kind}",
+        ]
+        lines.extend(self._render_samples(
+            self.samples() if samples is None else samples,
+            self.labelnames if labelnames is None else labelnames
+        ))
+        return "\n".join(lines)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+    suffix = "_total"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _sample(self, child: _HistogramValue) -> List:
+        with child._lock:
+            return [list(child.counts), child.sum]
+
+    @staticmethod
+    def merge(total: Optional[List], value: List) -> List:
+        if total is None:
+            return [list(value[0]), value[1]]
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1]]
+
+    def _render_samples(self, samples: Dict[Tuple[str, ...], Any], labelnames: Sequence[str]) -> List[str]:
+        lines = []
+        for key, (counts, total_sum) in samples.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+            labels = _format_labels(labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Holds every metric and renders them in the Prometheus text format.
+
+    Values live in the process that records them. With several API worker
+    processes, call ``share`` with a directory common to all of them. Each
+    worker then writes a snapshot of its values there every few seconds and
+    on every scrape. A scrape, whichever worker answers it, merges the
+    snapshots. Snapshot files are named by pid and start time, so a
+    restarted worker that reuses a pid does not overwrite its predecessor.
+    Counters and histograms are summed over workers, including ones that
+    have exited, so they never go backwards. Gauges describe one process
+    and get a ``worker`` label (the pid) instead, for live workers only. Values of workers other than the one scraped can be up to one
+    flush interval old. Empty the directory before starting the server.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+        self._shared_dir: Optional[str] = None
+        self._snapshot_name = ""
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        """Register a callback that refreshes gauges before they are rendered or shared"""
+        self._collectors.append(collect)
+
+    def _collect(self) -> None:
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Warning: Metrics collector failed: {e}")
+
+    def share(self, directory: str, flush_seconds: float) -> None:
+        """Merge the metrics of every worker process writing to ``directory``"""
+        os.makedirs(directory, exist_ok=True)
+        self._shared_dir = directory
+        self._snapshot_name = f"{os.getpid()}-{time.time_ns()}.json"
+        threading.Thread(
+            target=self._flush_loop, args=(flush_seconds,), name="metrics-flush", daemon=True
+        ).start()
+
+    def _flush_loop(self, flush_seconds: float) -> None:
+        while True:
+            time.sleep(flush_seconds)
+            self._collect()
+            self._write_snapshot()
+
+    def _write_snapshot(self) -> None:
+        data = {
+            metric.name: [[list(key), value] for key, value in metric.samples().items()]
+            for metric in self._metrics
+        }
+        path = os.path.join(self._shared_dir, self._snapshot_name)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write metrics snapshot: {e}")
+
+    def _read_snapshots(self) -> Dict[Tuple[int, int], Dict]:
+        """Every worker's snapshot, keyed by (pid, start time)"""
+        snapshots = {}
+        for entry in os.listdir(self._shared_dir):
+            name, ext = os.path.splitext(entry)
+            pid, _, started = name.partition("-")
+            if ext != ".json" or not pid.isdigit() or not started.isdigit():
+                continue
+            try:
+                with open(os.path.join(self._shared_dir, entry), encoding="utf-8") as f:
+                    snapshots[(int(pid), int(started))] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def _render_shared(self) -> str:
+        self._write_snapshot()
+        snapshots = self._read_snapshots()
+        # The latest process to hold each pid is the one that may still be running
+        latest: Dict[int, int] = {}
+        for pid, started in snapshots:
+            latest[pid] = max(started, latest.get(pid, started))
+        live = {(pid, started) for pid, started in latest.items() if _alive(pid)}
+        rendered = []
+        for metric in self._metrics:
+            merged: Dict[Tuple[str, ...], Any] = {}
+            for worker, data in snapshots.items():
+                for key, value in data.get(metric.name, []):
+                    if metric.kind == "gauge":
+                        if worker in live:
+                            merged[tuple(key) + (str(worker[0]),)] = value
+                    else:
+                        merged[tuple(key)] = metric.merge(merged.get(tuple(key)), value)
+            labelnames = metric.labelnames + ("worker",) if metric.kind == "gauge" else metric.labelnames
+            rendered.append(metric.render(merged, labelnames))
+        return "\n".join(rendered) + "\n"
+
+    def render(self) -> str:
+        self._collect()
+        if self._shared_dir is not None:
+            return self._render_shared()
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# HTTP
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being handled"
+)
+HTTP_REQUESTS = Counter(
+    "http_requests", "Handled requests", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time until the response starts", ["method", "route"]
+)
+
+# Pipeline stages
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Duration of ingestion and chat pipeline stages",
+    ["stage"]
+)
+LLM_CALLS = Counter(
+    "llm_calls", "LLM calls by pipeline stage and outcome", ["stage", "outcome"]
+)
+EMBEDDING_BATCH_TEXTS = Histogram(
+    "embedding_batch_texts", "Texts per embedding micro-batch", buckets=SIZE_BUCKETS
+)
+SEARCH_TOOL_SECONDS = Histogram(
+    "search_tool_duration_seconds", "Duration of search tool calls", ["tool"]
+)
+SEARCH_TOOL_CALLS = Counter(
+    "search_tool_calls", "Search tool calls by outcome", ["tool", "outcome"]
+)
+
+# Sessions and indexes
+SESSIONS = Gauge("pdf_sessions", "PDF chat sessions by residency", ["state"])
+INDEX_VECTORS = Gauge("pdf_index_vectors", "Vectors held by resident FAISS indexes")
+SESSION_MEMORY_BYTES = Gauge("pdf_session_memory_bytes", "Estimated memory of resident sessions")
+SESSION_EVICTIONS = Counter("pdf_session_evictions", "Sessions evicted for the memory budget")
+
+
+class _RunTimer(BaseCallbackHandler):
+    """Base for callback handlers that time runs by run id"""
+
+    # Called inline so timing is not skewed by a hop onto the executor
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[UUID, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, name: str) -> None:
+        with self._lock:
+            self._started[run_id] = (name, time.perf_counter())
+
+    def _finish(self, run_id: UUID) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._started.pop(run_id, None)
+        if entry is None:
+            return None
+        return entry[0], time.perf_counter() - entry[1]
+
+
+class LLMStageTimer(_RunTimer):
+    """Records the duration and outcome of LLM calls for one pipeline stage"""
+
+    def __init__(self, stage: str):
+        super().__init__()
+        self.stage = stage
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, self.stage)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, self.stage)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        if self._finish_stage(run_id):
+            LLM_CALLS.labels(stage=self.stage, outcome="success").inc()
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        if self._finish_stage(run_id):
+            LLM_CALLS.labels(stage=self.stage, outcome="error").inc()
+
+    def _finish_stage(self, run_id: UUID) -> bool:
+        finished = self._finish(run_id)
+        if finished is None:
+            return False
+        STAGE_SECONDS.labels(stage=f"{self.stage}_llm").observe(finished[1])
+        return True
+
+
+class SearchToolTimer(_RunTimer):
+    """Records the duration and outcome of search tool calls"""
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name", "unknown"))
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any) -> None:
+        self._record(run_id, "success")
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self._record(run_id, "error")
+
+    def _record(self, run_id: UUID, outcome: str) -> None:
+        finished = self._finish(run_id)
+        if finished is None:
+            return
+        tool, seconds = finished
+        SEARCH_TOOL_SECONDS.labels(tool=tool).observe(seconds)
+        SEARCH_TOOL_CALLS.labels(tool=tool, outcome=outcome).inc()
+
+
+# Shared callback handlers; handlers time by run id, so one instance serves all calls
+REWRITE_LLM_TIMER = LLMStageTimer("rewrite")
+ANSWER_LLM_TIMER = LLMStageTimer("answer")
+SUMMARY_LLM_TIMER = LLMStageTimer("summary")
+SEARCH_LLM_TIMER = LLMStageTimer("search")
+SEARCH_TOOL_TIMER = SearchToolTimer()
@@ -2,7 +2,7 @@
 Pydantic Models for Request/Response Validation
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import List, Literal, Optional, Dict
 
 
 class ChatRequest(BaseModel):
@@ -12,6 +12,15 @@ class ChatRequest(BaseModel):
     temperature: float = Field(default=0.3, ge=0.0, le=1.0, description="LLM temperature")
     max_tokens: int = Field(default=2048, ge=100, le=4096, description="Maximum tokens in response")
     search_k: int = Field(default=4, ge=1, le=10, description="Number of documents to retrieve")
+    fetch_k: Optional[int] = Field(
+        default=None, ge=1, le=1000,
+        description="MMR candidate pool size (default: search_k * FETCH_K_MULTIPLIER, capped at FETCH_K_MAX)"
+    )
+    retrieval_mode: Literal["dense", "hybrid", "prefilter"] = Field(
+        default="dense",
+        description="'dense' runs MMR over vector search; 'hybrid' fuses BM25 and vector scores; "
+                    "'prefilter' runs the fused MMR only over BM25 candidates"
+    )
 
 
 class SearchRequest(BaseModel):
@@ -20,6 +29,10 @@ class SearchRequest(BaseModel):
     session_id: str = Field(..., description="Unique session identifier")
     temperature: float = Field(default=0.3, ge=0.0, le=1.0, description="LLM temperature")
     max_tokens: int = Field(default=2048, ge=100, le=4096, description="Maximum tokens in response")
+    mode: Literal["agent", "fast"] = Field(
+        default="agent",
+        description="'agent' runs the multi-step ReAct agent; 'fast' queries all tools in parallel and answers in one LLM call"
+    )
 
 
 class UploadResponse(BaseModel):
@@ -30,6 +43,28 @@ class UploadResponse(BaseModel):
     message: str
 
 
+class FileProgress(BaseModel):
+    """Ingestion progress of a single uploaded file"""
+    filename: str
+    status: str = "queued"
+    parsed_pages: int = 0
+    chunks_embedded: int = 0
+    chunks_indexed: int = 0
+    error: Optional[str] = None
+
+
+class IngestionJobResponse(BaseModel):
+    """Response model for background PDF ingestion jobs"""
+    job_id: str
+    session_id: str
+    status: str = "queued"
+    files: List[FileProgress] = []
+    total_chunks: int = 0
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
+
+
 class SourceInfo(BaseModel):
     """Information about a source document"""
     source: str
@@ -42,6 +77,7 @@ class ChatResponse(BaseModel):
     answer: str
     sources: Optional[List[SourceInfo]] = None
     session_id: str
+    cached: bool = False
 
 
 class SearchResponse(BaseModel):
@@ -63,7 +99,26 @@ class SessionResponse(BaseModel):
     message: str
 
 
+class SessionInfo(BaseModel):
+    """Residency, last access and estimated memory of a session"""
+    session_id: str
+    resident: bool
+    last_access: Optional[str] = None
+    index_bytes: int = 0
+    docstore_bytes: int = 0
+    history_bytes: int = 0
+    total_bytes: int = 0
+    history_messages: int = 0
+    history_prompt_tokens: int = 0
+    history_summary_tokens: int = 0
+    index_type: Optional[str] = None
+
+
 class SessionListResponse(BaseModel):
     """Response model for listing sessions"""
     active_sessions: List[str]
     total: int
+    sessions: List[SessionInfo] = []
+    memory_bytes: int = 0
+    memory_budget_bytes: int = 0
+    evictions: int = 0
@@ -4,5 +4,6 @@ Routes Package
 from .pdf_routes import router as pdf_router
 from .search_routes import router as search_router
 from .system_routes import router as system_router
+from .metrics_routes import router as metrics_router
 
-__all__ = ['pdf_router', 'search_router', 'system_router']
+__all__ = ['pdf_router', 'search_router', 'system_router', 'metrics_router']
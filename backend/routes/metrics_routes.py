@@ -0,0 +1,23 @@
+"""
+Metrics Routes (Prometheus Scrape Endpoint)
+"""
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from backend.metrics import REGISTRY
+from backend.routes.pdf_routes import pdf_service
+
+router = APIRouter(tags=["Metrics"])
+
+# Session and index gauges are refreshed before every render or shared snapshot
+REGISTRY.add_collector(pdf_service.update_metrics)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose all metrics in the Prometheus text format, merged over workers when shared"""
+    # Collecting and merging touch the disk; keep that off the event loop
+    content = await asyncio.to_thread(REGISTRY.render)
+    return Response(content=content, media_type=REGISTRY.CONTENT_TYPE)
@@ -1,16 +1,26 @@
 """
 PDF Chat Routes
 """
-from fastapi import APIRouter, UploadFile, File, Form
+import asyncio
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List
 
-from backend.models import ChatRequest, ChatResponse, UploadResponse
-from backend.services import PDFService
+from backend.config import settings
+from backend.models import ChatRequest, ChatResponse, UploadResponse, IngestionJobResponse
+from backend.services import PDFService, IngestionJobManager
+from backend.services.pdf_intake import read_uploads
 
 router = APIRouter(prefix="/pdf", tags=["PDF Chat"])
 
 # Initialize PDF service
 pdf_service = PDFService()
+ingestion_jobs = IngestionJobManager(
+    pdf_service,
+    max_concurrent_jobs=settings.INGEST_MAX_CONCURRENT_JOBS,
+    max_jobs_retained=settings.INGEST_JOB_HISTORY
+)
 
 
 @router.post("/upload", response_model=UploadResponse)
@@ -27,6 +37,38 @@ async def upload_pdfs(
     return await pdf_service.upload_pdfs(files, session_id)
 
 
+@router.post("/upload/async", response_model=IngestionJobResponse, status_code=202)
+async def upload_pdfs_async(
+    files: List[UploadFile] = File(...),
+    session_id: str = Form(default="default")
+):
+    """
+    Upload PDF files and process them in the background
+    
+    Returns immediately with a job id; poll `/pdf/jobs/{job_id}` for per-file
+    progress. Files become searchable in chat as soon as each one is indexed.
+    
+    - **files**: List of PDF files to upload
+    - **session_id**: Unique session identifier
+    """
+    buffers = await read_uploads(files)
+    return ingestion_jobs.submit(session_id, buffers)
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: str):
+    """
+    Get the status and per-file progress of a background ingestion job
+    
+    - **job_id**: Job identifier returned by `/pdf/upload/async`
+    """
+    # Jobs of other workers are read from the state backend
+    job = await asyncio.to_thread(ingestion_jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_pdfs(request: ChatRequest):
     """
@@ -39,3 +81,26 @@ async def chat_with_pdfs(request: ChatRequest):
     - **search_k**: Number of document chunks to retrieve
     """
     return await pdf_service.chat_with_pdfs(request)
+
+
+@router.post("/chat/stream")
+async def stream_chat_with_pdfs(request: ChatRequest):
+    """
+    Chat with uploaded PDF documents, streaming the answer as Server-Sent Events
+    
+    Emits `token` events as the answer is generated, followed by a `done`
+    event with the full answer, sources and timing (or an `error` event).
+    Accepts the same body as `/pdf/chat`.
+    """
+    events = await pdf_service.stream_chat_with_pdfs(request)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats", response_model=dict)
+async def pdf_stats():
+    """Embedding, question rewrite, answer cache, context assembly and shared chunk store statistics"""
+    return pdf_service.get_stats()
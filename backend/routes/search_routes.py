@@ -21,5 +21,12 @@ async def web_search(request: SearchRequest):
     - **session_id**: Session identifier
     - **temperature**: LLM temperature (0.0-1.0)
     - **max_tokens**: Maximum response tokens
+    - **mode**: "agent" (multi-step agent) or "fast" (parallel tools, one LLM call)
     """
     return await search_service.search(request)
+
+
+@router.get("/stats", response_model=dict)
+async def search_stats():
+    """Search tool result cache statistics"""
+    return search_service.get_stats()
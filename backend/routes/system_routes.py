@@ -1,6 +1,8 @@
 """
 System Routes (Health Check, Session Management)
 """
+import asyncio
+
 from fastapi import APIRouter
 from datetime import datetime
 
@@ -21,9 +23,11 @@ async def root():
         "endpoints": {
             "upload": "/pdf/upload",
             "chat": "/pdf/chat",
+            "chat_stream": "/pdf/chat/stream",
             "search": "/search",
             "health": "/health",
-            "sessions": "/sessions"
+            "sessions": "/sessions",
+            "metrics": "/metrics"
         }
     }
 
@@ -40,12 +44,9 @@ async def health_check():
 
 @router.get("/sessions", response_model=SessionListResponse)
 async def list_sessions():
-    """List all active sessions"""
-    active_sessions = pdf_service.get_active_sessions()
-    return SessionListResponse(
-        active_sessions=active_sessions,
-        total=len(active_sessions)
-    )
+    """List all sessions with residency and estimated memory usage"""
+    # Reads every persisted session's metadata from disk
+    return await asyncio.to_thread(pdf_service.get_session_overview)
 
 
 @router.delete("/session/{session_id}", response_model=SessionResponse)
@@ -55,7 +56,7 @@ async def clear_session(session_id: str):
     
     - **session_id**: Session identifier to clear
     """
-    pdf_service.clear_session(session_id)
+    await pdf_service.clear_session(session_id)
     return SessionResponse(
         status="success",
         message=f"Session {session_id} cleared"
@@ -3,5 +3,6 @@ Services Package
 """
 from .pdf_service import PDFService
 from .search_service import SearchService
+from .ingestion_jobs import IngestionJobManager
 
-__all__ = ['PDFService', 'SearchService']
+__all__ = ['PDFService', 'SearchService', 'IngestionJobManager']
@@ -0,0 +1,145 @@
+"""
+Semantic Answer Cache
+"""
+import time
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.models import SourceInfo
+
+
+@dataclass
+class CachedAnswer:
+    """An answer and its sources, stored under the embedding of the question"""
+    vector: np.ndarray = field(repr=False)
+    answer: str
+    sources: List[SourceInfo]
+    created_at: float = field(default_factory=time.time)
+
+
+class AnswerCache:
+    """
+    Answer cache for PDF chat, keyed by document set and question similarity.
+
+    Entries are grouped by a fingerprint of the sorted SHA-256 file hashes
+    of a session, plus the parameters that shape the answer. Sessions that
+    uploaded the same PDFs therefore share answers, and any new upload
+    changes the fingerprint. Cached sources name files by content hash, and
+    each session maps them back to its own file names. Inside a group, a question is served from the
+    cache when the cosine similarity of its embedding to a cached question
+    is at least ``similarity_threshold``. Embeddings are normalized, so this
+    is one matrix-vector product. Entries expire after ``ttl_seconds``, and
+    the least recently used ones are dropped beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._groups: Dict[str, "OrderedDict[int, CachedAnswer]"] = {}
+        # Global LRU order of (fingerprint, entry id)
+        self._order: "OrderedDict[Tuple[str, int], None]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def fingerprint(file_hashes: Iterable[str], *params) -> str:
+        """Key of a document set together with answer-shaping parameters"""
+        digest = hashlib.sha256()
+        for file_hash in sorted(file_hashes):
+            digest.update(file_hash.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(repr(params).encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove(self, fingerprint: str, entry_id: int) -> None:
+        group = self._groups.get(fingerprint)
+        if group is not None:
+            group.pop(entry_id, None)
+            if not group:
+                del self._groups[fingerprint]
+        self._order.pop((fingerprint, entry_id), None)
+
+    def _expire(self, fingerprint: str, now: float) -> None:
+        group = self._groups.get(fingerprint, {})
+        for entry_id in [i for i, entry in group.items() if now - entry.created_at > self.ttl_seconds]:
+            self._remove(fingerprint, entry_id)
+
+    def lookup(self, fingerprint: str, query_vector: List[float]) -> Optional[CachedAnswer]:
+        """Return the most similar cached answer above the threshold, if any"""
+        vector = self._normalize(query_vector)
+        with self._lock:
+            self._expire(fingerprint, time.time())
+            group = self._groups.get(fingerprint)
+            if not group:
+                self.misses += 1
+                return None
+
+            entry_ids = list(group)
+            similarities = np.stack([group[i].vector for i in entry_ids]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self._order.move_to_end((fingerprint, entry_ids[best]))
+            self.hits += 1
+            return group[entry_ids[best]]
+
+    def store(
+        self,
+        fingerprint: str,
+        query_vector: List[float],
+        answer: str,
+        sources: List[SourceInfo]
+    ) -> None:
+        """Cache an answer, evicting least recently used entries beyond the size bound"""
+        if self.max_entries <= 0:
+            return
+        entry = CachedAnswer(vector=self._normalize(query_vector), answer=answer, sources=sources)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._groups.setdefault(fingerprint, OrderedDict())[entry_id] = entry
+            self._order[(fingerprint, entry_id)] = None
+            while len(self._order) > self.max_entries:
+                (old_fingerprint, old_id), _ = self._order.popitem(last=False)
+                self._remove(old_fingerprint, old_id)
+
+    def record_bypass(self) -> None:
+        """Count a request that could not use the cache"""
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> Dict:
+        """Return hit, miss and bypass counts and the hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._order),
+                "document_sets": len(self._groups),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._groups.clear()
+            self._order.clear()
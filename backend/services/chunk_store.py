@@ -0,0 +1,256 @@
+"""
+Shared Reference-Counted Chunk Store
+"""
+import json
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+
+# Metadata that locates a chunk within its document and is part of its identity;
+# everything else (file name, PDF properties) is kept per session
+POSITION_FIELDS = ("page", "start_index")
+
+
+class ChunkStore:
+    """
+    Process-wide store of chunk Documents shared by every session.
+
+    Chunks are keyed by a hash of their text and position (page), so a PDF
+    uploaded to many sessions, under any file name, is held in memory once.
+    The store keeps only the text and position fields. Sessions index
+    chunks under reference ids, which also hash the source file, so two
+    files of one session with an identical page keep a citation each while
+    sharing the text. Per-file metadata such as the source name lives in
+    each session's SharedDocstore view and is merged back in on lookup. A
+    chunk is freed when no reference of any session points at it any more,
+    that is once the last session using it is cleared or unloaded.
+
+    Only texts and metadata are shared. Vectors stay in each session's FAISS
+    index: sessions pick their own index type and storage, and are persisted,
+    memory-mapped and upgraded one by one. A single index filtered per
+    session would also make every search scan the vectors of all sessions.
+    Quantized INDEX_STORAGE is the way to shrink per-session vectors.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents: Dict[str, Document] = {}
+        self._bytes: Dict[str, int] = {}
+        # chunk id -> sessions referencing it
+        self._owners: Dict[str, Set[str]] = {}
+        # session -> its reference ids and the chunk each points at, and the
+        # number of references per chunk
+        self._session_refs: Dict[str, Dict[str, str]] = {}
+        self._session_chunks: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def chunk_id(text: str, metadata: Dict) -> str:
+        """Content hash identifying a chunk across sessions and file names"""
+        position = {key: metadata[key] for key in POSITION_FIELDS if key in metadata}
+        payload = json.dumps({"text": text, "position": position}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def reference_id(text: str, metadata: Dict) -> str:
+        """Id a session indexes a chunk under: its content hash plus the source file"""
+        source = metadata.get("file_hash", metadata.get("source"))
+        payload = json.dumps({"chunk": ChunkStore.chunk_id(text, metadata), "file": source}, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def split(document: Document) -> Tuple[Document, Dict]:
+        """Split a Document into its shared part and its per-session metadata"""
+        position = {key: document.metadata[key] for key in POSITION_FIELDS if key in document.metadata}
+        extra = {key: value for key, value in document.metadata.items() if key not in POSITION_FIELDS}
+        return Document(page_content=document.page_content, metadata=position), extra
+
+    @staticmethod
+    def _document_bytes(document: Document) -> int:
+        # Same rough per-chunk overhead as the session memory estimates
+        return len(document.page_content) + 300
+
+    def acquire(self, session_id: str, documents: Dict[str, Document]) -> Dict[str, str]:
+        """
+        Reference chunks from a session by reference id
+
+        Stores the shared part of chunks not already held. Returns the chunk
+        id of every reference; acquiring a reference twice counts once.
+        """
+        chunk_ids = {}
+        with self._lock:
+            refs = self._session_refs.setdefault(session_id, {})
+            counts = self._session_chunks.setdefault(session_id, {})
+            for ref_id, document in documents.items():
+                chunk_id = self.chunk_id(document.page_content, document.metadata)
+                chunk_ids[ref_id] = chunk_id
+                if ref_id in refs:
+                    continue
+                if chunk_id not in self._documents:
+                    shared, _ = self.split(document)
+                    self._documents[chunk_id] = shared
+                    self._bytes[chunk_id] = self._document_bytes(shared)
+                    self._owners[chunk_id] = set()
+                self._owners[chunk_id].add(session_id)
+                refs[ref_id] = chunk_id
+                counts[chunk_id] = counts.get(chunk_id, 0) + 1
+        return chunk_ids
+
+    def _drop(self, session_id: str, ref_ids: Iterable[str]) -> int:
+        """Remove a session's references, freeing unreferenced chunks (lock held)"""
+        refs = self._session_refs.get(session_id, {})
+        counts = self._session_chunks.get(session_id, {})
+        freed = 0
+        for ref_id in ref_ids:
+            chunk_id = refs.pop(ref_id, None)
+            if chunk_id is None:
+                continue
+            counts[chunk_id] -= 1
+            if counts[chunk_id]:
+                continue
+            del counts[chunk_id]
+            owners = self._owners[chunk_id]
+            owners.discard(session_id)
+            if not owners:
+                del self._owners[chunk_id]
+                del self._documents[chunk_id]
+                del self._bytes[chunk_id]
+                freed += 1
+        return freed
+
+    def discard(self, session_id: str, ref_ids: Iterable[str]) -> int:
+        """Drop some of a session's references; returns the number of chunks freed"""
+        with self._lock:
+            return self._drop(session_id, list(ref_ids))
+
+    def release(self, session_id: str) -> int:
+        """Drop every reference of a session; returns the number of chunks freed"""
+        with self._lock:
+            freed = self._drop(session_id, list(self._session_refs.get(session_id, ())))
+            self._session_refs.pop(session_id, None)
+            self._session_chunks.pop(session_id, None)
+            return freed
+
+    def get(self, chunk_id: str) -> Optional[Document]:
+        return self._documents.get(chunk_id)
+
+    def view(self, session_id: str) -> "SharedDocstore":
+        """An empty docstore for a session's FAISS store backed by this chunk store"""
+        return SharedDocstore(self, session_id)
+
+    def adopt(self, session_id: str, docstore: Docstore) -> "SharedDocstore":
+        """Move the documents of a session loaded from disk into the shared store"""
+        if isinstance(docstore, SharedDocstore):
+            return docstore
+        view = self.view(session_id)
+        if isinstance(docstore, InMemoryDocstore):
+            view.add(dict(docstore._dict))
+        return view
+
+    def session_bytes(self, session_id: str) -> int:
+        """A session's share of the store, each chunk split between its sessions"""
+        with self._lock:
+            return sum(
+                self._bytes[chunk_id] // len(self._owners[chunk_id])
+                for chunk_id in self._session_chunks.get(session_id, ())
+            )
+
+    def stats(self) -> Dict:
+        """Return unique chunks held and how much sharing saves"""
+        with self._lock:
+            references = sum(len(owners) for owners in self._owners.values())
+            unique_bytes = sum(self._bytes.values())
+            referenced_bytes = sum(
+                self._bytes[chunk_id] * len(owners) for chunk_id, owners in self._owners.items()
+            )
+            return {
+                "unique_chunks": len(self._documents),
+                "references": references,
+                "shared_chunks": sum(1 for owners in self._owners.values() if len(owners) > 1),
+                "sessions": len(self._session_chunks),
+                "bytes": unique_bytes,
+                "bytes_saved": referenced_bytes - unique_bytes,
+            }
+
+
+class SharedDocstore(Docstore, AddableMixin):
+    """
+    One session's view of the shared ChunkStore, used as a FAISS docstore.
+
+    The view maps the reference ids the session indexes to their chunk id
+    and to the session's own metadata for them, which lookups merge over
+    the shared text and position. Chunks of one file carry identical
+    metadata, so each distinct dict is stored once. ``copy`` gives the
+    copy-on-write store swaps their own mapping without copying any
+    documents. Pickling materializes the session's documents as a plain
+    InMemoryDocstore, so persisted sessions do not depend on the store.
+    """
+
+    def __init__(self, store: ChunkStore, session_id: str):
+        self._store = store
+        self._session_id = session_id
+        self._chunks: Dict[str, str] = {}
+        self._metadata: Dict[str, Dict] = {}
+        self._interned: Dict[str, Dict] = {}
+
+    def _intern(self, metadata: Dict) -> Dict:
+        key = json.dumps(metadata, sort_keys=True, default=str)
+        return self._interned.setdefault(key, metadata)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        overlapping = set(texts) & set(self._metadata)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._chunks.update(self._store.acquire(self._session_id, texts))
+        for ref_id, document in texts.items():
+            self._metadata[ref_id] = self._intern(ChunkStore.split(document)[1])
+
+    def delete(self, ids: List) -> None:
+        missing = set(ids) - set(self._metadata)
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        for ref_id in ids:
+            del self._metadata[ref_id]
+            del self._chunks[ref_id]
+        self._store.discard(self._session_id, ids)
+
+    def search(self, search: str) -> Union[str, Document]:
+        metadata = self._metadata.get(search)
+        chunk_id = self._chunks.get(search)
+        document = self._store.get(chunk_id) if metadata is not None and chunk_id is not None else None
+        if document is None:
+            return f"ID {search} not found."
+        return Document(page_content=document.page_content, metadata={**document.metadata, **metadata})
+
+    def __contains__(self, ref_id: str) -> bool:
+        return ref_id in self._metadata
+
+    def __len__(self) -> int:
+        return len(self._metadata)
+
+    def copy(self) -> "SharedDocstore":
+        view = SharedDocstore(self._store, self._session_id)
+        view._chunks = dict(self._chunks)
+        view._metadata = dict(self._metadata)
+        view._interned = dict(self._interned)
+        return view
+
+    def distinct_metadata(self) -> List[Dict]:
+        """Each distinct per-session metadata dict, in practice one per file"""
+        return list(self._interned.values())
+
+    def documents(self) -> Dict[str, Document]:
+        """The session's documents still held by the store"""
+        documents = {}
+        for ref_id in self._metadata:
+            document = self.search(ref_id)
+            if isinstance(document, Document):
+                documents[ref_id] = document
+        return documents
+
+    def __reduce__(self):
+        return InMemoryDocstore, (self.documents(),)
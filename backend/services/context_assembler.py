@@ -0,0 +1,133 @@
+"""
+Token-Budgeted Context Assembly
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+@dataclass
+class _Block:
+    """Contiguous text from one source page, ranked by its best chunk"""
+    text: str
+    rank: int
+    metadata: Dict
+
+
+class ContextAssembler:
+    """
+    Turns retrieved chunks into a compact, deduplicated prompt context.
+
+    Chunks from the same source and page are merged when one contains the
+    other or when they overlap, as adjacent splitter chunks do by up to
+    CHUNK_OVERLAP characters. The duplicated span is kept once. The merged
+    blocks are then trimmed to ``token_budget`` in relevance order. First,
+    every cited page gets up to ``min_tokens_per_page`` from its best block,
+    so no source page disappears from the answer. The remaining budget then
+    goes to blocks in rank order.
+    """
+
+    # Characters from the start of a chunk used to locate it inside another
+    PROBE_CHARS = 64
+
+    def __init__(self, token_budget: int, min_tokens_per_page: int, max_overlap: int):
+        self.token_budget = token_budget
+        self.min_tokens_per_page = min_tokens_per_page
+        self.max_overlap = max_overlap
+        self._lock = threading.Lock()
+        self.assembled = 0
+        self.chars_in = 0
+        self.chars_out = 0
+
+    def _merge(self, first: str, second: str) -> Optional[str]:
+        """Join two texts if one contains the other or ``first`` ends where ``second`` starts"""
+        if second in first:
+            return first
+        if first in second:
+            return second
+        probe = second[:self.PROBE_CHARS]
+        tail_start = max(0, len(first) - self.max_overlap - len(probe))
+        position = first.find(probe, tail_start)
+        while position != -1:
+            overlap = len(first) - position
+            if second.startswith(first[position:]):
+                return first + second[overlap:]
+            position = first.find(probe, position + 1)
+        return None
+
+    def _add(self, blocks: List[_Block], text: str, rank: int, metadata: Dict) -> None:
+        """Add a chunk to a page's blocks, merging it with any block it touches"""
+        block = _Block(text=text, rank=rank, metadata=metadata)
+        merged = True
+        while merged:
+            merged = False
+            for other in blocks:
+                text = self._merge(other.text, block.text) or self._merge(block.text, other.text)
+                if text is not None:
+                    blocks.remove(other)
+                    best = other if other.rank < block.rank else block
+                    block = _Block(text=text, rank=best.rank, metadata=best.metadata)
+                    merged = True
+                    break
+        blocks.append(block)
+
+    @staticmethod
+    def _trim(text: str, max_chars: int) -> str:
+        """Cut text to ``max_chars`` at a word boundary"""
+        if len(text) <= max_chars:
+            return text
+        cut = text.rfind(" ", 0, max_chars)
+        return text[:cut if cut > max_chars // 2 else max_chars].rstrip() + " ..."
+
+    def assemble(self, docs: List[Document]) -> List[Document]:
+        """Merge, deduplicate and trim retrieved documents (given in relevance order)"""
+        pages: "OrderedDict[Tuple[str, str], List[_Block]]" = OrderedDict()
+        for rank, doc in enumerate(docs):
+            key = (str(doc.metadata.get("source", "")), str(doc.metadata.get("page", "")))
+            self._add(pages.setdefault(key, []), doc.page_content, rank, doc.metadata)
+
+        blocks = sorted((block for page in pages.values() for block in page), key=lambda b: b.rank)
+        # Roughly four characters per token
+        remaining = self.token_budget * 4
+        allocation = [0] * len(blocks)
+
+        # Every cited page first gets a minimum share from its best block
+        seen_pages = set()
+        for i, block in enumerate(blocks):
+            key = (str(block.metadata.get("source", "")), str(block.metadata.get("page", "")))
+            if key in seen_pages:
+                continue
+            seen_pages.add(key)
+            allocation[i] = min(len(block.text), self.min_tokens_per_page * 4, remaining)
+            remaining -= allocation[i]
+
+        # Then the rest of the budget goes to blocks in relevance order
+        for i, block in enumerate(blocks):
+            extra = min(len(block.text) - allocation[i], remaining)
+            allocation[i] += extra
+            remaining -= extra
+
+        assembled = [
+            Document(page_content=self._trim(block.text, chars), metadata=block.metadata)
+            for block, chars in zip(blocks, allocation)
+            if chars > 0
+        ]
+
+        with self._lock:
+            self.assembled += 1
+            self.chars_in += sum(len(doc.page_content) for doc in docs)
+            self.chars_out += sum(len(doc.page_content) for doc in assembled)
+        return assembled
+
+    def stats(self) -> Dict:
+        """Return how much retrieved text the assembly removed"""
+        with self._lock:
+            return {
+                "assembled": self.assembled,
+                "tokens_in": self.chars_in // 4,
+                "tokens_out": self.chars_out // 4,
+                "reduction_ratio": 1 - self.chars_out / self.chars_in if self.chars_in else 0.0,
+            }
@@ -0,0 +1,100 @@
+"""
+Embedding Model Backends
+"""
+import os
+import re
+from typing import Dict, List
+
+from langchain_huggingface import HuggingFaceEmbeddings
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx_int8")
+QUANTIZATION_CONFIGS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+
+def _export_dir(cache_dir: str, model_name: str) -> str:
+    return os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name))
+
+
+def _quantized_model(model_name: str, export_dir: str, quantization: str) -> str:
+    """
+    Export and dynamically quantize a model to int8 ONNX once per host
+
+    Returns the quantized file, relative to ``export_dir``, which also gets
+    the tokenizer and pooling configuration so it loads like the original.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    file_name = os.path.join("onnx", f"model_qint8_{quantization}.onnx")
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save(export_dir)
+        export_dynamic_quantized_onnx_model(model, quantization, export_dir)
+    return file_name
+
+
+def create_embeddings(
+    backend: str,
+    model_name: str,
+    device: str = "cpu",
+    threads: int = 0,
+    quantization: str = "avx2",
+    cache_dir: str = "data/onnx"
+) -> HuggingFaceEmbeddings:
+    """
+    Create sentence-transformers embeddings on the given backend
+
+    "torch" runs the model in PyTorch. "onnx" runs it in ONNX Runtime, and
+    "onnx_int8" runs an int8 dynamically quantized export of it, which is
+    built under ``cache_dir`` on first use. Tokenization, pooling and
+    normalization are sentence-transformers' own for every backend, so only
+    the forward pass differs. ``threads`` sets intra-op threads; 0 leaves
+    the library default. For "torch" that setting is process-wide and
+    stays in effect after the call.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; use one of {', '.join(EMBEDDING_BACKENDS)}")
+    model_kwargs: Dict = {"device": device}
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs=model_kwargs,
+            encode_kwargs={"normalize_embeddings": True}
+        )
+
+    import onnxruntime
+
+    ort_kwargs: Dict = {}
+    if threads:
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads
+        ort_kwargs["session_options"] = session_options
+    if backend == "onnx_int8":
+        if quantization not in QUANTIZATION_CONFIGS:
+            raise ValueError(f"Unknown quantization {quantization!r}; use one of {', '.join(QUANTIZATION_CONFIGS)}")
+        export_dir = _export_dir(cache_dir, model_name)
+        ort_kwargs["file_name"] = _quantized_model(model_name, export_dir, quantization)
+        model_name = export_dir
+    model_kwargs.update(backend="onnx", model_kwargs=ort_kwargs)
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"normalize_embeddings": True}
+    )
+
+
+def warm_up(embeddings, chunk_size: int, batch_size: int) -> None:
+    """
+    Run a query and a batch of chunk-sized texts through a model
+
+    The first calls pay for lazy initialization, kernel selection and
+    allocator growth. Doing them at startup keeps that off the first upload
+    and the first question.
+    """
+    embeddings.embed_query("warm-up query")
+    words = " ".join(["warm-up"] * max(1, chunk_size // 8))
+    texts: List[str] = [words] * max(1, batch_size)
+    embeddings.embed_documents(texts)
@@ -0,0 +1,147 @@
+"""
+Micro-Batching Embedding Service
+"""
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from backend.metrics import EMBEDDING_BATCH_TEXTS, STAGE_SECONDS
+
+
+@dataclass
+class _EmbeddingRequest:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that groups requests from all sessions into micro-batches.
+
+    Callers get a future per request. A single worker thread waits for the
+    first request, then keeps collecting until ``max_batch_size`` texts are
+    queued or ``max_wait_ms`` has passed. The collected texts are sorted by
+    length so each forward pass pads as little as possible, and the vectors
+    are scattered back to the callers' futures. Under load, upload chunks
+    and retriever queries share full batches instead of each running a small,
+    poorly utilised forward pass.
+    """
+
+    def __init__(self, model: Embeddings, max_batch_size: int, max_wait_ms: float):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Optional[_EmbeddingRequest]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._texts = 0
+        self._requests = 0
+        self._busy_seconds = 0.0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for embedding and return a future of their vectors"""
+        request = _EmbeddingRequest(texts=list(texts))
+        if not request.texts:
+            request.future.set_result([])
+        else:
+            self._queue.put(request)
+        return request.future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed search docs"""
+        return self.submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text"""
+        return self.submit([text]).result()[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronous embed search docs"""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Asynchronous embed query text"""
+        return (await asyncio.wrap_future(self.submit([text])))[0]
+
+    def _collect(self, first: _EmbeddingRequest) -> List[_EmbeddingRequest]:
+        """Gather queued requests until the batch is full or the wait expires"""
+        batch = [first]
+        count = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                # Shutdown sentinel; put it back for the main loop
+                self._queue.put(None)
+                break
+            batch.append(request)
+            count += len(request.texts)
+        return batch
+
+    def _embed_batch(self, batch: List[_EmbeddingRequest]) -> None:
+        """Embed a collected batch, sorted by length, and resolve its futures"""
+        flat = [(r, i, text) for r, request in enumerate(batch) for i, text in enumerate(request.texts)]
+        order = sorted(range(len(flat)), key=lambda j: len(flat[j][2]))
+        results: List[List[Optional[List[float]]]] = [[None] * len(request.texts) for request in batch]
+
+        started = time.perf_counter()
+        try:
+            for start in range(0, len(order), self.max_batch_size):
+                positions = order[start:start + self.max_batch_size]
+                vectors = self.model.embed_documents([flat[j][2] for j in positions])
+                for j, vector in zip(positions, vectors):
+                    r, i, _ = flat[j]
+                    results[r][i] = vector
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._texts += len(flat)
+                self._busy_seconds += elapsed
+            STAGE_SECONDS.labels(stage="embedding_batch").observe(elapsed)
+            EMBEDDING_BATCH_TEXTS.observe(len(flat))
+
+        for request, vectors in zip(batch, results):
+            request.future.set_result(vectors)
+
+    def _run(self) -> None:
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            self._embed_batch(self._collect(request))
+
+    def stats(self) -> Dict:
+        """Return batch counts and throughput"""
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "requests": self._requests,
+                "texts": self._texts,
+                "avg_batch_size": self._texts / self._batches if self._batches else 0.0,
+                "texts_per_second": self._texts / self._busy_seconds if self._busy_seconds else 0.0,
+                "queued_requests": self._queue.qsize(),
+            }
+
+    def close(self) -> None:
+        """Stop the worker thread once queued requests are done"""
+        self._queue.put(None)
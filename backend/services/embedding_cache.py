@@ -0,0 +1,138 @@
+"""
+Content-Addressed Embedding Cache
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+@dataclass
+class CachedChunk:
+    """A split chunk of a PDF together with its embedding vector"""
+    text: str
+    metadata: Dict
+    vector: np.ndarray = field(repr=False)
+
+
+class EmbeddingCache:
+    """
+    Global cache of split chunks and their vectors shared by all sessions.
+
+    Two levels are kept, both bounded by a total chunk count with LRU eviction:
+    - file level: file SHA-256 -> every chunk (text, metadata, vector) of that file
+    - chunk level: chunk text hash -> vector, so partially known content is reused
+
+    Keys are namespaced by the splitter and embedding settings, so changing
+    either of them never serves stale chunks or vectors.
+    """
+
+    def __init__(self, max_chunks: int, splitter_settings: Dict, embedding_settings: Dict):
+        self.max_chunks = max_chunks
+        self._chunk_namespace = self._digest(repr(sorted(embedding_settings.items())))
+        self._file_namespace = self._digest(
+            self._chunk_namespace + repr(sorted(splitter_settings.items()))
+        )
+        self._files: "OrderedDict[str, List[CachedChunk]]" = OrderedDict()
+        self._file_chunk_count = 0
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.file_hits = 0
+        self.file_misses = 0
+        self.chunk_hits = 0
+        self.chunk_misses = 0
+
+    @staticmethod
+    def _digest(value: str) -> str:
+        """Generate SHA-256 hash of a string"""
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    def _file_key(self, file_hash: str) -> str:
+        return f"{self._file_namespace}:{file_hash}"
+
+    def _chunk_key(self, text: str) -> str:
+        return f"{self._chunk_namespace}:{self._digest(text)}"
+
+    def get_file(self, file_hash: str) -> Optional[List[CachedChunk]]:
+        """Return the cached chunks of a file, or None if it was never ingested"""
+        key = self._file_key(file_hash)
+        with self._lock:
+            chunks = self._files.get(key)
+            if chunks is None:
+                self.file_misses += 1
+                return None
+            self._files.move_to_end(key)
+            self.file_hits += 1
+            return chunks
+
+    def put_file(self, file_hash: str, chunks: List[CachedChunk]) -> None:
+        """Store the chunks of a file, evicting least recently used files"""
+        if len(chunks) > self.max_chunks:
+            return
+        key = self._file_key(file_hash)
+        with self._lock:
+            if key in self._files:
+                self._file_chunk_count -= len(self._files.pop(key))
+            self._files[key] = chunks
+            self._file_chunk_count += len(chunks)
+            while self._file_chunk_count > self.max_chunks:
+                _, evicted = self._files.popitem(last=False)
+                self._file_chunk_count -= len(evicted)
+
+    def embed_documents(self, texts: List[str], embeddings: Embeddings) -> List[np.ndarray]:
+        """Embed texts, only running the model for chunks not seen before"""
+        keys = [self._chunk_key(text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    self._vectors.move_to_end(key)
+                    vectors[i] = vector
+                    self.chunk_hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+            self.chunk_misses += len(missing)
+
+        if missing:
+            missing_keys = list(missing)
+            computed = embeddings.embed_documents(
+                [texts[missing[key][0]] for key in missing_keys]
+            )
+            with self._lock:
+                for key, values in zip(missing_keys, computed):
+                    vector = np.asarray(values, dtype=np.float32)
+                    for i in missing[key]:
+                        vectors[i] = vector
+                    self._vectors[key] = vector
+                while len(self._vectors) > self.max_chunks:
+                    self._vectors.popitem(last=False)
+
+        return vectors
+
+    def stats(self) -> Dict:
+        """Return cache size and hit/miss counters"""
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "file_chunks": self._file_chunk_count,
+                "vectors": len(self._vectors),
+                "max_chunks": self.max_chunks,
+                "file_hits": self.file_hits,
+                "file_misses": self.file_misses,
+                "chunk_hits": self.chunk_hits,
+                "chunk_misses": self.chunk_misses,
+            }
+
+    def clear(self) -> None:
+        """Drop every cached entry"""
+        with self._lock:
+            self._files.clear()
+            self._vectors.clear()
+            self._file_chunk_count = 0
@@ -0,0 +1,237 @@
+"""
+Bounded Chat History with Rolling Summarization
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from backend.metrics import SUMMARY_LLM_TIMER
+
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Approximate tokens of a message, including role overhead"""
+    return estimate_tokens(str(message.content)) + 4
+
+
+class HistorySummarizer:
+    """Folds old conversation turns into a running summary on a background thread"""
+
+    def __init__(self, get_llm: Callable[[], BaseChatModel], max_workers: int = 1):
+        self._get_llm = get_llm
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="history-summary"
+        )
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", """You maintain a concise running summary of a conversation about documents.
+Extend the current summary with the new lines. Keep names, figures, page references
+and open questions. Reply with the updated summary only."""),
+            ("human", "Current summary:\n{summary}\n\nNew lines:\n{lines}"),
+        ])
+
+    def summarize(self, summary: str, messages: Sequence[BaseMessage]) -> str:
+        """Return the summary extended with ``messages``"""
+        chain = self.prompt | self._get_llm() | StrOutputParser()
+        return chain.invoke(
+            {"summary": summary or "(empty)", "lines": get_buffer_string(list(messages))},
+            config={"callbacks": [SUMMARY_LLM_TIMER]}
+        ).strip()
+
+    def submit(self, func: Callable[[], None]) -> None:
+        """Run a compaction off the request path"""
+        self._executor.submit(func)
+
+    def shutdown(self) -> None:
+        """Stop the summarization thread"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BoundedChatHistory(BaseChatMessageHistory):
+    """
+    Chat history that keeps recent turns verbatim and summarizes the rest.
+
+    ``messages`` is what the prompts see. It returns the running summary as
+    a system message, followed by the most recent turns, up to ``max_turns``
+    and ``token_budget`` tokens. Once older turns fall outside that window
+    they are folded into the summary in the background. Until that finishes
+    they are only left out of the prompts, so prompt size stays bounded
+    without waiting on the summarization call.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[HistorySummarizer],
+        token_budget: int,
+        max_turns: int,
+        summary: str = "",
+        messages: Optional[List[BaseMessage]] = None
+    ):
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary = summary
+        self._messages: List[BaseMessage] = list(messages or [])
+        self._lock = threading.Lock()
+        self._compacting = False
+
+    def _window_start(self) -> int:
+        """Index of the first message kept verbatim"""
+        tokens = 0
+        start = len(self._messages)
+        for i in range(len(self._messages) - 1, -1, -1):
+            tokens += message_tokens(self._messages[i])
+            if tokens > self.token_budget or len(self._messages) - i > self.max_turns * 2:
+                break
+            start = i
+        # Never open the window with an answer whose question was cut off
+        while start < len(self._messages) and self._messages[start].type != "human":
+            start += 1
+        return start
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Summary plus the recent turns that fit the budget"""
+        with self._lock:
+            window = self._messages[self._window_start():]
+            summary = self.summary
+        if summary:
+            return [SystemMessage(content=SUMMARY_PREFIX + summary)] + window
+        return window
+
+    @property
+    def stored_messages(self) -> List[BaseMessage]:
+        """Every message not yet folded into the summary"""
+        with self._lock:
+            return list(self._messages)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append messages and schedule compaction once turns leave the window"""
+        with self._lock:
+            self._messages.extend(messages)
+            self._stored(messages)
+            needs_compaction = self._window_start() > 0 and not self._compacting
+            if needs_compaction and self.summarizer is None:
+                # Nothing to summarize with; just drop what no prompt will see
+                dropped = self._window_start()
+                del self._messages[:dropped]
+                self._folded(dropped, self.summary)
+                needs_compaction = False
+            if needs_compaction:
+                self._compacting = True
+        if needs_compaction:
+            self.summarizer.submit(self._compact)
+
+    def _compact(self) -> None:
+        with self._lock:
+            folded = self._messages[:self._window_start()]
+            summary = self.summary
+        if not folded:
+            with self._lock:
+                self._compacting = False
+            return
+
+        try:
+            new_summary = self.summarizer.summarize(summary, folded)
+        except Exception as e:
+            print(f"Warning: Could not summarize chat history: {e}")
+            with self._lock:
+                self._compacting = False
+            return
+
+        with self._lock:
+            # Messages are only ever appended, so the folded ones are still the prefix
+            if len(self._messages) >= len(folded) and all(a is b for a, b in zip(self._messages, folded)):
+                del self._messages[:len(folded)]
+                self.summary = new_summary
+                self._folded(len(folded), new_summary)
+            more = self._window_start() > 0
+            self._compacting = more
+        if more:
+            self.summarizer.submit(self._compact)
+
+    def _stored(self, messages: Sequence[BaseMessage]) -> None:
+        """Called with the lock held after messages are appended"""
+
+    def _folded(self, count: int, summary: str) -> None:
+        """Called with the lock held after the first ``count`` messages left the history"""
+
+    def clear(self) -> None:
+        """Remove all messages and the summary"""
+        with self._lock:
+            self._messages = []
+            self.summary = ""
+
+    def footprint(self) -> Dict[str, int]:
+        """Stored size and per-prompt token cost of the history"""
+        prompt_messages = self.messages
+        with self._lock:
+            stored = list(self._messages)
+            summary = self.summary
+        return {
+            "messages": len(stored),
+            "stored_tokens": sum(message_tokens(m) for m in stored) + estimate_tokens(summary),
+            "prompt_tokens": sum(message_tokens(m) for m in prompt_messages),
+            "summary_tokens": estimate_tokens(summary) if summary else 0,
+            "bytes": sum(len(str(m.content)) + 200 for m in stored) + len(summary),
+        }
+
+
+class PersistentChatHistory(BoundedChatHistory):
+    """
+    Bounded history mirrored message by message to a shared state backend.
+
+    Every appended message is written to the backend, and compaction folds
+    the same messages there. So any worker process can pick the
+    conversation up. ``stale`` reports when another worker has appended
+    since this copy was loaded, and the owner should then reload it.
+    """
+
+    def __init__(
+        self,
+        backend,
+        session_id: str,
+        summarizer: Optional[HistorySummarizer],
+        token_budget: int,
+        max_turns: int
+    ):
+        summary, rows, history_seq = backend.load_history(session_id)
+        super().__init__(summarizer, token_budget, max_turns, summary, [message for _, message in rows])
+        self.backend = backend
+        self.session_id = session_id
+        self._seqs: List[int] = [seq for seq, _ in rows]
+        self.synced_seq = history_seq
+
+    def stale(self) -> bool:
+        """Whether the backend has messages this copy has not seen"""
+        return self.backend.history_seq(self.session_id) != self.synced_seq
+
+    def _stored(self, messages: Sequence[BaseMessage]) -> None:
+        seqs, previous = self.backend.append_messages(self.session_id, list(messages))
+        self._seqs.extend(seqs)
+        # If another worker appended in between, make the next access reload
+        self.synced_seq = seqs[-1] if seqs and previous == self.synced_seq else -2
+
+    def _folded(self, count: int, summary: str) -> None:
+        if count:
+            self.backend.fold_history(self.session_id, summary, self._seqs[count - 1])
+            del self._seqs[:count]
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self._seqs = []
+        self.backend.delete_history(self.session_id)
@@ -0,0 +1,114 @@
+"""
+Hybrid Lexical and Dense Retrieval
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from backend.services.lexical_index import LexicalIndex
+from backend.services.mmr import aembed_query, embed_query, maximal_marginal_relevance
+
+
+def _normalize_scores(scores: np.ndarray) -> np.ndarray:
+    """Min-max scale scores to [0, 1]"""
+    spread = scores.max() - scores.min() if len(scores) else 0.0
+    if spread <= 0:
+        return np.ones_like(scores) if len(scores) and scores.max() > 0 else np.zeros_like(scores)
+    return (scores - scores.min()) / spread
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves by fusing BM25 and dense similarity, then diversifies with MMR.
+
+    Candidates are the union of the top ``fetch_k`` dense and lexical hits.
+    Each one is scored both ways. Dense scores are the dot products of the
+    stored (normalized) vectors with the query. The min-max normalized
+    scores are blended as ``alpha * dense + (1 - alpha) * lexical`` and MMR
+    runs on the blend. With ``prefilter`` the dense search is skipped
+    entirely: the top ``prefilter_k`` lexical hits are the candidate set.
+    It falls back to the dense search when fewer than ``k`` lexical hits
+    exist. Dense scores use ``exact_vectors``, the float32 originals, when
+    the index stores quantized codes.
+    """
+
+    vector_store: FAISS
+    lexical_index: LexicalIndex
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    alpha: float = 0.5
+    prefilter: bool = False
+    prefilter_k: int = 200
+    exact_vectors: Optional[np.ndarray] = None
+
+    _positions: Dict[str, int] = PrivateAttr(default=None)
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _position_map(self) -> Dict[str, int]:
+        """Docstore id -> index position, built once per store"""
+        if self._positions is None:
+            self._positions = {
+                doc_id: position
+                for position, doc_id in self.vector_store.index_to_docstore_id.items()
+            }
+        return self._positions
+
+    def _candidates(self, query: str, query_vector: np.ndarray) -> List[str]:
+        if self.prefilter:
+            hits = self.lexical_index.search(query, self.prefilter_k)
+            if len(hits) >= self.k:
+                return [doc_id for doc_id, _ in hits]
+
+        _, positions = self.vector_store.index.search(query_vector[None, :], self.fetch_k)
+        dense_ids = [
+            self.vector_store.index_to_docstore_id[int(position)]
+            for position in positions[0] if position != -1
+        ]
+        lexical_ids = [doc_id for doc_id, _ in self.lexical_index.search(query, self.fetch_k)]
+        return list(dict.fromkeys(dense_ids + lexical_ids))
+
+    def _search(self, query: str, query_vector: List[float]) -> List[Document]:
+        query_array = np.asarray(query_vector, dtype=np.float32)
+        positions = self._position_map()
+        candidate_ids = [
+            doc_id for doc_id in self._candidates(query, query_array)
+            if doc_id in positions
+        ]
+        if not candidate_ids:
+            return []
+
+        index = self.vector_store.index
+        candidate_positions = np.array([positions[doc_id] for doc_id in candidate_ids], dtype=np.int64)
+        if self.exact_vectors is not None and candidate_positions.max() < len(self.exact_vectors):
+            vectors = np.asarray(self.exact_vectors[candidate_positions], dtype=np.float32)
+        else:
+            vectors = index.reconstruct_batch(candidate_positions)
+        dense = _normalize_scores(vectors @ query_array)
+        lexical = _normalize_scores(np.asarray(self.lexical_index.score(query, candidate_ids), dtype=np.float32))
+        fused = self.alpha * dense + (1 - self.alpha) * lexical
+
+        # MMR only over the best fused candidates
+        top = np.argsort(-fused)[:max(self.fetch_k, self.k)]
+        selected = maximal_marginal_relevance(fused[top], vectors[top], self.k, self.lambda_mult)
+        docs = [self.vector_store.docstore.search(candidate_ids[top[i]]) for i in selected]
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        query_vector = embed_query(self.vector_store.embedding_function, query)
+        return self._search(query, query_vector)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        query_vector = await aembed_query(self.vector_store.embedding_function, query)
+        return await asyncio.to_thread(self._search, query, query_vector)
@@ -0,0 +1,137 @@
+"""
+FAISS Index Types
+"""
+import math
+from dataclasses import dataclass
+
+import faiss
+import numpy as np
+
+from backend.config import settings
+
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+# How vectors are encoded inside the index; ivf_pq always uses product quantization
+STORAGE_TYPES = ("float32", "fp16", "sq8", "pq")
+
+# FAISS recommends at least ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+@dataclass
+class IndexParams:
+    """Build and search parameters for approximate index types"""
+    hnsw_m: int = 32
+    ef_construction: int = 80
+    ef_search: int = 64
+    nprobe: int = 16
+    pq_m: int = 48
+    storage: str = "float32"
+
+    @classmethod
+    def from_settings(cls) -> "IndexParams":
+        return cls(
+            hnsw_m=settings.INDEX_HNSW_M,
+            ef_construction=settings.INDEX_HNSW_EF_CONSTRUCTION,
+            ef_search=settings.INDEX_HNSW_EF_SEARCH,
+            nprobe=settings.INDEX_NPROBE,
+            pq_m=settings.INDEX_PQ_M,
+            storage=settings.INDEX_STORAGE
+        )
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Name of an index's type as used in settings"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def is_quantized(index: faiss.Index) -> bool:
+    """Whether an index stores lossy codes rather than float32 vectors"""
+    try:
+        return index.sa_code_size() < index.d * 4
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def _nlist(count: int) -> int:
+    """Number of IVF lists for ``count`` vectors, capped so training stays well-posed"""
+    nlist = int(4 * math.sqrt(count))
+    return max(1, min(nlist, count // MIN_POINTS_PER_CENTROID, 65536))
+
+
+def prepare_index(index: faiss.Index, params: IndexParams) -> faiss.Index:
+    """Apply search parameters and enable reconstruction by id"""
+    index_type = index_type_of(index)
+    if index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efSearch = params.ef_search
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = params.nprobe
+        # MMR and hybrid retrieval reconstruct stored vectors by position
+        ivf.make_direct_map(True)
+    return index
+
+
+def _storage_spec(storage: str, params: IndexParams) -> str:
+    """index_factory suffix encoding vectors as ``storage``"""
+    return {
+        "float32": "Flat",
+        "fp16": "SQfp16",
+        "sq8": "SQ8",
+        "pq": f"PQ{params.pq_m}x8",
+    }[storage]
+
+
+def min_training_vectors(index_type: str, params: IndexParams) -> int:
+    """Fewest vectors ``build_index`` can train an ``index_type`` index on"""
+    storage = "pq" if index_type == "ivf_pq" else params.storage
+    # Each PQ sub-quantizer learns 256 centroids
+    min_points = 256 if storage == "pq" else 1
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # _nlist keeps enough points per list for any count past this
+        min_points *= MIN_POINTS_PER_CENTROID
+    return min_points
+
+
+def build_index(vectors: np.ndarray, index_type: str, params: IndexParams) -> faiss.Index:
+    """
+    Build an L2 index of ``index_type`` holding ``vectors`` in order
+
+    Vectors are encoded as ``params.storage``. Quantized encodings and IVF
+    types are trained on the vectors themselves. A ValueError is raised
+    when there are too few vectors to train one.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    if params.storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown index storage {params.storage!r}; expected one of {STORAGE_TYPES}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    storage = "pq" if index_type == "ivf_pq" else params.storage
+    if storage == "pq" and dimension % params.pq_m:
+        raise ValueError(f"INDEX_PQ_M={params.pq_m} must divide the dimension {dimension}")
+
+    min_points = min_training_vectors(index_type, params)
+    if index_type == "flat":
+        spec = _storage_spec(storage, params)
+    elif index_type == "hnsw":
+        spec = f"HNSW{params.hnsw_m},{_storage_spec(storage, params)}"
+    else:
+        spec = f"IVF{_nlist(count)},{_storage_spec(storage, params)}"
+    if count < min_points:
+        raise ValueError(f"{index_type} with {storage} storage needs at least {min_points} vectors, got {count}")
+
+    index = faiss.index_factory(dimension, spec, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = params.ef_construction
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return prepare_index(index, params)
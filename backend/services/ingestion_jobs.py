@@ -0,0 +1,128 @@
+"""
+Background PDF Ingestion Jobs
+"""
+import uuid
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+from backend.config import settings
+from backend.models import FileProgress, IngestionJobResponse
+from backend.services.pdf_intake import UploadBuffer
+
+
+class IngestionJobManager:
+    """
+    Runs PDF ingestion in the background with bounded concurrency.
+
+    Jobs are queued on submit and picked up by at most
+    INGEST_MAX_CONCURRENT_JOBS at a time. Their parse, embed and index work
+    additionally goes through the PDF service's bounded executor, so
+    ingestion cannot starve chat traffic. Each file is indexed as soon as it
+    is embedded, so the session becomes queryable while later files are
+    still being processed.
+
+    With a session state backend, job progress is also published there, so
+    a status poll answered by another API worker finds the job too.
+    """
+
+    PUBLISH_INTERVAL_SECONDS = 1.0
+
+    def __init__(self, pdf_service, max_concurrent_jobs: int, max_jobs_retained: int):
+        self.pdf_service = pdf_service
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_jobs_retained = max_jobs_retained
+        # Created lazily so it binds to the server's running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: "OrderedDict[str, IngestionJobResponse]" = OrderedDict()
+        # Strong references so running tasks are not garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, session_id: str, files: List[Tuple[str, UploadBuffer]]) -> IngestionJobResponse:
+        """Queue (filename, buffer) pairs for ingestion and return the new job"""
+        job = IngestionJobResponse(
+            job_id=uuid.uuid4().hex,
+            session_id=session_id,
+            files=[FileProgress(filename=filename) for filename, _ in files],
+            created_at=datetime.now().isoformat()
+        )
+        self._jobs[job.job_id] = job
+        self._prune()
+
+        task = asyncio.create_task(self._run(job, files))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        # ingest_files closes the buffers, but a job cancelled while queued
+        # (e.g. at shutdown) never gets there; closing twice is harmless
+        task.add_done_callback(lambda _: self._close_buffers(files))
+        return job
+
+    @staticmethod
+    def _close_buffers(files: List[Tuple[str, UploadBuffer]]) -> None:
+        for _, buffer in files:
+            buffer.close()
+
+    def get(self, job_id: str) -> Optional[IngestionJobResponse]:
+        """Get a job by id, looking in the state backend for jobs of other workers"""
+        job = self._jobs.get(job_id)
+        backend = self.pdf_service.state_backend
+        if job is None and backend is not None:
+            data = backend.load_job(job_id)
+            if data is not None:
+                job = IngestionJobResponse.model_validate(data)
+        return job
+
+    def _publish(self, job: IngestionJobResponse) -> None:
+        """Store a job's current state in the state backend, if there is one"""
+        backend = self.pdf_service.state_backend
+        if backend is None:
+            return
+        try:
+            backend.save_job(job.job_id, job.model_dump())
+            if job.finished_at:
+                backend.prune_jobs(self.max_jobs_retained)
+        except Exception as e:
+            print(f"Warning: Could not publish ingestion job {job.job_id}: {e}")
+
+    async def _publish_progress(self, job: IngestionJobResponse) -> None:
+        """Publish a running job's per-file progress until cancelled"""
+        while True:
+            await asyncio.sleep(self.PUBLISH_INTERVAL_SECONDS)
+            await asyncio.to_thread(self._publish, job)
+
+    async def _run(self, job: IngestionJobResponse, files: List[Tuple[str, UploadBuffer]]) -> None:
+        # Published off the event loop, before waiting for a slot
+        await asyncio.to_thread(self._publish, job)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+        async with self._semaphore:
+            job.status = "running"
+            await asyncio.to_thread(self._publish, job)
+            progress = asyncio.create_task(self._publish_progress(job))
+            try:
+                response = await self.pdf_service.ingest_files(job.session_id, files, job.files)
+                job.total_chunks = response.total_chunks or 0
+                failed = [f for f in job.files if f.status == "failed"]
+                if failed and len(failed) == len(job.files):
+                    job.status = "failed"
+                    job.error = "All files failed to process"
+                elif failed:
+                    job.status = "completed_with_errors"
+                else:
+                    job.status = "completed"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                progress.cancel()
+                job.finished_at = datetime.now().isoformat()
+                await asyncio.to_thread(self._publish, job)
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the retention limit"""
+        excess = len(self._jobs) - self.max_jobs_retained
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at][:excess]:
+            del self._jobs[job_id]
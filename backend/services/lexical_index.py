@@ -0,0 +1,122 @@
+"""
+Incremental BM25 Lexical Index
+"""
+import re
+import math
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+class LexicalIndex:
+    """
+    Per-session BM25 inverted index over chunk texts, keyed by docstore id.
+
+    Adding documents returns a new index instead of mutating this one. Only
+    the posting lists of the touched terms are copied, so searches running
+    against the previous version, like the copy-on-write FAISS store it
+    mirrors, never see a half-applied update.
+
+    Tokens keep identifier-like strings intact ("iso-9001", "4.2.1",
+    "ab_1234") and also index their parts, so part numbers and clause ids
+    match exactly as well as loosely.
+    """
+
+    TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._/-][a-z0-9]+)*")
+    PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """Split text into lowercase terms, keeping compound identifiers"""
+        tokens = []
+        for token in cls.TOKEN_PATTERN.findall(text.lower()):
+            tokens.append(token)
+            parts = cls.PART_PATTERN.findall(token)
+            if len(parts) > 1:
+                tokens.extend(parts)
+        return tokens
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[str, str]]) -> "LexicalIndex":
+        """Build an index from (doc_id, text) pairs"""
+        ids, texts = [], []
+        for doc_id, text in documents:
+            ids.append(doc_id)
+            texts.append(text)
+        return cls().with_documents(ids, texts)
+
+    def with_documents(self, doc_ids: Sequence[str], texts: Sequence[str]) -> "LexicalIndex":
+        """Return a new index that also contains the given documents"""
+        index = LexicalIndex(self.k1, self.b)
+        index.postings = dict(self.postings)
+        index.doc_lengths = dict(self.doc_lengths)
+        index.total_length = self.total_length
+
+        copied = set()
+        for doc_id, text in zip(doc_ids, texts):
+            terms = Counter(self.tokenize(text))
+            length = sum(terms.values())
+            index.doc_lengths[doc_id] = length
+            index.total_length += length
+            for term, count in terms.items():
+                if term not in copied:
+                    index.postings[term] = dict(index.postings.get(term, {}))
+                    copied.add(term)
+                index.postings[term][doc_id] = count
+        return index
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - df + 0.5) / (df + 0.5))
+
+    def _term_score(self, tf: int, idf: float, doc_length: int, avg_length: float) -> float:
+        norm = self.k1 * (1 - self.b + self.b * doc_length / avg_length)
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top ``k`` (doc_id, BM25 score) pairs for a query"""
+        if not self.doc_lengths:
+            return []
+        avg_length = self.total_length / len(self.doc_lengths) or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(self.tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for doc_id, tf in postings.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + self._term_score(
+                    tf, idf, self.doc_lengths[doc_id], avg_length
+                )
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def score(self, query: str, doc_ids: Sequence[str]) -> List[float]:
+        """BM25 scores of specific documents for a query"""
+        if not self.doc_lengths:
+            return [0.0] * len(doc_ids)
+        avg_length = self.total_length / len(self.doc_lengths) or 1.0
+        terms = [(self.postings.get(term, {}), self._idf(term)) for term in set(self.tokenize(query))]
+        scores = []
+        for doc_id in doc_ids:
+            doc_length = self.doc_lengths.get(doc_id, 0)
+            scores.append(sum(
+                self._term_score(postings[doc_id], idf, doc_length, avg_length)
+                for postings, idf in terms
+                if doc_id in postings
+            ))
+        return scores
+
+    def estimate_bytes(self) -> int:
+        """Rough resident size of the posting lists"""
+        entries = sum(len(postings) for postings in self.postings.values())
+        return entries * 60 + len(self.postings) * 100 + len(self.doc_lengths) * 100
@@ -0,0 +1,66 @@
+"""
+Pooled LLM Clients
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import httpx
+from langchain_groq import ChatGroq
+
+from backend.config import settings
+
+
+class LLMPool:
+    """
+    Cache of ChatGroq clients keyed by (model, temperature, max_tokens).
+
+    Every client shares one sync and one async httpx connection pool, so
+    requests reuse keep-alive connections to Groq instead of paying a TLS
+    handshake per call, whatever their generation parameters.
+    """
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        limits = httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+        )
+        self.http_client = httpx.Client(limits=limits, timeout=settings.LLM_TIMEOUT)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=settings.LLM_TIMEOUT)
+        self._clients: "OrderedDict[Tuple[str, float, int], ChatGroq]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, temperature: float, max_tokens: int, model_name: Optional[str] = None) -> ChatGroq:
+        """Get a configured LLM instance, reusing a cached one when possible"""
+        key = (model_name or settings.MODEL_NAME, temperature, max_tokens)
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is not None:
+                self._clients.move_to_end(key)
+                return llm
+
+            llm = ChatGroq(
+                groq_api_key=settings.GROQ_API_KEY,
+                model_name=key[0],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client
+            )
+            self._clients[key] = llm
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            return llm
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP connection pools"""
+        with self._lock:
+            self._clients.clear()
+        self.http_client.close()
+        await self.http_async_client.aclose()
+
+
+# Global LLM pool shared by all services
+llm_pool = LLMPool(max_clients=settings.LLM_CLIENT_CACHE_SIZE)
@@ -0,0 +1,175 @@
+"""
+Batched Maximal Marginal Relevance Retrieval
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+
+# Query text and vector the chat handler already embedded for the answer cache
+_QUERY_VECTOR: ContextVar[Optional[Tuple[str, List[float]]]] = ContextVar("query_vector", default=None)
+
+
+@contextmanager
+def known_query_vector(query: str, vector: Optional[List[float]]) -> Iterator[None]:
+    """
+    Let retrievers reuse ``vector`` for ``query`` instead of embedding it again
+
+    Applies to the chain runs inside the block, including tasks they start.
+    A rewritten question differs from ``query`` and is still embedded.
+    """
+    token = _QUERY_VECTOR.set((query, vector) if vector is not None else None)
+    try:
+        yield
+    finally:
+        try:
+            _QUERY_VECTOR.reset(token)
+        except ValueError:
+            # A streaming generator closed from another task; the value dies with its context
+            pass
+
+
+def embed_query(embeddings: Embeddings, query: str) -> List[float]:
+    known = _QUERY_VECTOR.get()
+    if known is not None and known[0] == query:
+        return known[1]
+    return embeddings.embed_query(query)
+
+
+async def aembed_query(embeddings: Embeddings, query: str) -> List[float]:
+    known = _QUERY_VECTOR.get()
+    if known is not None and known[0] == query:
+        return known[1]
+    return await embeddings.aembed_query(query)
+
+
+def maximal_marginal_relevance(
+    relevance: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_mult: float
+) -> List[int]:
+    """
+    Greedy MMR selection over precomputed relevance scores
+
+    The candidate similarity matrix is computed once up front. Each step is
+    then a vectorized update of every candidate's maximum similarity to the
+    selection so far, so the cost per step is O(candidates) regardless of
+    the embedding dimension.
+    """
+    count = len(relevance)
+    similarity = vectors @ vectors.T
+    selected: List[int] = []
+    # Highest similarity of each candidate to anything selected so far
+    max_similarity = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    for _ in range(min(k, count)):
+        penalty = max_similarity if selected else 0.0
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def search_with_vectors(index: faiss.Index, query: np.ndarray, fetch_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top ``fetch_k`` positions and their stored vectors in one FAISS call
+
+    Falls back to a batched reconstruct for index types that do not
+    implement search_and_reconstruct.
+    """
+    fetch_k = min(fetch_k, index.ntotal)
+    try:
+        _, positions, vectors = index.search_and_reconstruct(query[None, :], fetch_k)
+        found = positions[0] != -1
+        return positions[0][found], vectors[0][found]
+    except RuntimeError:
+        _, positions = index.search(query[None, :], fetch_k)
+        positions = positions[0][positions[0] != -1]
+        return positions, index.reconstruct_batch(positions)
+
+
+def rerank_exact(
+    positions: np.ndarray,
+    vectors: np.ndarray,
+    query: np.ndarray,
+    exact_vectors: Optional[np.ndarray],
+    keep: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-score candidates of a quantized index against their float32 vectors
+
+    Returns the ``keep`` closest candidates with their exact vectors, or the
+    first ``keep`` unchanged when no exact vectors cover them.
+    """
+    if exact_vectors is None or not len(positions) or positions.max() >= len(exact_vectors):
+        return positions[:keep], vectors[:keep]
+    exact = np.asarray(exact_vectors[positions], dtype=np.float32)
+    distances = ((exact - query) ** 2).sum(axis=1)
+    closest = np.argsort(distances)[:keep]
+    return positions[closest], exact[closest]
+
+
+class MMRRetriever(BaseRetriever):
+    """
+    Dense retriever that runs MMR on the vectors stored in a FAISS index.
+
+    LangChain's FAISS MMR path re-scores the candidates in a Python loop,
+    which kept ``fetch_k`` small. Here the candidates and their vectors come
+    back from a single search_and_reconstruct call. Relevance is the dot
+    product with the (normalized) query, and selection uses a precomputed
+    candidate similarity matrix. Only the ``k`` selected chunks are looked
+    up in the docstore, so pools of several hundred candidates stay cheap.
+
+    With a quantized index, ``exact_vectors`` holds the original float32
+    vectors by position. ``oversample`` times the pool is fetched, then
+    re-ranked exactly and cut back to ``fetch_k`` before MMR.
+    """
+
+    vector_store: FAISS
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    exact_vectors: Optional[np.ndarray] = None
+    oversample: int = 1
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _search(self, query_vector: List[float]) -> List[Document]:
+        query = np.asarray(query_vector, dtype=np.float32)
+        pool = max(self.fetch_k, self.k)
+        if self.exact_vectors is None:
+            positions, vectors = search_with_vectors(self.vector_store.index, query, pool)
+        else:
+            positions, vectors = search_with_vectors(self.vector_store.index, query, pool * self.oversample)
+            positions, vectors = rerank_exact(positions, vectors, query, self.exact_vectors, pool)
+        if not len(positions):
+            return []
+        selected = maximal_marginal_relevance(vectors @ query, vectors, self.k, self.lambda_mult)
+        docs = [
+            self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[int(positions[i])])
+            for i in selected
+        ]
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._search(embed_query(self.vector_store.embedding_function, query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        query_vector = await aembed_query(self.vector_store.embedding_function, query)
+        return await asyncio.to_thread(self._search, query_vector)
@@ -0,0 +1,174 @@
+"""
+Streaming PDF Upload Intake
+"""
+import os
+import mmap
+import shutil
+import hashlib
+import tempfile
+from typing import List, Optional, Tuple
+
+from fastapi import UploadFile, HTTPException
+
+from backend.config import settings
+
+
+MB = 1024 * 1024
+SHM_DIR = "/dev/shm"
+
+
+def _buffer_dir(size: int) -> Optional[str]:
+    """
+    Directory to hold an upload of ``size`` bytes
+
+    /dev/shm keeps it in RAM, but containers often cap it at 64 MB, so it is
+    only used with room to spare. Otherwise the upload goes to a temporary
+    file on disk, which the page cache keeps hot anyway.
+    """
+    if os.path.isdir(SHM_DIR):
+        try:
+            if shutil.disk_usage(SHM_DIR).free >= 2 * size + settings.PDF_INTAKE_CHUNK_BYTES:
+                return SHM_DIR
+        except OSError:
+            pass
+    return None
+
+
+class UploadBuffer:
+    """
+    An uploaded file held in a memory-mapped file.
+
+    The file lives in /dev/shm when it has room, otherwise in the temporary
+    directory. Parser worker processes open it by path, so MuPDF reads the
+    PDF straight from the mapping; it is never copied into a worker's memory
+    or pickled across the process boundary. A SHA-256 digest is computed
+    while the upload is streamed in; it dedupes files within a session and
+    keys content shared across sessions, where an MD5 collision could be
+    crafted. Call close() once the content is no longer needed.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.sha256: Optional[str] = None
+        fd, self.path = tempfile.mkstemp(prefix="pdf-upload-", suffix=".pdf", dir=_buffer_dir(size))
+        try:
+            os.ftruncate(fd, max(size, 1))
+            self._mmap: Optional[mmap.mmap] = mmap.mmap(fd, max(size, 1))
+        except Exception:
+            os.remove(self.path)
+            raise
+        finally:
+            os.close(fd)
+
+    def view(self) -> memoryview:
+        """Zero-copy view of the content"""
+        return memoryview(self._mmap)[:self.size]
+
+    def truncate(self, size: int) -> None:
+        """Shrink the buffer to the ``size`` bytes actually received"""
+        if size < self.size:
+            self._mmap.resize(max(size, 1))
+        self.size = size
+
+    def close(self) -> None:
+        """Unmap and delete the file"""
+        if self._mmap is None:
+            return
+        self._mmap.close()
+        self._mmap = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> "UploadBuffer":
+        """Create a buffer holding already-read content"""
+        buffer = cls(len(content))
+        buffer._mmap[:len(content)] = content
+        buffer.sha256 = hashlib.sha256(content).hexdigest()
+        return buffer
+
+
+def _too_large(filename: str, limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"{filename} exceeds the upload limit of {limit // MB} MB"
+    )
+
+
+async def read_upload(file: UploadFile, max_bytes: int) -> UploadBuffer:
+    """
+    Stream an upload into a memory-mapped buffer, hashing it incrementally
+
+    The declared size is checked before anything is buffered; the running
+    size is checked again while streaming in case the declaration was wrong.
+    """
+    chunk_size = settings.PDF_INTAKE_CHUNK_BYTES
+
+    if file.size is not None:
+        if file.size > max_bytes:
+            raise _too_large(file.filename, max_bytes)
+        buffer = UploadBuffer(file.size)
+        sha256 = hashlib.sha256()
+        position = 0
+        try:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                if position + len(chunk) > file.size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"{file.filename} is larger than its declared size"
+                    )
+                sha256.update(chunk)
+                buffer.view()[position:position + len(chunk)] = chunk
+                position += len(chunk)
+        except Exception:
+            buffer.close()
+            raise
+        buffer.truncate(position)
+        buffer.sha256 = sha256.hexdigest()
+        return buffer
+
+    # Size unknown up front: stream with a running limit, then copy once
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise _too_large(file.filename, max_bytes)
+        chunks.append(chunk)
+    return UploadBuffer.from_bytes(b"".join(chunks))
+
+
+async def read_uploads(files: List[UploadFile]) -> List[Tuple[str, UploadBuffer]]:
+    """Read every PDF in a request, enforcing per-file and per-request size limits"""
+    max_file_bytes = settings.PDF_MAX_FILE_MB * MB
+    max_request_bytes = settings.PDF_MAX_REQUEST_MB * MB
+    pdfs = [file for file in files if file.filename.endswith('.pdf')]
+
+    declared = sum(file.size or 0 for file in pdfs)
+    if declared > max_request_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload exceeds the request limit of {settings.PDF_MAX_REQUEST_MB} MB"
+        )
+
+    buffers = []
+    total = 0
+    try:
+        for file in pdfs:
+            remaining = max_request_bytes - total
+            buffer = await read_upload(file, min(max_file_bytes, remaining))
+            buffers.append((file.filename, buffer))
+            total += buffer.size
+    except Exception:
+        for _, buffer in buffers:
+            buffer.close()
+        raise
+    return buffers
@@ -2,24 +2,66 @@
 PDF Processing and Chat Service
 """
 import os
-import tempfile
+import json
+import time
+import shutil
 import hashlib
-from typing import Dict, List, Set
+import tempfile
+import asyncio
+import weakref
+import threading
+import dataclasses
+from datetime import datetime
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
 from fastapi import UploadFile, HTTPException
 
+import faiss
+import numpy as np
+
 from langchain_groq import ChatGroq
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
 from backend.config import settings
-from backend.models import ChatRequest, UploadResponse, ChatResponse, SourceInfo
+from backend.metrics import (
+    ANSWER_LLM_TIMER, INDEX_VECTORS, SESSION_EVICTIONS, SESSION_MEMORY_BYTES,
+    SESSIONS, STAGE_SECONDS
+)
+from backend.models import (
+    ChatRequest, UploadResponse, ChatResponse, SourceInfo, FileProgress,
+    SessionInfo, SessionListResponse
+)
+from backend.services.embedding_cache import CachedChunk, EmbeddingCache
+from backend.services.embedding_batcher import BatchingEmbeddings
+from backend.services.embedding_backends import create_embeddings, warm_up
+from backend.services.state_backend import SessionStateBackend, create_state_backend
+from backend.services.llm_pool import llm_pool
+from backend.services.pdf_parser import PDFParser
+from backend.services.pdf_intake import UploadBuffer, read_uploads
+from backend.services.session_manager import SessionManager
+from backend.services.question_rewriter import QuestionRewriter
+from backend.services.answer_cache import AnswerCache, CachedAnswer
+from backend.services.history_manager import BoundedChatHistory, HistorySummarizer, PersistentChatHistory
+from backend.services.context_assembler import ContextAssembler
+from backend.services.lexical_index import LexicalIndex
+from backend.services.hybrid_retriever import HybridRetriever
+from backend.services.mmr import MMRRetriever, known_query_vector
+from backend.services.chunk_store import ChunkStore, SharedDocstore
+from backend.services.index_factory import (
+    IndexParams, build_index, index_type_of, is_quantized, min_training_vectors, prepare_index
+)
+from backend.services.vector_file import FloatVectorFile
 
 
 class PDFService:
@@ -27,36 +69,638 @@ class PDFService:
     
     def __init__(self):
         self.vector_stores: Dict[str, FAISS] = {}
-        self.chat_histories: Dict[str, ChatMessageHistory] = {}
+        self.chat_histories: Dict[str, BoundedChatHistory] = {}
         self.processed_files: Dict[str, Set] = {}
-        self.embeddings = self._initialize_embeddings()
+        # BM25 indexes mirroring each vector store, loaded or built on first use
+        self.lexical_indexes: Dict[str, LexicalIndex] = {}
+        # Chunk texts and metadata, stored once however many sessions index them
+        self.chunk_store = ChunkStore()
+        # All embedding calls, from uploads and retriever queries alike, are
+        # coalesced into shared micro-batches
+        self.embeddings = BatchingEmbeddings(
+            self._initialize_embeddings(),
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+        )
+        separators = ["\n\n", "\n", ". ", " ", ""]
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            separators=separators,
+            length_function=len
+        )
+        self.embedding_cache = EmbeddingCache(
+            max_chunks=settings.EMBEDDING_CACHE_MAX_CHUNKS,
+            splitter_settings={
+                "chunk_size": settings.CHUNK_SIZE,
+                "chunk_overlap": settings.CHUNK_OVERLAP,
+                "separators": separators,
+            },
+            embedding_settings={
+                "model": settings.EMBEDDING_MODEL,
+                "backend": settings.EMBEDDING_BACKEND,
+                "normalize": True,
+            }
+        )
+        # Shared with every worker process serving the API
+        self.state_backend: Optional[SessionStateBackend] = (
+            create_state_backend(settings.SESSION_STATE_BACKEND, settings.SESSION_STORE_DIR)
+            if settings.SESSION_PERSISTENCE_ENABLED else None
+        )
+        # Backend version each resident session was loaded or saved at
+        self._versions: Dict[str, int] = {}
+        # Sessions whose index is a read-only memory map of the file on disk
+        self._mmapped_sessions: Set[str] = set()
+        self.index_params = IndexParams.from_settings()
+        # Float32 originals of quantized indexes, used for exact re-ranking
+        self.float_vectors: Dict[str, FloatVectorFile] = {}
+        self._scratch_dir: Optional[str] = None
+        # Sessions migrating to an approximate index, and the tasks doing it
+        self._upgrading: Set[str] = set()
+        self._upgrade_tasks: Set[asyncio.Task] = set()
+        # CPU-bound ingestion (parse, split, embed, index, persist) runs here,
+        # off the event loop and bounded so it cannot take over the host
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.INGEST_MAX_WORKERS,
+            thread_name_prefix="pdf-ingest"
+        )
+        # A lock lives while it is held or awaited, so forgetting an idle
+        # session can never hand a second lock to a queued writer
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.pdf_parser = PDFParser(
+            max_workers=settings.PARSE_MAX_WORKERS,
+            pages_per_task=settings.PARSE_PAGES_PER_TASK
+        )
+        self.contextualize_q_prompt, self.qa_prompt = self._initialize_prompts()
+        self.history_summarizer = (
+            HistorySummarizer(
+                lambda: self._get_llm(0.0, settings.HISTORY_SUMMARY_MAX_TOKENS)
+            )
+            if settings.HISTORY_SUMMARY_ENABLED else None
+        )
+        self.question_rewriter = QuestionRewriter(
+            self.contextualize_q_prompt,
+            cache_size=settings.REWRITE_CACHE_SIZE,
+            history_window=settings.REWRITE_HISTORY_WINDOW
+        )
+        self.context_assembler = ContextAssembler(
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            min_tokens_per_page=settings.CONTEXT_MIN_TOKENS_PER_PAGE,
+            max_overlap=settings.CHUNK_OVERLAP
+        )
+        self.answer_cache = AnswerCache(
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY
+        )
+        # Built RAG chains keyed by (session_id, temperature, max_tokens, search_k, fetch_k, retrieval_mode)
+        self._chains: "OrderedDict[Tuple[str, float, int, int, int, str], RunnableWithMessageHistory]" = OrderedDict()
+        self._chains_lock = threading.Lock()
+        self.session_manager = SessionManager(
+            memory_budget_bytes=settings.SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+            idle_ttl_seconds=settings.SESSION_IDLE_TTL_SECONDS,
+            evict=self._evict_session
+        )
     
-    def _initialize_embeddings(self) -> HuggingFaceEmbeddings:
-        """Initialize HuggingFace embeddings"""
-        return HuggingFaceEmbeddings(
-            model_name=settings.EMBEDDING_MODEL,
-            model_kwargs={'device': settings.EMBEDDING_DEVICE},
-            encode_kwargs={'normalize_embeddings': True}
+    def _initialize_embeddings(self) -> Embeddings:
+        """Initialize embeddings on the configured backend (PyTorch or ONNX Runtime)"""
+        return create_embeddings(
+            settings.EMBEDDING_BACKEND,
+            settings.EMBEDDING_MODEL,
+            device=settings.EMBEDDING_DEVICE,
+            threads=settings.EMBEDDING_THREADS,
+            quantization=settings.EMBEDDING_ONNX_QUANTIZATION,
+            cache_dir=settings.EMBEDDING_ONNX_DIR
         )
     
+    def warm_up(self) -> None:
+        """Embed sample texts through the batcher so the first real request is not slowed"""
+        try:
+            warm_up(self.embeddings, settings.CHUNK_SIZE, settings.EMBEDDING_BATCH_MAX_SIZE)
+        except Exception as e:
+            print(f"Warning: Embedding warm-up failed: {e}")
+    
+    def _initialize_prompts(self) -> Tuple[ChatPromptTemplate, ChatPromptTemplate]:
+        """Build the question contextualization and QA prompts"""
+        # Contextualize question prompt
+        contextualize_q_system_prompt = """You are an expert at understanding questions in context.
+Reformulate the question to be standalone and clear, preserving all intent.
+Do not answer the question - only clarify it."""
+        
+        contextualize_q_prompt = ChatPromptTemplate.from_messages([
+            ("system", contextualize_q_system_prompt),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}"),
+        ])
+        
+        # QA prompt
+        qa_system_prompt = """You are an expert research assistant analyzing documents.
+
+Guidelines:
+1. Provide precise, professional answers based only on the provided context
+2. Cite sources with page numbers when possible
+3. If information is not in the documents, clearly state that
+4. Break complex answers into clear paragraphs
+5. Maintain conversation context
+
+Context:
+{context}"""
+        
+        qa_prompt = ChatPromptTemplate.from_messages([
+            ("system", qa_system_prompt),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}"),
+        ])
+        
+        return contextualize_q_prompt, qa_prompt
+    
     def _get_llm(self, temperature: float, max_tokens: int) -> ChatGroq:
         """Get configured LLM instance"""
-        return ChatGroq(
-            groq_api_key=settings.GROQ_API_KEY,
-            model_name=settings.MODEL_NAME,
-            temperature=temperature,
-            max_tokens=max_tokens
+        return llm_pool.get(temperature, max_tokens)
+    
+    async def _run_blocking(self, func: Callable, *args):
+        """Run a blocking call on the bounded ingestion executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+    
+    def _get_session_lock(self, session_id: str) -> asyncio.Lock:
+        """Get the lock serialising changes to a session's documents"""
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+    
+    @asynccontextmanager
+    async def _exclusive(self, session_id: str) -> AsyncIterator[None]:
+        """Hold a session's lock in this process and, with a state backend, in every worker"""
+        async with self._get_session_lock(session_id):
+            if self.state_backend is None:
+                yield
+                return
+            lock = self.state_backend.lock(session_id)
+            acquire = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+            try:
+                await asyncio.shield(acquire)
+            except asyncio.CancelledError:
+                # The thread may still get the lock; give it back when it does
+                acquire.add_done_callback(
+                    lambda f: lock.release() if not f.cancelled() and f.exception() is None else None
+                )
+                raise
+            try:
+                yield
+            finally:
+                lock.release()
+    
+    def _get_session_history(self, session_id: str) -> BoundedChatHistory:
+        """Get or create chat history for session, reloading it if another worker added to it"""
+        history = self.chat_histories.get(session_id)
+        if history is not None and not (isinstance(history, PersistentChatHistory) and history.stale()):
+            return history
+        if self.state_backend is not None:
+            history = PersistentChatHistory(
+                self.state_backend,
+                session_id,
+                self.history_summarizer,
+                token_budget=settings.HISTORY_TOKEN_BUDGET,
+                max_turns=settings.HISTORY_MAX_TURNS
+            )
+        else:
+            history = BoundedChatHistory(
+                self.history_summarizer,
+                token_budget=settings.HISTORY_TOKEN_BUDGET,
+                max_turns=settings.HISTORY_MAX_TURNS
+            )
+        self.chat_histories[session_id] = history
+        return history
+    
+    def _history_for_chain(self, session_id: str) -> BoundedChatHistory:
+        """
+        History factory of the RAG chains, called on the event loop
+        
+        Chat handlers load or refresh the history off the loop before every
+        turn, so this only falls back to a state backend read if that missed.
+        """
+        history = self.chat_histories.get(session_id)
+        return history if history is not None else self._get_session_history(session_id)
+    
+    @staticmethod
+    def _estimate_index_bytes(vector_store: FAISS) -> int:
+        """Estimate resident bytes of a FAISS index and its id mapping"""
+        index = vector_store.index
+        try:
+            code_size = index.sa_code_size()
+        except (AttributeError, RuntimeError):
+            code_size = index.d * 4
+        # Roughly 100 bytes per index_to_docstore_id entry
+        return index.ntotal * code_size + len(vector_store.index_to_docstore_id) * 100
+    
+    def _estimate_docstore_bytes(self, session_id: str) -> int:
+        """Estimate a session's share of the chunk texts and metadata held in memory"""
+        return self.chunk_store.session_bytes(session_id)
+    
+    def _estimate_history_bytes(self, session_id: str) -> int:
+        """Estimate resident bytes of a session's chat history"""
+        history = self.chat_histories.get(session_id)
+        if history is None:
+            return 0
+        return history.footprint()["bytes"]
+    
+    def _track_vector_store(self, session_id: str, vector_store: FAISS) -> None:
+        """Record the estimated size of a session's index, docstore and lexical index"""
+        lexical = self.lexical_indexes.get(session_id)
+        self.session_manager.update(
+            session_id,
+            index_bytes=self._estimate_index_bytes(vector_store),
+            docstore_bytes=self._estimate_docstore_bytes(session_id)
+            + (lexical.estimate_bytes() if lexical is not None else 0)
         )
     
-    def _get_file_hash(self, content: bytes) -> str:
-        """Generate MD5 hash of file content"""
-        return hashlib.md5(content).hexdigest()
+    def _enforce_session_budget(self, current_session_id: str) -> None:
+        """Evict idle and over-budget sessions, sparing busy and current ones"""
+        def protected(session_id: str) -> bool:
+            lock = self._session_locks.get(session_id)
+            return session_id == current_session_id or (lock is not None and lock.locked())
+        
+        SESSION_EVICTIONS.inc(len(self.session_manager.enforce(protected)))
     
-    def _get_session_history(self, session_id: str) -> ChatMessageHistory:
-        """Get or create chat history for session"""
-        if session_id not in self.chat_histories:
-            self.chat_histories[session_id] = ChatMessageHistory()
-        return self.chat_histories[session_id]
+    def _evict_session(self, session_id: str) -> None:
+        """Offload a session to disk if possible, otherwise destroy it"""
+        if (
+            settings.SESSION_OFFLOAD_ON_EVICT
+            and self.state_backend is not None
+            and self.state_backend.exists(session_id)
+        ):
+            self.unload_session(session_id)
+        else:
+            self._clear_session(session_id)
+    
+    def _build_chunks(
+        self,
+        docs: List[Document],
+        progress: Optional[FileProgress] = None
+    ) -> List[CachedChunk]:
+        """Split and embed parsed PDF pages, reusing cached vectors where possible"""
+        with STAGE_SECONDS.labels(stage="split").time():
+            splits = self.text_splitter.split_documents(docs)
+        texts = [split.page_content for split in splits]
+        vectors = []
+        batch_size = settings.INGEST_EMBED_BATCH_SIZE
+        with STAGE_SECONDS.labels(stage="embed").time():
+            for start in range(0, len(texts), batch_size):
+                vectors.extend(
+                    self.embedding_cache.embed_documents(texts[start:start + batch_size], self.embeddings)
+                )
+                if progress is not None:
+                    progress.chunks_embedded = len(vectors)
+        
+        return [
+            CachedChunk(text=split.page_content, metadata=split.metadata, vector=vector)
+            for split, vector in zip(splits, vectors)
+        ]
+    
+    async def _parse_pdf(
+        self,
+        buffer: UploadBuffer,
+        filename: str,
+        progress: Optional[FileProgress] = None
+    ) -> List[Document]:
+        """Parse a PDF on the parser pool, recording parsed pages"""
+        docs = await self.pdf_parser.parse(buffer, filename)
+        if progress is not None:
+            progress.parsed_pages = len(docs)
+        return docs
+    
+    def _is_stale(self, session_id: str) -> bool:
+        """Whether another worker has saved the session since its resident copy was loaded"""
+        return (
+            self.state_backend is not None
+            and self.state_backend.version(session_id) != self._versions.get(session_id, 0)
+        )
+    
+    def _drop_resident(self, session_id: str, release_chunks: bool = True) -> None:
+        """Forget the resident copy of a session's documents, leaving its stored state alone"""
+        with self._chains_lock:
+            self.vector_stores.pop(session_id, None)
+            self.lexical_indexes.pop(session_id, None)
+            self.float_vectors.pop(session_id, None)
+        self.processed_files.pop(session_id, None)
+        self._versions.pop(session_id, None)
+        self._invalidate_chains(session_id)
+        self._mmapped_sessions.discard(session_id)
+        if release_chunks:
+            self.chunk_store.release(session_id)
+    
+    def _get_vector_store(self, session_id: str, refresh: bool = False) -> Optional[FAISS]:
+        """
+        Get the session vector store, reopening it from disk on first access
+        
+        A resident store that another worker has since saved over is
+        reloaded. While this process is writing to the session its own store
+        is the newest, so the check is skipped unless ``refresh`` is set, as
+        a writer does once it holds the cross-process lock.
+        """
+        resident = self.vector_stores.get(session_id)
+        if resident is not None:
+            lock = self._session_locks.get(session_id)
+            writing = lock is not None and lock.locked() and not refresh
+            if writing or not self._is_stale(session_id):
+                return resident
+            # Chunks stay referenced until the reload, for chats still searching the old store
+            self._drop_resident(session_id, release_chunks=False)
+        if self.state_backend is None:
+            return None
+        
+        loaded = self.state_backend.load(
+            session_id,
+            self.embeddings,
+            mmap=settings.SESSION_INDEX_MMAP
+        )
+        if loaded is None:
+            if resident is not None:
+                self.chunk_store.release(session_id)
+            return None
+        
+        vector_store = loaded.vector_store
+        with self._chains_lock:
+            # An upload may have swapped in a newer store while this one was loading
+            if session_id in self.vector_stores:
+                return self.vector_stores[session_id]
+            vector_store.docstore = self.chunk_store.adopt(session_id, vector_store.docstore)
+            self.vector_stores[session_id] = vector_store
+            if is_quantized(vector_store.index):
+                exact = FloatVectorFile.open(
+                    self._float_vectors_path(session_id),
+                    vector_store.index.d,
+                    vector_store.index.ntotal
+                )
+                if exact is not None:
+                    self.float_vectors[session_id] = exact
+            self.processed_files.setdefault(session_id, set()).update(loaded.processed_files)
+            self._versions[session_id] = loaded.version
+            if loaded.mmapped:
+                self._mmapped_sessions.add(session_id)
+        if resident is not None:
+            # Chunks of the old copy that the reloaded one no longer has
+            self.chunk_store.discard(
+                session_id,
+                set(resident.index_to_docstore_id.values()) - set(vector_store.index_to_docstore_id.values())
+            )
+        self._track_vector_store(session_id, vector_store)
+        return vector_store
+    
+    async def _aget_vector_store(self, session_id: str) -> Optional[FAISS]:
+        """Get the session vector store without blocking the event loop on disk reads"""
+        vector_store = self.vector_stores.get(session_id)
+        if vector_store is None or self.state_backend is not None:
+            # Not on the ingestion executor, so a long upload cannot delay chat.
+            # With a state backend even resident stores are checked for newer versions.
+            vector_store = await asyncio.to_thread(self._get_vector_store, session_id)
+        if vector_store is not None:
+            self.session_manager.touch(session_id)
+        return vector_store
+    
+    def _get_lexical_index(self, session_id: str, vector_store: FAISS) -> LexicalIndex:
+        """Get the session lexical index, loading or rebuilding it from the docstore"""
+        lexical = self.lexical_indexes.get(session_id)
+        if lexical is not None:
+            return lexical
+        
+        if self.state_backend is not None:
+            lexical = self.state_backend.load_lexical(session_id)
+        if lexical is None or len(lexical) != len(vector_store.index_to_docstore_id):
+            # Sessions persisted before lexical indexing existed
+            lexical = LexicalIndex.build(
+                (doc_id, vector_store.docstore.search(doc_id).page_content)
+                for doc_id in vector_store.index_to_docstore_id.values()
+            )
+        with self._chains_lock:
+            if self.vector_stores.get(session_id) is vector_store:
+                self.lexical_indexes[session_id] = lexical
+        return lexical
+    
+    def _persist_session(self, session_id: str) -> None:
+        """Write the session index, docstore, lexical index and processed file hashes to disk"""
+        if self.state_backend is not None:
+            self._versions[session_id] = self.state_backend.save(
+                session_id,
+                self.vector_stores[session_id],
+                self.processed_files[session_id],
+                self.lexical_indexes.get(session_id)
+            )
+    
+    def _float_vectors_path(self, session_id: str) -> str:
+        """Where a session's float32 vectors are kept: its store directory, or scratch space"""
+        if self.state_backend is not None:
+            return self.state_backend.vectors_path(session_id)
+        if self._scratch_dir is None:
+            self._scratch_dir = tempfile.mkdtemp(prefix="pdf-vectors-")
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self._scratch_dir, f"{digest}.f32")
+    
+    def _exact_vectors(self, session_id: str, vector_store: FAISS) -> np.ndarray:
+        """
+        Float32 vectors of every position of a session's index
+        
+        They come from the session's float32 file when it covers the index,
+        or from the index itself when it holds float32 vectors. Otherwise
+        only lossy codes are left, and the chunk texts are embedded again,
+        mostly from the embedding cache.
+        """
+        index = vector_store.index
+        exact = self.float_vectors.get(session_id)
+        if exact is not None and len(exact) == index.ntotal:
+            return np.asarray(exact.vectors)
+        if not is_quantized(index):
+            return index.reconstruct_n(0, index.ntotal)
+        print(f"Warning: Re-embedding {index.ntotal} chunks of session {session_id} for its float32 vectors")
+        texts = [
+            vector_store.docstore.search(vector_store.index_to_docstore_id[i]).page_content
+            for i in range(index.ntotal)
+        ]
+        vectors = []
+        batch_size = settings.INGEST_EMBED_BATCH_SIZE
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(self.embedding_cache.embed_documents(texts[start:start + batch_size], self.embeddings))
+        return np.asarray(vectors, dtype=np.float32).reshape(-1, index.d)
+    
+    def _index_chunks(self, session_id: str, chunks: List[CachedChunk]) -> None:
+        """
+        Append pre-embedded chunks to the session vector store
+        
+        The chunks are added to a copy of the store that is swapped in once
+        complete, so chat requests searching the current store from other
+        threads never observe a half-updated index.
+        """
+        current = self.vector_stores.get(session_id)
+        # Reference ids hash the content, which the chunk store shares
+        # between sessions, and the source file, which keeps every citation
+        unique: Dict[str, CachedChunk] = {}
+        for chunk in chunks:
+            ref_id = ChunkStore.reference_id(chunk.text, chunk.metadata)
+            if current is None or ref_id not in current.docstore:
+                unique.setdefault(ref_id, chunk)
+        if not unique:
+            return
+        ids = list(unique)
+        chunks = list(unique.values())
+        text_embeddings = [(chunk.text, chunk.vector) for chunk in chunks]
+        metadatas = [dict(chunk.metadata) for chunk in chunks]
+        vectors = np.asarray([chunk.vector for chunk in chunks], dtype=np.float32)
+        
+        # The lexical index grows alongside the vector store, under the same ids
+        lexical = (
+            self._get_lexical_index(session_id, current) if current is not None else LexicalIndex()
+        ).with_documents(ids, [chunk.text for chunk in chunks])
+        
+        with STAGE_SECONDS.labels(stage="faiss_add").time():
+            if current is None:
+                vector_store = FAISS(
+                    embedding_function=self.embeddings,
+                    index=faiss.IndexFlatL2(len(chunks[0].vector)),
+                    docstore=self.chunk_store.view(session_id),
+                    index_to_docstore_id={}
+                )
+                vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+                if settings.INDEX_TYPE != "flat" or settings.INDEX_STORAGE != "float32":
+                    try:
+                        vector_store.index = build_index(vectors, settings.INDEX_TYPE, self.index_params)
+                    except ValueError as e:
+                        # Too few chunks to train on; stays flat float32 until enough are added
+                        print(f"Warning: Keeping a flat index for session {session_id}: {e}")
+            else:
+                if session_id in self._mmapped_sessions:
+                    # A read-only memory map cannot grow; start from a loaded copy
+                    index, _ = self.state_backend.load_index(session_id, mmap=False)
+                else:
+                    index = prepare_index(faiss.clone_index(current.index), self.index_params)
+                vector_store = FAISS(
+                    embedding_function=self.embeddings,
+                    index=index,
+                    docstore=current.docstore.copy(),
+                    index_to_docstore_id=dict(current.index_to_docstore_id)
+                )
+                vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        
+        exact = None
+        if is_quantized(vector_store.index):
+            current_exact = self.float_vectors.get(session_id)
+            if current is None:
+                exact = FloatVectorFile.create(self._float_vectors_path(session_id), vectors)
+            elif current_exact is not None and len(current_exact) == current.index.ntotal:
+                exact = current_exact.append(vectors)
+            else:
+                # Missing or short file: re-ranking and upgrades need every position
+                exact = FloatVectorFile.create(
+                    self._float_vectors_path(session_id),
+                    np.vstack([self._exact_vectors(session_id, current), vectors])
+                )
+        
+        with self._chains_lock:
+            self.vector_stores[session_id] = vector_store
+            self.lexical_indexes[session_id] = lexical
+            if exact is not None:
+                self.float_vectors[session_id] = exact
+        self._invalidate_chains(session_id)
+        self._mmapped_sessions.discard(session_id)
+        self._track_vector_store(session_id, vector_store)
+    
+    def _index_upgrade_type(self, session_id: str) -> Optional[str]:
+        """
+        Index type a session's flat index should be rebuilt as, if any
+        
+        A session whose first upload was too small to train INDEX_TYPE (or
+        INDEX_STORAGE) was kept flat float32; it gets the configured index
+        as soon as it holds enough vectors to train one. Any other flat
+        index becomes INDEX_UPGRADE_TYPE once it reaches
+        INDEX_UPGRADE_THRESHOLD.
+        """
+        vector_store = self.vector_stores.get(session_id)
+        if vector_store is None or index_type_of(vector_store.index) != "flat":
+            return None
+        ntotal = vector_store.index.ntotal
+        configured = settings.INDEX_TYPE != "flat" or settings.INDEX_STORAGE != "float32"
+        if configured and not is_quantized(vector_store.index):
+            if ntotal >= min_training_vectors(settings.INDEX_TYPE, self.index_params):
+                return settings.INDEX_TYPE
+            return None
+        if settings.INDEX_UPGRADE_TYPE != "flat" and ntotal >= settings.INDEX_UPGRADE_THRESHOLD:
+            return settings.INDEX_UPGRADE_TYPE
+        return None
+    
+    def _needs_index_upgrade(self, session_id: str) -> bool:
+        """Whether a session's flat index should be rebuilt as another type"""
+        return self._index_upgrade_type(session_id) is not None
+    
+    def _upgrade_index(self, session_id: str) -> None:
+        """
+        Rebuild a session's flat index as its upgrade type and swap it in
+        
+        The vectors are read back from the flat index, or from the float32
+        file of a quantized one, so nothing is re-embedded unless that file
+        is missing. Positions are
+        unchanged, so the docstore and id mapping are shared with the new
+        store.
+        """
+        index_type = self._index_upgrade_type(session_id)
+        if index_type is None:
+            return
+        vector_store = self.vector_stores[session_id]
+        exact = self.float_vectors.get(session_id)
+        with STAGE_SECONDS.labels(stage="index_upgrade").time():
+            vectors = self._exact_vectors(session_id, vector_store)
+            index = build_index(vectors, index_type, self.index_params)
+            if is_quantized(index) and (exact is None or len(exact) != len(vectors)):
+                exact = FloatVectorFile.create(self._float_vectors_path(session_id), vectors)
+        upgraded = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=vector_store.docstore,
+            index_to_docstore_id=vector_store.index_to_docstore_id
+        )
+        
+        with self._chains_lock:
+            if self.vector_stores.get(session_id) is not vector_store:
+                return
+            self.vector_stores[session_id] = upgraded
+            if exact is not None:
+                self.float_vectors[session_id] = exact
+        self._invalidate_chains(session_id)
+        self._mmapped_sessions.discard(session_id)
+        self._track_vector_store(session_id, upgraded)
+        self._persist_session(session_id)
+    
+    async def _upgrade_index_in_background(self, session_id: str) -> None:
+        """Migrate a session to an approximate index while chat keeps using the flat one"""
+        try:
+            # Holding the session lock keeps uploads from adding to the flat index mid-build
+            async with self._exclusive(session_id):
+                # Another worker may have saved the session, or upgraded it already
+                await self._run_blocking(self._get_vector_store, session_id, True)
+                if self._needs_index_upgrade(session_id):
+                    await self._run_blocking(self._upgrade_index, session_id)
+        except Exception as e:
+            print(f"Warning: Could not upgrade the index of session {session_id}: {e}")
+        finally:
+            self._upgrading.discard(session_id)
+    
+    def _schedule_index_upgrade(self, session_id: str) -> None:
+        """Start a background index upgrade if the session needs one"""
+        if session_id in self._upgrading or not self._needs_index_upgrade(session_id):
+            return
+        self._upgrading.add(session_id)
+        task = asyncio.create_task(self._upgrade_index_in_background(session_id))
+        self._upgrade_tasks.add(task)
+        task.add_done_callback(self._upgrade_tasks.discard)
+    
+    def _commit_chunks(self, session_id: str, chunks: List[CachedChunk], file_hashes: List[str]) -> None:
+        """Index new chunks, record their files as processed and persist the session"""
+        if chunks:
+            self._index_chunks(session_id, chunks)
+        self.processed_files[session_id].update(file_hashes)
+        if session_id in self.vector_stores:
+            self._persist_session(session_id)
     
     async def upload_pdfs(
         self, 
@@ -65,162 +709,379 @@ class PDFService:
     ) -> UploadResponse:
         """Process and upload PDF files"""
         try:
-            if session_id not in self.processed_files:
-                self.processed_files[session_id] = set()
-            
-            documents = []
-            new_files = []
-            
-            for file in files:
-                if not file.filename.endswith('.pdf'):
-                    continue
-                
-                content = await file.read()
-                file_hash = self._get_file_hash(content)
-                
-                if file_hash not in self.processed_files[session_id]:
-                    # Save to temporary file
-                    with tempfile.NamedTemporaryFile(
-                        delete=False, 
-                        suffix=".pdf"
-                    ) as temp_file:
-                        temp_file.write(content)
-                        temp_path = temp_file.name
-                    
-                    try:
-                        # Load and process PDF
-                        loader = PyMuPDFLoader(temp_path)
-                        docs = loader.load()
-                        documents.extend(docs)
-                        
-                        self.processed_files[session_id].add(file_hash)
-                        new_files.append(file.filename)
-                    finally:
-                        # Cleanup temp file
-                        os.unlink(temp_path)
-            
-            if not documents:
-                return UploadResponse(
-                    status="no_new_files",
-                    processed_files=[],
-                    message="All files were already processed"
-                )
-            
-            # Split documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=settings.CHUNK_SIZE,
-                chunk_overlap=settings.CHUNK_OVERLAP,
-                separators=["\n\n", "\n", ". ", " ", ""],
-                length_function=len
-            )
-            
-            splits = text_splitter.split_documents(documents)
-            
-            # Create or update vector store
-            if session_id not in self.vector_stores:
-                self.vector_stores[session_id] = FAISS.from_documents(
-                    splits, 
-                    self.embeddings
-                )
-            else:
-                self.vector_stores[session_id].add_documents(splits)
-            
-            return UploadResponse(
-                status="success",
-                processed_files=new_files,
-                total_chunks=len(splits),
-                message=f"Successfully processed {len(new_files)} PDF(s)"
-            )
+            buffers = await read_uploads(files)
+            return await self.ingest_files(session_id, buffers)
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
     
-    async def chat_with_pdfs(self, request: ChatRequest) -> ChatResponse:
-        """Chat with uploaded PDF documents"""
+    async def ingest_files(
+        self,
+        session_id: str,
+        files: List[Tuple[str, UploadBuffer]],
+        progress: Optional[List[FileProgress]] = None
+    ) -> UploadResponse:
+        """
+        Parse, embed and index (filename, buffer) pairs into a session
+        
+        Takes ownership of the buffers and releases them when done. Without
+        ``progress`` all new chunks are indexed in one commit at the end and any
+        failure aborts the upload. With ``progress`` (one FileProgress per file)
+        every file is committed as soon as it is embedded, so chat can query it
+        while later files are still processing, and a failing file is recorded
+        without stopping the rest.
+        """
         try:
-            if request.session_id not in self.vector_stores:
-                raise HTTPException(
-                    status_code=400,
-                    detail="No documents uploaded. Please upload PDFs first."
-                )
+            self.session_manager.touch(session_id)
+            async with self._exclusive(session_id):
+                response = await self._ingest_files_locked(session_id, files, progress)
+            # Evictions offload or delete sessions on disk
+            await asyncio.to_thread(self._enforce_session_budget, session_id)
+            self._schedule_index_upgrade(session_id)
+            return response
+        finally:
+            for _, buffer in files:
+                buffer.close()
+    
+    async def _ingest_files_locked(
+        self,
+        session_id: str,
+        files: List[Tuple[str, UploadBuffer]],
+        progress: Optional[List[FileProgress]]
+    ) -> UploadResponse:
+        """Ingest uploaded files while holding the session lock"""
+        # Pick up anything other workers saved before this one got the lock
+        await self._run_blocking(self._get_vector_store, session_id, True)
+        processed = self.processed_files.setdefault(session_id, set())
+        
+        chunks = []
+        new_files = []
+        new_hashes = []
+        total_chunks = 0
+        
+        # Dedupe every file first so parsing of all new files can
+        # start at once on the parser pool; results are consumed in upload order
+        pending = []
+        pending_hashes = set()
+        parse_tasks: Dict[int, asyncio.Task] = {}
+        for i, (filename, buffer) in enumerate(files):
+            file_progress = progress[i] if progress is not None else None
+            # SHA-256, as the hashes also key content shared across sessions,
+            # where collisions must not be craftable
+            file_hash = buffer.sha256
             
-            # Initialize LLM
-            llm = self._get_llm(request.temperature, request.max_tokens)
+            if file_hash in processed or file_hash in pending_hashes:
+                if file_progress is not None:
+                    file_progress.status = "skipped"
+                continue
             
-            # Setup retriever with MMR search
-            retriever = self.vector_stores[request.session_id].as_retriever(
-                search_type="mmr",
-                search_kwargs={
-                    "k": request.search_k,
-                    "fetch_k": min(20, request.search_k * settings.FETCH_K_MULTIPLIER),
-                    "lambda_mult": settings.MMR_LAMBDA
-                }
+            # Known content is an index append; anything else is parsed and embedded once
+            cached_chunks = self.embedding_cache.get_file(file_hash)
+            if cached_chunks is None:
+                parse_tasks[i] = asyncio.create_task(
+                    self._parse_pdf(buffer, filename, file_progress)
+                )
+            if file_progress is not None:
+                file_progress.status = "parsing"
+            pending.append((i, filename, file_hash, cached_chunks))
+            pending_hashes.add(file_hash)
+        
+        try:
+            for i, filename, file_hash, file_chunks in pending:
+                file_progress = progress[i] if progress is not None else None
+                try:
+                    if file_chunks is None:
+                        docs = await parse_tasks.pop(i)
+                        if file_progress is not None:
+                            file_progress.status = "embedding"
+                        file_chunks = await self._run_blocking(
+                            self._build_chunks, docs, file_progress
+                        )
+                        self.embedding_cache.put_file(file_hash, file_chunks)
+                    elif file_progress is not None:
+                        file_progress.parsed_pages = len({c.metadata.get('page') for c in file_chunks})
+                        file_progress.chunks_embedded = len(file_chunks)
+                    
+                    file_chunks = [
+                        CachedChunk(
+                            text=chunk.text,
+                            metadata={
+                                **chunk.metadata,
+                                'source': filename,
+                                'file_path': filename,
+                                'file_hash': file_hash
+                            },
+                            vector=chunk.vector
+                        )
+                        for chunk in file_chunks
+                    ]
+                    
+                    if file_progress is not None:
+                        file_progress.status = "indexing"
+                        await self._run_blocking(self._commit_chunks, session_id, file_chunks, [file_hash])
+                        file_progress.chunks_indexed = len(file_chunks)
+                        file_progress.status = "indexed"
+                    else:
+                        chunks.extend(file_chunks)
+                    
+                    new_hashes.append(file_hash)
+                    new_files.append(filename)
+                    total_chunks += len(file_chunks)
+                    
+                except Exception as e:
+                    if file_progress is None:
+                        raise
+                    file_progress.status = "failed"
+                    file_progress.error = str(e)
+        finally:
+            for task in parse_tasks.values():
+                task.cancel()
+        
+        if not new_files:
+            return UploadResponse(
+                status="no_new_files",
+                processed_files=[],
+                message="All files were already processed"
             )
-            
-            # Contextualize question prompt
-            contextualize_q_system_prompt = """You are an expert at understanding questions in context.
-Reformulate the question to be standalone and clear, preserving all intent.
-Do not answer the question - only clarify it."""
-            
-            contextualize_q_prompt = ChatPromptTemplate.from_messages([
-                ("system", contextualize_q_system_prompt),
-                MessagesPlaceholder("chat_history"),
-                ("human", "{input}"),
-            ])
-            
-            history_aware_retriever = create_history_aware_retriever(
-                llm, retriever, contextualize_q_prompt
+        
+        if progress is None:
+            await self._run_blocking(self._commit_chunks, session_id, chunks, new_hashes)
+        
+        return UploadResponse(
+            status="success",
+            processed_files=new_files,
+            total_chunks=total_chunks,
+            message=f"Successfully processed {len(new_files)} PDF(s)"
+        )
+    
+    async def _require_vector_store(self, session_id: str) -> FAISS:
+        """Get the session vector store or fail if nothing was uploaded"""
+        vector_store = await self._aget_vector_store(session_id)
+        if vector_store is None:
+            raise HTTPException(
+                status_code=400,
+                detail="No documents uploaded. Please upload PDFs first."
             )
-            
-            # QA prompt
-            qa_system_prompt = """You are an expert research assistant analyzing documents.
-
-Guidelines:
-1. Provide precise, professional answers based only on the provided context
-2. Cite sources with page numbers when possible
-3. If information is not in the documents, clearly state that
-4. Break complex answers into clear paragraphs
-5. Maintain conversation context
-
-Context:
-{context}"""
-            
-            qa_prompt = ChatPromptTemplate.from_messages([
-                ("system", qa_system_prompt),
-                MessagesPlaceholder("chat_history"),
-                ("human", "{input}"),
-            ])
-            
-            # Create chains
-            question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-            rag_chain = create_retrieval_chain(
-                history_aware_retriever, 
-                question_answer_chain
+        return vector_store
+    
+    @staticmethod
+    def _fetch_k(request: ChatRequest) -> int:
+        """Number of candidates MMR chooses from for a request"""
+        fetch_k = request.fetch_k or request.search_k * settings.FETCH_K_MULTIPLIER
+        return max(request.search_k, min(fetch_k, settings.FETCH_K_MAX))
+    
+    def _build_rag_chain(self, vector_store: FAISS, request: ChatRequest) -> RunnableWithMessageHistory:
+        """Build the history-aware conversational RAG chain for a request"""
+        # Initialize LLM
+        llm = self._get_llm(request.temperature, request.max_tokens)
+        
+        fetch_k = self._fetch_k(request)
+        # Read after the store, so the snapshot covers at least its positions
+        exact = self.float_vectors.get(request.session_id)
+        exact_vectors = exact.vectors if exact is not None and is_quantized(vector_store.index) else None
+        if request.retrieval_mode == "dense":
+            # MMR over the stored vectors of the candidates, batched in NumPy
+            retriever = MMRRetriever(
+                vector_store=vector_store,
+                k=request.search_k,
+                fetch_k=fetch_k,
+                lambda_mult=settings.MMR_LAMBDA,
+                exact_vectors=exact_vectors,
+                oversample=settings.INDEX_RERANK_OVERSAMPLE
             )
-            
-            conversational_rag_chain = RunnableWithMessageHistory(
-                rag_chain,
-                self._get_session_history,
-                input_messages_key="input",
-                history_messages_key="chat_history",
-                output_messages_key="answer"
+        else:
+            # BM25 and dense scores fused; "prefilter" restricts MMR to lexical hits
+            retriever = HybridRetriever(
+                vector_store=vector_store,
+                lexical_index=self._get_lexical_index(request.session_id, vector_store),
+                k=request.search_k,
+                fetch_k=fetch_k,
+                lambda_mult=settings.MMR_LAMBDA,
+                alpha=settings.HYBRID_ALPHA,
+                prefilter=request.retrieval_mode == "prefilter",
+                prefilter_k=settings.HYBRID_PREFILTER_K,
+                exact_vectors=exact_vectors
             )
-            
-            # Generate response
-            response = conversational_rag_chain.invoke(
-                {"input": request.query},
-                config={"configurable": {"session_id": request.session_id}}
+        
+        # Only calls the LLM to rewrite follow-ups that reference earlier turns;
+        # retrieved chunks are then merged, deduplicated and fitted to the token budget
+        history_aware_retriever = (
+            self.question_rewriter.as_retriever(llm, retriever)
+            | RunnableLambda(self.context_assembler.assemble)
+        )
+        
+        # Create chains
+        question_answer_chain = create_stuff_documents_chain(
+            llm.with_config(callbacks=[ANSWER_LLM_TIMER]),
+            self.qa_prompt
+        )
+        rag_chain = create_retrieval_chain(
+            history_aware_retriever, 
+            question_answer_chain
+        )
+        
+        return RunnableWithMessageHistory(
+            rag_chain,
+            self._history_for_chain,
+            input_messages_key="input",
+            history_messages_key="chat_history",
+            output_messages_key="answer"
+        )
+    
+    def _get_rag_chain(self, vector_store: FAISS, request: ChatRequest) -> RunnableWithMessageHistory:
+        """Get the cached RAG chain for a session and parameter set, building it on a miss"""
+        key = (
+            request.session_id, request.temperature, request.max_tokens,
+            request.search_k, self._fetch_k(request), request.retrieval_mode
+        )
+        with self._chains_lock:
+            chain = self._chains.get(key)
+            if chain is not None:
+                self._chains.move_to_end(key)
+                return chain
+        
+        chain = self._build_rag_chain(vector_store, request)
+        with self._chains_lock:
+            # Only cache if the store was not swapped out while building
+            if self.vector_stores.get(request.session_id) is vector_store:
+                self._chains[key] = chain
+                while len(self._chains) > settings.CHAIN_CACHE_SIZE:
+                    self._chains.popitem(last=False)
+        return chain
+    
+    def _invalidate_chains(self, session_id: str) -> None:
+        """Drop cached chains bound to a session's previous vector store"""
+        with self._chains_lock:
+            for key in [key for key in self._chains if key[0] == session_id]:
+                del self._chains[key]
+    
+    def _extract_sources(self, docs: List[Document]) -> List[SourceInfo]:
+        """Convert retrieved documents into source citations"""
+        return [
+            SourceInfo(
+                source=os.path.basename(doc.metadata.get('source', 'Unknown')),
+                page=str(doc.metadata.get('page', 'N/A')),
+                content=doc.page_content[:200] + "..."
             )
+            for doc in docs
+        ]
+    
+    @staticmethod
+    def _shared_sources(docs: List[Document]) -> Optional[List[SourceInfo]]:
+        """
+        Citations to share through the answer cache, naming files by content hash
+        
+        Other sessions with the same documents may have uploaded them under
+        other names, which must not leak to them. Returns None when a
+        document predates content-hash metadata.
+        """
+        if any('file_hash' not in doc.metadata for doc in docs):
+            return None
+        return [
+            SourceInfo(
+                source=doc.metadata['file_hash'],
+                page=str(doc.metadata.get('page', 'N/A')),
+                content=doc.page_content[:200] + "..."
+            )
+            for doc in docs
+        ]
+    
+    def _file_names(self, session_id: str) -> Dict[str, str]:
+        """A session's own file names, by content hash"""
+        vector_store = self.vector_stores.get(session_id)
+        if vector_store is None or not isinstance(vector_store.docstore, SharedDocstore):
+            return {}
+        return {
+            metadata['file_hash']: os.path.basename(metadata.get('source', 'Unknown'))
+            for metadata in vector_store.docstore.distinct_metadata()
+            if 'file_hash' in metadata
+        }
+    
+    @staticmethod
+    def _format_event(event: str, data: Dict) -> str:
+        """Format a Server-Sent Event"""
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    async def _lookup_answer(
+        self,
+        request: ChatRequest
+    ) -> Tuple[Optional[str], Optional[List[float]], Optional[CachedAnswer]]:
+        """
+        Look a question up in the answer cache
+        
+        Returns the document-set fingerprint and query vector to store the
+        answer under on a miss, or (None, None, None) when the cache must be
+        bypassed because the question depends on the chat history. The
+        fingerprint only covers the documents, so an answer generated with
+        this session's history in the prompt must not be shared with other
+        sessions: then the fingerprint returned for storing is None. A hit
+        is returned with its sources named after this session's files.
+        """
+        if not settings.ANSWER_CACHE_ENABLED:
+            return None, None, None
+        history = (await asyncio.to_thread(self._get_session_history, request.session_id)).messages
+        if self.question_rewriter.needs_rewrite(request.query, history):
+            self.answer_cache.record_bypass()
+            return None, None, None
+        
+        fingerprint = AnswerCache.fingerprint(
+            self.processed_files.get(request.session_id, set()),
+            request.temperature,
+            request.max_tokens,
+            request.search_k,
+            self._fetch_k(request),
+            request.retrieval_mode
+        )
+        query_vector = await self.embeddings.aembed_query(request.query)
+        cached = self.answer_cache.lookup(fingerprint, query_vector)
+        if cached is not None:
+            names = self._file_names(request.session_id)
+            if all(source.source in names for source in cached.sources):
+                cached = dataclasses.replace(cached, sources=[
+                    source.model_copy(update={"source": names[source.source]})
+                    for source in cached.sources
+                ])
+            else:
+                cached = None
+        return (fingerprint if not history else None), query_vector, cached
+    
+    def _answer_from_cache(self, request: ChatRequest, cached: CachedAnswer) -> ChatResponse:
+        """Record a cached answer as a regular turn of the session's history"""
+        history = self._get_session_history(request.session_id)
+        history.add_user_message(request.query)
+        history.add_ai_message(cached.answer)
+        self._after_chat_turn(request.session_id)
+        return ChatResponse(
+            answer=cached.answer,
+            sources=cached.sources,
+            session_id=request.session_id,
+            cached=True
+        )
+    
+    async def chat_with_pdfs(self, request: ChatRequest) -> ChatResponse:
+        """Chat with uploaded PDF documents"""
+        try:
+            vector_store = await self._require_vector_store(request.session_id)
+            fingerprint, query_vector, cached = await self._lookup_answer(request)
+            if cached is not None:
+                return await asyncio.to_thread(self._answer_from_cache, request, cached)
+            
+            conversational_rag_chain = await self._aprepare_chain(vector_store, request)
             
-            # Extract sources
-            sources = []
-            if 'context' in response:
-                for doc in response['context']:
-                    sources.append(SourceInfo(
-                        source=os.path.basename(doc.metadata.get('source', 'Unknown')),
-                        page=str(doc.metadata.get('page', 'N/A')),
-                        content=doc.page_content[:200] + "..."
-                    ))
+            # Generate response, retrieving with the vector the cache lookup embedded
+            with known_query_vector(request.query, query_vector):
+                response = await conversational_rag_chain.ainvoke(
+                    {"input": request.query},
+                    config={"configurable": {"session_id": request.session_id}}
+                )
+            await asyncio.to_thread(self._after_chat_turn, request.session_id)
+            
+            sources = self._extract_sources(response.get('context', []))
+            shared_sources = self._shared_sources(response.get('context', []))
+            if fingerprint is not None and shared_sources is not None:
+                self.answer_cache.store(fingerprint, query_vector, response['answer'], shared_sources)
             
             return ChatResponse(
                 answer=response['answer'],
@@ -233,15 +1094,202 @@ Context:
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
     
-    def clear_session(self, session_id: str) -> None:
-        """Clear session data"""
+    async def stream_chat_with_pdfs(self, request: ChatRequest) -> AsyncIterator[str]:
+        """
+        Chat with uploaded PDF documents, streaming the answer as Server-Sent Events
+        
+        Emits one ``token`` event per answer chunk, then a ``done`` event carrying
+        the full ChatResponse plus timing, or an ``error`` event on failure.
+        Validation happens before the stream is returned so that missing
+        documents still surface as a regular HTTP error. A cached answer is
+        sent as a single ``token`` event.
+        """
+        started = time.perf_counter()
+        vector_store = await self._require_vector_store(request.session_id)
+        fingerprint, query_vector, cached = await self._lookup_answer(request)
+        
+        if cached is not None:
+            async def cached_events() -> AsyncIterator[str]:
+                response = await asyncio.to_thread(self._answer_from_cache, request, cached)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                yield self._format_event("token", {"token": response.answer})
+                payload = response.model_dump()
+                payload["timing"] = {"first_token_ms": elapsed_ms, "total_ms": elapsed_ms}
+                yield self._format_event("done", payload)
+            
+            return cached_events()
+        
+        conversational_rag_chain = await self._aprepare_chain(vector_store, request)
+        
+        async def events() -> AsyncIterator[str]:
+            first_token_ms = None
+            answer_parts = []
+            context = []
+            
+            try:
+                with known_query_vector(request.query, query_vector):
+                    async for chunk in conversational_rag_chain.astream(
+                        {"input": request.query},
+                        config={"configurable": {"session_id": request.session_id}}
+                    ):
+                        if 'context' in chunk:
+                            context = chunk['context']
+                        token = chunk.get('answer')
+                        if token:
+                            if first_token_ms is None:
+                                first_token_ms = (time.perf_counter() - started) * 1000
+                            answer_parts.append(token)
+                            yield self._format_event("token", {"token": token})
+                
+                response = ChatResponse(
+                    answer="".join(answer_parts),
+                    sources=self._extract_sources(context),
+                    session_id=request.session_id
+                )
+                shared_sources = self._shared_sources(context)
+                if fingerprint is not None and shared_sources is not None:
+                    self.answer_cache.store(fingerprint, query_vector, response.answer, shared_sources)
+                payload = response.model_dump()
+                payload["timing"] = {
+                    "first_token_ms": first_token_ms,
+                    "total_ms": (time.perf_counter() - started) * 1000
+                }
+                await asyncio.to_thread(self._after_chat_turn, request.session_id)
+                yield self._format_event("done", payload)
+                
+            except Exception as e:
+                yield self._format_event("error", {"detail": str(e)})
+        
+        return events()
+    
+    async def _aprepare_chain(self, vector_store: FAISS, request: ChatRequest) -> RunnableWithMessageHistory:
+        """
+        Get the RAG chain and load the session history without blocking the event loop
+        
+        Both may read the state backend: the lexical index for hybrid
+        retrieval, and the chat history.
+        """
+        def prepare() -> RunnableWithMessageHistory:
+            self._get_session_history(request.session_id)
+            return self._get_rag_chain(vector_store, request)
+        
+        return await asyncio.to_thread(prepare)
+    
+    def _after_chat_turn(self, session_id: str) -> None:
+        """Account for the grown chat history and enforce the memory budget"""
+        self.session_manager.update(session_id, history_bytes=self._estimate_history_bytes(session_id))
+        self._enforce_session_budget(session_id)
+    
+    async def clear_session(self, session_id: str) -> None:
+        """
+        Clear session data
+        
+        Waits for uploads and index upgrades already holding the session
+        lock, so none of them can put a half-built store back afterwards.
+        """
+        async with self._exclusive(session_id):
+            await asyncio.to_thread(self._clear_session, session_id)
+    
+    def _clear_session(self, session_id: str) -> None:
+        """Clear session data; the caller holds the session lock or the session is idle"""
         if session_id in self.chat_histories:
             del self.chat_histories[session_id]
         if session_id in self.vector_stores:
             del self.vector_stores[session_id]
+        self.lexical_indexes.pop(session_id, None)
         if session_id in self.processed_files:
             del self.processed_files[session_id]
+        self._versions.pop(session_id, None)
+        self._invalidate_chains(session_id)
+        self._mmapped_sessions.discard(session_id)
+        self.chunk_store.release(session_id)
+        self.session_manager.remove(session_id)
+        exact = self.float_vectors.pop(session_id, None)
+        if self.state_backend is not None:
+            self.state_backend.delete(session_id)
+        elif exact is not None and os.path.exists(exact.path):
+            os.remove(exact.path)
+    
+    def unload_session(self, session_id: str) -> None:
+        """Offload a persisted session from memory, keeping it and its history in the state backend"""
+        if self.state_backend is None or not self.state_backend.exists(session_id):
+            return
+        # Every message is already in the backend
+        self.chat_histories.pop(session_id, None)
+        self._drop_resident(session_id)
+        self.session_manager.remove(session_id)
     
     def get_active_sessions(self) -> List[str]:
-        """Get list of active session IDs"""
-        return list(self.chat_histories.keys())
+        """Get list of session IDs, resident or offloaded to disk"""
+        sessions = set(self.vector_stores) | set(self.chat_histories)
+        if self.state_backend is not None:
+            sessions.update(self.state_backend.list_sessions())
+        return sorted(sessions)
+    
+    def get_session_overview(self) -> SessionListResponse:
+        """Get every session with its residency and estimated memory footprint"""
+        usage = self.session_manager.snapshot()
+        sessions = []
+        for session_id in self.get_active_sessions():
+            session_usage = usage.get(session_id)
+            if session_usage is None:
+                sessions.append(SessionInfo(session_id=session_id, resident=False))
+                continue
+            history = self.chat_histories.get(session_id)
+            footprint = history.footprint() if history is not None else {}
+            vector_store = self.vector_stores.get(session_id)
+            sessions.append(SessionInfo(
+                session_id=session_id,
+                resident=session_id in self.vector_stores or session_id in self.chat_histories,
+                last_access=datetime.fromtimestamp(session_usage.last_access).isoformat(),
+                index_bytes=session_usage.index_bytes,
+                docstore_bytes=session_usage.docstore_bytes,
+                history_bytes=session_usage.history_bytes,
+                total_bytes=session_usage.total_bytes,
+                history_messages=footprint.get("messages", 0),
+                history_prompt_tokens=footprint.get("prompt_tokens", 0),
+                history_summary_tokens=footprint.get("summary_tokens", 0),
+                index_type=index_type_of(vector_store.index) if vector_store is not None else None
+            ))
+        
+        return SessionListResponse(
+            active_sessions=[session.session_id for session in sessions],
+            total=len(sessions),
+            sessions=sessions,
+            memory_bytes=sum(u.total_bytes for u in usage.values()),
+            memory_budget_bytes=self.session_manager.memory_budget_bytes,
+            evictions=self.session_manager.evictions
+        )
+    
+    def update_metrics(self) -> None:
+        """Refresh session and index gauges before a metrics scrape"""
+        vector_stores = list(self.vector_stores.values())
+        SESSIONS.labels(state="resident").set(len(vector_stores))
+        SESSIONS.labels(state="persisted").set(
+            self.state_backend.count() if self.state_backend is not None else 0
+        )
+        INDEX_VECTORS.set(sum(vector_store.index.ntotal for vector_store in vector_stores))
+        SESSION_MEMORY_BYTES.set(self.session_manager.total_bytes())
+    
+    def shutdown(self) -> None:
+        """Stop the ingestion executor and parser worker processes"""
+        self.pdf_parser.shutdown()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.history_summarizer is not None:
+            self.history_summarizer.shutdown()
+        if self._scratch_dir is not None:
+            shutil.rmtree(self._scratch_dir, ignore_errors=True)
+        if self.state_backend is not None:
+            self.state_backend.close()
+        self.embeddings.close()
+    
+    def get_stats(self) -> Dict:
+        """Get service-level cache statistics"""
+        return {
+            "embedding_cache": self.embedding_cache.stats(),
+            "embedding_batcher": self.embeddings.stats(),
+            "question_rewrite": self.question_rewriter.stats(),
+            "answer_cache": self.answer_cache.stats(),
+            "context_assembly": self.context_assembler.stats(),
+            "chunk_store": self.chunk_store.stats()
+        }
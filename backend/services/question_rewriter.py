@@ -0,0 +1,146 @@
+"""
+Adaptive Question Contextualization
+"""
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from backend.metrics import REWRITE_LLM_TIMER, STAGE_SECONDS
+
+
+class QuestionRewriter:
+    """
+    History-aware retrieval that only pays for an LLM rewrite when it is needed.
+
+    Replaces ``create_history_aware_retriever``. The question is sent to the
+    retriever unchanged on the first turn, and also when it has no
+    unresolved references to earlier turns. Otherwise the rewritten question
+    is looked up in an LRU keyed by a digest of the recent history plus the
+    query, so retries and reloads reuse it. Only on a miss is the LLM called.
+    """
+
+    # Pronouns and deictic words that usually point back into the conversation
+    REFERENCE_PATTERN = re.compile(
+        r"\b(it|its|itself|this|that|these|those|they|them|their|theirs|"
+        r"he|him|his|she|her|hers|former|latter|above|previous|earlier|"
+        r"same|such|there|again|another|other|others|else)\b",
+        re.IGNORECASE
+    )
+    FOLLOW_UP_PATTERN = re.compile(
+        r"^\s*(and|but|or|so|also|then|what about|how about|why|why not|"
+        r"more|continue|elaborate|explain further|go on)\b",
+        re.IGNORECASE
+    )
+
+    def __init__(self, prompt: ChatPromptTemplate, cache_size: int, history_window: int):
+        self.prompt = prompt
+        self.cache_size = cache_size
+        self.history_window = history_window
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.skipped = 0
+        self.cached = 0
+        self.executed = 0
+
+    def needs_rewrite(self, query: str, history: List[BaseMessage]) -> bool:
+        """Whether the query depends on the conversation to be understood"""
+        if not history:
+            return False
+        if len(query.split()) <= 3:
+            return True
+        return bool(self.REFERENCE_PATTERN.search(query) or self.FOLLOW_UP_PATTERN.match(query))
+
+    def _cache_key(self, query: str, history: List[BaseMessage]) -> str:
+        digest = hashlib.sha256()
+        for message in history[-self.history_window:]:
+            digest.update(message.type.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(str(message.content).encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(query.strip().lower().encode("utf-8"))
+        return digest.hexdigest()
+
+    def _lookup(self, query: str, history: List[BaseMessage]) -> Optional[str]:
+        """Return the query as-is, a cached rewrite, or None if the LLM is needed"""
+        if not self.needs_rewrite(query, history):
+            with self._lock:
+                self.skipped += 1
+            return query
+
+        key = self._cache_key(query, history)
+        with self._lock:
+            rewritten = self._cache.get(key)
+            if rewritten is not None:
+                self._cache.move_to_end(key)
+                self.cached += 1
+            return rewritten
+
+    def _store(self, query: str, history: List[BaseMessage], rewritten: str) -> str:
+        key = self._cache_key(query, history)
+        with self._lock:
+            self.executed += 1
+            self._cache[key] = rewritten
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rewritten
+
+    def rewrite(self, llm: BaseChatModel, query: str, history: List[BaseMessage]) -> str:
+        """Get the standalone form of a query"""
+        rewritten = self._lookup(query, history)
+        if rewritten is not None:
+            return rewritten
+        chain = self.prompt | llm | StrOutputParser()
+        result = chain.invoke(
+            {"input": query, "chat_history": history},
+            config={"callbacks": [REWRITE_LLM_TIMER]}
+        )
+        return self._store(query, history, result)
+
+    async def arewrite(self, llm: BaseChatModel, query: str, history: List[BaseMessage]) -> str:
+        """Asynchronously get the standalone form of a query"""
+        rewritten = self._lookup(query, history)
+        if rewritten is not None:
+            return rewritten
+        chain = self.prompt | llm | StrOutputParser()
+        result = await chain.ainvoke(
+            {"input": query, "chat_history": history},
+            config={"callbacks": [REWRITE_LLM_TIMER]}
+        )
+        return self._store(query, history, result)
+
+    def as_retriever(self, llm: BaseChatModel, retriever: BaseRetriever) -> Runnable:
+        """Runnable mapping {input, chat_history} to retrieved documents"""
+        def retrieve(inputs: Dict):
+            query = self.rewrite(llm, inputs["input"], inputs.get("chat_history", []))
+            with STAGE_SECONDS.labels(stage="retrieve").time():
+                return retriever.invoke(query)
+
+        async def aretrieve(inputs: Dict):
+            query = await self.arewrite(llm, inputs["input"], inputs.get("chat_history", []))
+            with STAGE_SECONDS.labels(stage="retrieve").time():
+                return await retriever.ainvoke(query)
+
+        return RunnableLambda(retrieve, afunc=aretrieve).with_config(
+            run_name="chat_retriever_chain"
+        )
+
+    def stats(self) -> Dict:
+        """Return how often the rewrite was skipped, served from cache or executed"""
+        with self._lock:
+            total = self.skipped + self.cached + self.executed
+            return {
+                "skipped": self.skipped,
+                "cached": self.cached,
+                "executed": self.executed,
+                "llm_calls_avoided_ratio": (self.skipped + self.cached) / total if total else 0.0,
+                "cache_size": len(self._cache),
+            }
@@ -1,23 +1,48 @@
 """
 Web Search Service
 """
-from typing import List
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException
 
 from langchain_groq import ChatGroq
-from langchain.agents import initialize_agent, AgentType
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import BaseTool
+from langchain.agents import initialize_agent, AgentType, AgentExecutor
 from langchain_community.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
 from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun, DuckDuckGoSearchRun
 
 from backend.config import settings
+from backend.metrics import SEARCH_LLM_TIMER, SEARCH_TOOL_TIMER
 from backend.models import SearchRequest, SearchResponse
+from backend.services.llm_pool import llm_pool
+from backend.services.tool_cache import CachedSearchTool, ToolResultCache
 
 
 class SearchService:
     """Service for handling web search functionality"""
     
+    # Labels reported as sources for each tool name
+    SOURCE_LABELS = {
+        "Web Search": "Web Search",
+        "Academic Papers": "Academic Papers (arXiv)",
+        "Wikipedia": "Wikipedia",
+    }
+    
     def __init__(self):
+        self.tool_cache = (
+            ToolResultCache(
+                max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+                db_path=settings.SEARCH_CACHE_DB_PATH
+            )
+            if settings.SEARCH_CACHE_ENABLED else None
+        )
         self.search_tools = self._initialize_search_tools()
+        # Search agents keyed by (temperature, max_tokens); agents hold no per-query state
+        self._agents: "OrderedDict[Tuple[float, int], AgentExecutor]" = OrderedDict()
+        self.synthesis_prompt = self._initialize_synthesis_prompt()
     
     def _initialize_search_tools(self) -> List:
         """Initialize search tools for arXiv, Wikipedia, and web search"""
@@ -29,7 +54,12 @@ class SearchService:
                 top_k_results=settings.ARXIV_MAX_RESULTS,
                 doc_content_chars_max=settings.ARXIV_MAX_CHARS
             )
-            tools.append(ArxivQueryRun(api_wrapper=arxiv_wrapper, name="Academic Papers"))
+            self._share_arxiv_client(arxiv_wrapper)
+            tools.append(self._cache_tool(
+                ArxivQueryRun(api_wrapper=arxiv_wrapper, name="Academic Papers"),
+                settings.SEARCH_CACHE_TTL_ARXIV,
+                f"arxiv:{settings.ARXIV_MAX_RESULTS}:{settings.ARXIV_MAX_CHARS}"
+            ))
         except Exception as e:
             print(f"Warning: Could not initialize ArxivQueryRun: {e}")
         
@@ -39,45 +69,165 @@ class SearchService:
                 top_k_results=settings.WIKI_MAX_RESULTS,
                 doc_content_chars_max=settings.WIKI_MAX_CHARS
             )
-            tools.append(WikipediaQueryRun(api_wrapper=wiki_wrapper, name="Wikipedia"))
+            tools.append(self._cache_tool(
+                WikipediaQueryRun(api_wrapper=wiki_wrapper, name="Wikipedia"),
+                settings.SEARCH_CACHE_TTL_WIKI,
+                f"wikipedia:{settings.WIKI_MAX_RESULTS}:{settings.WIKI_MAX_CHARS}"
+            ))
         except Exception as e:
             print(f"Warning: Could not initialize WikipediaQueryRun: {e}")
         
         # Try to add DuckDuckGo tool
         try:
-            tools.append(DuckDuckGoSearchRun(name="Web Search"))
+            tools.append(self._cache_tool(
+                DuckDuckGoSearchRun(name="Web Search"),
+                settings.SEARCH_CACHE_TTL_WEB,
+                "duckduckgo"
+            ))
         except Exception as e:
             print(f"Warning: Could not initialize DuckDuckGoSearchRun: {e}")
         
         if not tools:
             raise Exception("No search tools could be initialized")
         
+        # Time every tool call, whether issued by the agent or by fast mode
+        for tool in tools:
+            tool.callbacks = [SEARCH_TOOL_TIMER]
+        
         return tools
     
+    def _cache_tool(self, tool: BaseTool, ttl_seconds: float, namespace: str) -> BaseTool:
+        """Wrap a tool with the shared result cache when caching is enabled"""
+        if self.tool_cache is None:
+            return tool
+        return CachedSearchTool.wrap(
+            tool, self.tool_cache, ttl_seconds, namespace, settings.SEARCH_CACHE_TTL_FAILURE
+        )
+    
+    @staticmethod
+    def _share_arxiv_client(arxiv_wrapper: ArxivAPIWrapper) -> None:
+        """
+        Route arXiv queries through one long-lived client
+        
+        ``arxiv.Search.results()`` builds a fresh ``arxiv.Client`` (and HTTP
+        session) per call. A shared client keeps its connection alive and
+        applies the arXiv rate limit across all users.
+        """
+        import arxiv
+        
+        client = arxiv.Client()
+        
+        class PooledSearch(arxiv.Search):
+            def results(self, offset: int = 0):
+                return client.results(self, offset=offset)
+        
+        arxiv_wrapper.arxiv_search = PooledSearch
+    
+    def _initialize_synthesis_prompt(self) -> ChatPromptTemplate:
+        """Build the prompt that answers from merged search results in fast mode"""
+        system_prompt = f"""You are an advanced AI research assistant.
+
+Configuration:
+- Model: {settings.MODEL_NAME}
+- Answer using the search results below from web search, academic papers (arXiv), and Wikipedia
+- Provide comprehensive, well-researched answers
+- Cite the source of each fact (Web Search, arXiv, or Wikipedia)
+- If the results do not cover the question, say so rather than guessing
+
+Search results:
+{{results}}"""
+        
+        return ChatPromptTemplate.from_messages([
+            ("system", system_prompt),
+            ("human", "{input}"),
+        ])
+    
     def _get_llm(self, temperature: float, max_tokens: int) -> ChatGroq:
         """Get configured LLM instance"""
-        return ChatGroq(
-            groq_api_key=settings.GROQ_API_KEY,
-            model_name=settings.MODEL_NAME,
-            temperature=temperature,
-            max_tokens=max_tokens
+        return llm_pool.get(temperature, max_tokens)
+    
+    def _get_agent(self, temperature: float, max_tokens: int) -> AgentExecutor:
+        """Get the search agent for a parameter set, creating it on first use"""
+        key = (temperature, max_tokens)
+        if key in self._agents:
+            self._agents.move_to_end(key)
+            return self._agents[key]
+        
+        agent = initialize_agent(
+            tools=self.search_tools,
+            llm=self._get_llm(temperature, max_tokens),
+            agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
+            handle_parsing_errors=True,
+            verbose=False,
+            max_iterations=10
         )
+        self._agents[key] = agent
+        while len(self._agents) > settings.CHAIN_CACHE_SIZE:
+            self._agents.popitem(last=False)
+        return agent
+    
+    async def _run_tool(self, tool: BaseTool, query: str) -> Optional[str]:
+        """Query one search tool, returning None if it fails or times out"""
+        try:
+            result = await asyncio.wait_for(
+                tool.ainvoke(query),
+                timeout=settings.SEARCH_TOOL_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            print(f"Warning: {tool.name} timed out after {settings.SEARCH_TOOL_TIMEOUT}s")
+            return None
+        except Exception as e:
+            print(f"Warning: {tool.name} failed: {e}")
+            return None
+        
+        result = str(result).strip()
+        return result[:settings.SEARCH_RESULT_MAX_CHARS] if result else None
+    
+    async def fast_search(self, request: SearchRequest) -> SearchResponse:
+        """
+        Query every search tool concurrently, then answer with one LLM call
+        
+        Latency is bounded by the slowest tool (capped by SEARCH_TOOL_TIMEOUT)
+        plus a single generation, instead of up to ten serial agent steps.
+        """
+        results = await asyncio.gather(*[
+            self._run_tool(tool, request.query) for tool in self.search_tools
+        ])
+        found = [(tool.name, result) for tool, result in zip(self.search_tools, results) if result]
+        if not found:
+            raise HTTPException(status_code=502, detail="All search tools failed or timed out")
+        
+        merged = "\n\n".join(f"[{name}]\n{result}" for name, result in found)
+        chain = self.synthesis_prompt | self._get_llm(request.temperature, request.max_tokens) | StrOutputParser()
+        answer = await chain.ainvoke(
+            {"input": request.query, "results": merged},
+            config={"callbacks": [SEARCH_LLM_TIMER]}
+        )
+        
+        return SearchResponse(
+            response=answer,
+            sources=[self.SOURCE_LABELS.get(name, name) for name, _ in found]
+        )
+    
+    def get_stats(self) -> Dict:
+        """Get search tool cache statistics"""
+        return {
+            "tool_cache": self.tool_cache.stats() if self.tool_cache is not None else None
+        }
+    
+    def shutdown(self) -> None:
+        """Close the on-disk tool result store"""
+        if self.tool_cache is not None:
+            self.tool_cache.close()
     
     async def search(self, request: SearchRequest) -> SearchResponse:
         """Perform web search using multiple sources"""
         try:
-            # Initialize LLM
-            llm = self._get_llm(request.temperature, request.max_tokens)
+            if request.mode == "fast":
+                return await self.fast_search(request)
             
-            # Create search agent
-            agent = initialize_agent(
-                tools=self.search_tools,
-                llm=llm,
-                agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-                handle_parsing_errors=True,
-                verbose=False,
-                max_iterations=10
-            )
+            # Get search agent
+            agent = self._get_agent(request.temperature, request.max_tokens)
             
             # System message for the agent
             system_message = f"""You are an advanced AI research assistant.
@@ -91,8 +241,11 @@ Configuration:
 
 User query: {request.query}"""
             
-            # Run agent - using invoke instead of deprecated run method
-            response = agent.invoke({"input": system_message})
+            # Run agent asynchronously so tool calls and LLM requests don't block the event loop
+            response = await agent.ainvoke(
+                {"input": system_message},
+                config={"callbacks": [SEARCH_LLM_TIMER]}
+            )
             
             # Extract the output from the response
             result = response.get("output", str(response))
@@ -102,6 +255,8 @@ User query: {request.query}"""
                 sources=["Web Search", "Academic Papers (arXiv)", "Wikipedia"]
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Search error: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,109 @@
+"""
+Session Lifecycle Management
+"""
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class SessionUsage:
+    """Last access time and estimated resident bytes of a session"""
+    last_access: float = field(default_factory=time.time)
+    index_bytes: int = 0
+    docstore_bytes: int = 0
+    history_bytes: int = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self.index_bytes + self.docstore_bytes + self.history_bytes
+
+
+class SessionManager:
+    """
+    Tracks resident sessions in LRU order and picks which ones to evict.
+
+    A session is evicted once it has been idle for longer than the TTL, and
+    least recently used sessions are evicted while the estimated total exceeds
+    the memory budget. The manager only decides; the owner performs the
+    eviction (offloading to disk or destroying) through ``evict``.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: int,
+        idle_ttl_seconds: float,
+        evict: Callable[[str], None]
+    ):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._evict = evict
+        self._sessions: "OrderedDict[str, SessionUsage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def touch(self, session_id: str) -> None:
+        """Record an access, making the session most recently used"""
+        with self._lock:
+            usage = self._sessions.pop(session_id, None) or SessionUsage()
+            usage.last_access = time.time()
+            self._sessions[session_id] = usage
+
+    def update(self, session_id: str, **sizes: int) -> None:
+        """Set estimated byte counts (index_bytes, docstore_bytes, history_bytes)"""
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            if usage is None:
+                usage = self._sessions[session_id] = SessionUsage()
+            for name, value in sizes.items():
+                setattr(usage, name, value)
+
+    def remove(self, session_id: str) -> None:
+        """Stop tracking a session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def get(self, session_id: str) -> Optional[SessionUsage]:
+        """Get the usage of a resident session"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def total_bytes(self) -> int:
+        """Estimated bytes held by all resident sessions"""
+        with self._lock:
+            return sum(usage.total_bytes for usage in self._sessions.values())
+
+    def select_evictions(self, protected: Callable[[str], bool] = lambda _: False) -> List[str]:
+        """Pick idle sessions and, while over budget, least recently used ones"""
+        now = time.time()
+        with self._lock:
+            total = sum(usage.total_bytes for usage in self._sessions.values())
+            victims = []
+            for session_id, usage in self._sessions.items():
+                idle = now - usage.last_access > self.idle_ttl_seconds
+                if not idle and total <= self.memory_budget_bytes:
+                    break
+                if protected(session_id):
+                    continue
+                victims.append(session_id)
+                total -= usage.total_bytes
+            return victims
+
+    def enforce(self, protected: Callable[[str], bool] = lambda _: False) -> List[str]:
+        """Evict idle and over-budget sessions, returning their ids"""
+        victims = self.select_evictions(protected)
+        for session_id in victims:
+            self._evict(session_id)
+            self.remove(session_id)
+            self.evictions += 1
+        return victims
+
+    def snapshot(self) -> Dict[str, SessionUsage]:
+        """Copy of the usage of every resident session"""
+        with self._lock:
+            return {
+                session_id: SessionUsage(**vars(usage))
+                for session_id, usage in self._sessions.items()
+            }
@@ -0,0 +1,253 @@
+"""
+On-Disk Session Persistence
+"""
+import os
+import json
+import pickle
+import shutil
+import hashlib
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+from backend.services.index_factory import IndexParams, prepare_index
+from backend.services.lexical_index import LexicalIndex
+
+
+@dataclass
+class LoadedSession:
+    """A session read back from disk"""
+    vector_store: FAISS
+    processed_files: Set[str]
+    # Whether the index is a read-only memory map of its file
+    mmapped: bool
+    version: int = 0
+
+
+class SessionStore:
+    """
+    Persists each session's FAISS index, docstore and processed file hashes.
+
+    Every session lives in its own directory named after a hash of the session
+    id, so arbitrary client-supplied ids can never escape the store root:
+
+        <root>/<sha256(session_id)>/index.faiss
+        <root>/<sha256(session_id)>/docstore.pkl
+        <root>/<sha256(session_id)>/lexical.pkl
+        <root>/<sha256(session_id)>/meta.json
+        <root>/<sha256(session_id)>/vectors.f32    (float32 originals of a quantized index)
+        <root>/<sha256(session_id)>/history.json   (written when a session is offloaded)
+
+    Each file is written to a temporary name and swapped in with os.replace,
+    with meta.json written last so a new session only becomes visible once
+    complete. The files are replaced one at a time, so a crash while
+    re-saving can leave a new index next to an old docstore. Loading checks
+    that the index, docstore and meta.json agree on the vector count and
+    rejects the session otherwise.
+    """
+
+    INDEX_FILE = "index.faiss"
+    DOCSTORE_FILE = "docstore.pkl"
+    LEXICAL_FILE = "lexical.pkl"
+    META_FILE = "meta.json"
+    HISTORY_FILE = "history.json"
+    VECTORS_FILE = "vectors.f32"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _session_dir(self, session_id: str) -> str:
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest)
+
+    def index_path(self, session_id: str) -> str:
+        """Path of the serialized FAISS index for a session"""
+        return os.path.join(self._session_dir(session_id), self.INDEX_FILE)
+
+    def vectors_path(self, session_id: str) -> str:
+        """Path of the float32 vectors kept for exact re-ranking"""
+        return os.path.join(self._session_dir(session_id), self.VECTORS_FILE)
+
+    @staticmethod
+    def _replace(path: str, write) -> None:
+        temp_path = f"{path}.tmp"
+        write(temp_path)
+        os.replace(temp_path, path)
+
+    def exists(self, session_id: str) -> bool:
+        """Check whether a session has been persisted"""
+        return os.path.exists(os.path.join(self._session_dir(session_id), self.META_FILE))
+
+    def save(
+        self,
+        session_id: str,
+        vector_store: FAISS,
+        processed_files: Set[str],
+        lexical_index: Optional[LexicalIndex] = None
+    ) -> None:
+        """Write a session's index, docstore, lexical index and processed file hashes"""
+        session_dir = self._session_dir(session_id)
+        os.makedirs(session_dir, exist_ok=True)
+
+        self._replace(
+            os.path.join(session_dir, self.INDEX_FILE),
+            lambda path: faiss.write_index(vector_store.index, path)
+        )
+
+        def write_docstore(path: str) -> None:
+            with open(path, "wb") as f:
+                pickle.dump(
+                    (vector_store.docstore, vector_store.index_to_docstore_id),
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+
+        self._replace(os.path.join(session_dir, self.DOCSTORE_FILE), write_docstore)
+
+        if lexical_index is not None:
+            def write_lexical(path: str) -> None:
+                with open(path, "wb") as f:
+                    pickle.dump(lexical_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            self._replace(os.path.join(session_dir, self.LEXICAL_FILE), write_lexical)
+
+        def write_meta(path: str) -> None:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "session_id": session_id,
+                    "processed_files": sorted(processed_files),
+                    "ntotal": vector_store.index.ntotal,
+                }, f)
+
+        self._replace(os.path.join(session_dir, self.META_FILE), write_meta)
+
+    @staticmethod
+    def _mmap_flag(path: str) -> Optional[int]:
+        """
+        FAISS read flag that memory-maps the bulk of an index file, if any
+
+        IO_FLAG_MMAP only maps the inverted lists of IVF indexes. Flat code
+        indexes (flat, SQ, PQ) and HNSW storage need IO_FLAG_MMAP_IFC, which
+        older FAISS releases lack. The file's fourcc tells the two apart:
+        IVF types start with "Iw".
+        """
+        with open(path, "rb") as f:
+            fourcc = f.read(4)
+        if fourcc.startswith(b"Iw"):
+            return faiss.IO_FLAG_MMAP
+        return getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+
+    def load_index(self, session_id: str, mmap: bool = True) -> Tuple[faiss.Index, bool]:
+        """Read a session's FAISS index, memory-mapped when supported; returns (index, mmapped)"""
+        path = self.index_path(session_id)
+        index = None
+        flag = self._mmap_flag(path) if mmap else None
+        if flag is not None:
+            try:
+                index = faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                # Not every index type can be memory-mapped
+                pass
+        mmapped = index is not None
+        if index is None:
+            index = faiss.read_index(path)
+        return prepare_index(index, IndexParams.from_settings()), mmapped
+
+    def load(
+        self,
+        session_id: str,
+        embeddings: Embeddings,
+        mmap: bool = True
+    ) -> Optional[LoadedSession]:
+        """Reopen a persisted session, or return None if it does not exist or is inconsistent"""
+        if not self.exists(session_id):
+            return None
+
+        session_dir = self._session_dir(session_id)
+        with open(os.path.join(session_dir, self.META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(session_dir, self.DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        index, mmapped = self.load_index(session_id, mmap=mmap)
+
+        counts = {index.ntotal, len(index_to_docstore_id), meta.get("ntotal", index.ntotal)}
+        if len(counts) > 1:
+            # Files from two different saves, left by a crash mid-save
+            print(f"Warning: Ignoring persisted session {session_id} with mismatched files")
+            return None
+
+        vector_store = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+        return LoadedSession(vector_store, set(meta.get("processed_files", [])), mmapped)
+
+    def load_lexical(self, session_id: str) -> Optional[LexicalIndex]:
+        """Read a session's lexical index, or None if none was saved"""
+        path = os.path.join(self._session_dir(session_id), self.LEXICAL_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save_history(self, session_id: str, messages: List[BaseMessage], summary: str = "") -> None:
+        """Write a session's chat history and running summary"""
+        session_dir = self._session_dir(session_id)
+        os.makedirs(session_dir, exist_ok=True)
+
+        def write_history(path: str) -> None:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"summary": summary, "messages": messages_to_dict(messages)}, f)
+
+        self._replace(os.path.join(session_dir, self.HISTORY_FILE), write_history)
+
+    def load_history(self, session_id: str) -> Optional[Tuple[str, List[BaseMessage]]]:
+        """Read a session's (summary, messages), or None if none was saved"""
+        path = os.path.join(self._session_dir(session_id), self.HISTORY_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            # Written before running summaries existed
+            return "", messages_from_dict(data)
+        return data.get("summary", ""), messages_from_dict(data.get("messages", []))
+
+    def delete_history(self, session_id: str) -> None:
+        """Remove a session's offloaded history"""
+        path = os.path.join(self._session_dir(session_id), self.HISTORY_FILE)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def delete(self, session_id: str) -> None:
+        """Remove a persisted session"""
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def count(self) -> int:
+        """Count persisted sessions without reading their metadata"""
+        return sum(
+            1 for entry in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, entry, self.META_FILE))
+        )
+
+    def list_sessions(self) -> List[str]:
+        """List the ids of all persisted sessions"""
+        sessions = []
+        for entry in os.listdir(self.root):
+            meta_path = os.path.join(self.root, entry, self.META_FILE)
+            if not os.path.exists(meta_path):
+                continue
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    sessions.append(json.load(f)["session_id"])
+            except (OSError, ValueError, KeyError):
+                continue
+        return sessions
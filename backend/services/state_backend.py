@@ -0,0 +1,453 @@
+"""
+Shared Session State Backends
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set, Tuple
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+from backend.services.lexical_index import LexicalIndex
+from backend.services.session_store import LoadedSession, SessionStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only coordinate threads of one process
+    fcntl = None
+
+
+class SessionLock(ABC):
+    """Exclusive lock on one session across every worker process"""
+
+    @abstractmethod
+    def acquire(self) -> None:
+        """Block until the lock is held"""
+
+    @abstractmethod
+    def release(self) -> None:
+        """Release the lock"""
+
+
+class SessionStateBackend(ABC):
+    """
+    Where session state lives, so any API worker process can serve any session.
+
+    Workers keep resident copies of session indexes and histories as caches.
+    Every write bumps the session's ``version``, or its history sequence for
+    chat messages. A worker compares these with the values behind its
+    resident copy and reloads when another worker has changed the session.
+    Writers serialize on ``lock``.
+    """
+
+    # Session indexes, docstores and processed files
+
+    @abstractmethod
+    def exists(self, session_id: str) -> bool:
+        """Check whether a session has been persisted"""
+
+    @abstractmethod
+    def list_sessions(self) -> List[str]:
+        """List the ids of all persisted sessions"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Count persisted sessions"""
+
+    @abstractmethod
+    def version(self, session_id: str) -> int:
+        """Current version of a session's index data, 0 if never saved"""
+
+    @abstractmethod
+    def save(
+        self,
+        session_id: str,
+        vector_store: FAISS,
+        processed_files: Set[str],
+        lexical_index: Optional[LexicalIndex] = None
+    ) -> int:
+        """Write a session's index data and return its new version"""
+
+    @abstractmethod
+    def load(
+        self,
+        session_id: str,
+        embeddings: Embeddings,
+        mmap: bool = True
+    ) -> Optional[LoadedSession]:
+        """Reopen a consistent snapshot of a session, with its version, or None"""
+
+    @abstractmethod
+    def load_index(self, session_id: str, mmap: bool = True) -> Tuple[faiss.Index, bool]:
+        """Read a session's FAISS index; returns (index, mmapped)"""
+
+    @abstractmethod
+    def load_lexical(self, session_id: str) -> Optional[LexicalIndex]:
+        """Read a session's lexical index, if one was saved"""
+
+    @abstractmethod
+    def vectors_path(self, session_id: str) -> str:
+        """Path of the float32 vectors kept for exact re-ranking"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session's index data and history"""
+
+    # Chat history
+
+    @abstractmethod
+    def append_messages(self, session_id: str, messages: List[BaseMessage]) -> Tuple[List[int], int]:
+        """Append messages; returns their sequence numbers and the sequence before them"""
+
+    @abstractmethod
+    def fold_history(self, session_id: str, summary: str, upto_seq: int) -> None:
+        """Replace the summary and drop messages up to ``upto_seq`` folded into it"""
+
+    @abstractmethod
+    def load_history(self, session_id: str) -> Tuple[str, List[Tuple[int, BaseMessage]], int]:
+        """Return (summary, [(seq, message)], history sequence)"""
+
+    @abstractmethod
+    def history_seq(self, session_id: str) -> int:
+        """Sequence number of the last message appended to a session"""
+
+    @abstractmethod
+    def delete_history(self, session_id: str) -> None:
+        """Remove a session's messages and summary"""
+
+    # Coordination
+
+    @abstractmethod
+    def lock(self, session_id: str) -> SessionLock:
+        """Lock serializing writes to a session across processes"""
+
+    # Background ingestion jobs
+
+    @abstractmethod
+    def save_job(self, job_id: str, data: Dict) -> None:
+        """Store the latest state of an ingestion job"""
+
+    @abstractmethod
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        """Read an ingestion job stored by any worker"""
+
+    @abstractmethod
+    def prune_jobs(self, keep: int) -> None:
+        """Forget all but the ``keep`` most recently updated jobs"""
+
+    def close(self) -> None:
+        """Release connections and handles"""
+
+
+class _FileLock(SessionLock):
+    """flock on a per-session lock file, plus a thread lock for this process"""
+
+    def __init__(self, path: str, thread_lock: threading.Lock):
+        self.path = path
+        self._thread_lock = thread_lock
+        self._file = None
+
+    def acquire(self) -> None:
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                self._file = open(self.path, "a+b")
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+class LocalStateBackend(SessionStateBackend):
+    """
+    Session state on local disk: SessionStore files plus a SQLite database.
+
+    Index, docstore and lexical files stay in the SessionStore layout under
+    ``root``. ``root``/state.sqlite3, in WAL mode so readers never block the
+    writer, holds per-session versions, chat messages and job records. Every
+    worker process on the host, or on hosts sharing the volume with working
+    POSIX locks, sees the same state.
+
+    The version works as a seqlock. A save makes it odd, writes the files and
+    makes it even again. A load only accepts a snapshot if the version was
+    the same even number before and after reading, so it never mixes the
+    files of two saves.
+    """
+
+    DB_FILE = "state.sqlite3"
+    LOCK_DIR = "locks"
+    LOAD_ATTEMPTS = 20
+
+    def __init__(self, root: str, busy_timeout_ms: int = 5000):
+        self.files = SessionStore(root)
+        self.root = root
+        self.db_path = os.path.join(root, self.DB_FILE)
+        self.busy_timeout_ms = busy_timeout_ms
+        os.makedirs(os.path.join(root, self.LOCK_DIR), exist_ok=True)
+        self._local = threading.local()
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._thread_locks_guard = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    summary TEXT NOT NULL DEFAULT '',
+                    history_seq INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    message TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, seq);
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection to the state database"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._thread_locks_guard:
+                self._connections.append(conn)
+        return conn
+
+    def _bump_version(self, session_id: str) -> int:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, version) VALUES (?, 1) "
+                "ON CONFLICT(session_id) DO UPDATE SET version = version + 1",
+                (session_id,)
+            )
+            return conn.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def exists(self, session_id: str) -> bool:
+        return self.files.exists(session_id)
+
+    def list_sessions(self) -> List[str]:
+        return self.files.list_sessions()
+
+    def count(self) -> int:
+        return self.files.count()
+
+    def version(self, session_id: str) -> int:
+        row = self._connect().execute(
+            "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def save(
+        self,
+        session_id: str,
+        vector_store: FAISS,
+        processed_files: Set[str],
+        lexical_index: Optional[LexicalIndex] = None
+    ) -> int:
+        version = self._bump_version(session_id)
+        if version % 2 == 0:
+            # Left odd by a crashed writer; skip to the next odd value
+            version = self._bump_version(session_id)
+        try:
+            self.files.save(session_id, vector_store, processed_files, lexical_index)
+        finally:
+            version = self._bump_version(session_id)
+        return version
+
+    def load(
+        self,
+        session_id: str,
+        embeddings: Embeddings,
+        mmap: bool = True
+    ) -> Optional[LoadedSession]:
+        for _ in range(self.LOAD_ATTEMPTS):
+            before = self.version(session_id)
+            if before % 2:
+                # A save is in progress
+                time.sleep(0.05)
+                continue
+            loaded = self.files.load(session_id, embeddings, mmap=mmap)
+            if self.version(session_id) == before:
+                if loaded is None:
+                    return None
+                loaded.version = before
+                return loaded
+        raise RuntimeError(f"Session {session_id} kept changing while being loaded")
+
+    def load_index(self, session_id: str, mmap: bool = True) -> Tuple[faiss.Index, bool]:
+        return self.files.load_index(session_id, mmap=mmap)
+
+    def load_lexical(self, session_id: str) -> Optional[LexicalIndex]:
+        return self.files.load_lexical(session_id)
+
+    def vectors_path(self, session_id: str) -> str:
+        return self.files.vectors_path(session_id)
+
+    def delete(self, session_id: str) -> None:
+        self.files.delete(session_id)
+        with self._connect() as conn:
+            # Bump rather than delete the row, so resident copies elsewhere see a new version
+            conn.execute(
+                "UPDATE sessions SET version = version + 2, summary = '', history_seq = -1 "
+                "WHERE session_id = ?",
+                (session_id,)
+            )
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def append_messages(self, session_id: str, messages: List[BaseMessage]) -> Tuple[List[int], int]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT history_seq FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            previous = row[0] if row else 0
+            seqs = [
+                conn.execute(
+                    "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                    (session_id, json.dumps(data))
+                ).lastrowid
+                for data in messages_to_dict(list(messages))
+            ]
+            conn.execute(
+                "INSERT INTO sessions (session_id, history_seq) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET history_seq = excluded.history_seq",
+                (session_id, seqs[-1] if seqs else previous)
+            )
+        return seqs, previous
+
+    def fold_history(self, session_id: str, summary: str, upto_seq: int) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, summary) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary",
+                (session_id, summary)
+            )
+            conn.execute("DELETE FROM messages WHERE session_id = ? AND seq <= ?", (session_id, upto_seq))
+
+    def _import_legacy_history(self, session_id: str) -> None:
+        """Move a history.json written by SessionStore.save_history into the database"""
+        saved = self.files.load_history(session_id)
+        if saved is None:
+            return
+        summary, messages = saved
+        if messages:
+            self.append_messages(session_id, messages)
+        if summary:
+            self.fold_history(session_id, summary, 0)
+        self.files.delete_history(session_id)
+
+    def load_history(self, session_id: str) -> Tuple[str, List[Tuple[int, BaseMessage]], int]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT summary, history_seq FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if (row is None or row[1] == 0) and self.files.exists(session_id):
+            self._import_legacy_history(session_id)
+            row = conn.execute(
+                "SELECT summary, history_seq FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return "", [], 0
+
+        with conn:
+            # One read transaction, so the summary matches the messages left after folding
+            conn.execute("BEGIN")
+            rows = conn.execute(
+                "SELECT seq, message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+            summary, history_seq = conn.execute(
+                "SELECT summary, history_seq FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        messages = messages_from_dict([json.loads(data) for _, data in rows])
+        return summary, [(seq, message) for (seq, _), message in zip(rows, messages)], history_seq
+
+    def history_seq(self, session_id: str) -> int:
+        row = self._connect().execute(
+            "SELECT history_seq FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def delete_history(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute(
+                "UPDATE sessions SET summary = '', history_seq = -1 WHERE session_id = ?", (session_id,)
+            )
+
+    def lock(self, session_id: str) -> SessionLock:
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        with self._thread_locks_guard:
+            thread_lock = self._thread_locks.setdefault(digest, threading.Lock())
+        return _FileLock(os.path.join(self.root, self.LOCK_DIR, f"{digest}.lock"), thread_lock)
+
+    def save_job(self, job_id: str, data: Dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)",
+                (job_id, json.dumps(data), time.time())
+            )
+
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune_jobs(self, keep: int) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE job_id NOT IN "
+                "(SELECT job_id FROM jobs ORDER BY updated_at DESC LIMIT ?)",
+                (keep,)
+            )
+
+    def close(self) -> None:
+        with self._thread_locks_guard:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+def create_state_backend(name: str, root: str) -> SessionStateBackend:
+    """
+    Create the backend named by SESSION_STATE_BACKEND
+
+    "local" is LocalStateBackend. Any other value is a "package.module:Class"
+    path to a SessionStateBackend subclass, constructed with ``root``.
+    """
+    if name == "local":
+        return LocalStateBackend(root)
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown session state backend {name!r}; use 'local' or 'package.module:Class'")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    if not issubclass(backend_class, SessionStateBackend):
+        raise ValueError(f"{name} is not a SessionStateBackend")
+    return backend_class(root)
@@ -0,0 +1,259 @@
+"""
+Search Tool Result Caching
+"""
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, ClassVar, Dict, Optional, Set, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+from pydantic import PrivateAttr
+
+
+class ToolResultCache:
+    """
+    TTL cache of search tool results, in memory with an optional SQLite store.
+
+    The memory level is an LRU bounded by ``max_entries``. When ``db_path`` is
+    set, results are also written to SQLite, so they survive restarts and are
+    shared by every worker process on the host. Entries carry their own
+    expiry, so each tool can use a different TTL. Lookups and writes may
+    touch the disk, so async callers run them in a worker thread.
+    """
+
+    PURGE_EVERY = 500
+
+    def __init__(self, max_entries: int, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            # Readers in other workers do not block on writers, and commits skip the fsync
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tool_results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        self._puts = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return an unexpired result, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM tool_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str, ttl_seconds: float) -> None:
+        """Store a result for ``ttl_seconds``"""
+        if ttl_seconds <= 0:
+            return
+        expires_at = time.time() + ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tool_results (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._puts += 1
+                if self._puts % self.PURGE_EVERY == 0:
+                    self._db.execute("DELETE FROM tool_results WHERE expires_at <= ?", (time.time(),))
+                self._db.commit()
+
+    def record_coalesced(self) -> None:
+        """Count a lookup that joined an identical in-flight call"""
+        with self._lock:
+            self.coalesced += 1
+
+    def stats(self) -> Dict:
+        """Return hit, miss and coalescing counts"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+    def close(self) -> None:
+        """Close the SQLite store"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class CachedSearchTool(BaseTool):
+    """
+    Wraps a search tool with result caching and single-flight deduplication.
+
+    Inputs are normalised (case and whitespace), so near-identical queries
+    reissued by the agent share an entry. Concurrent identical lookups wait
+    on the one outbound call already in flight instead of issuing their own.
+    An async caller that gives up, for example on a timeout, does not cancel
+    that call, so it still warms the cache. Any ``BaseTool`` can be wrapped,
+    including local stand-ins for the real backends.
+
+    The LangChain search wrappers report failures as return values, such as
+    "Arxiv exception: ..." or "No good Wikipedia Search Result was found".
+    Those are kept only for ``failure_ttl_seconds``, so a transient outage
+    is retried soon instead of being served for the tool's full TTL.
+    """
+
+    FAILURE_PATTERN: ClassVar[re.Pattern] = re.compile(r"^\s*(?:$|\w+ exception:|No good .* was found)", re.IGNORECASE)
+
+    tool: BaseTool
+    cache: ToolResultCache
+    ttl_seconds: float
+    failure_ttl_seconds: float = 60.0
+    namespace: str = ""
+
+    _inflight: Dict[str, Future] = PrivateAttr(default_factory=dict)
+    _inflight_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _tasks: Set[asyncio.Task] = PrivateAttr(default_factory=set)
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @classmethod
+    def wrap(
+        cls,
+        tool: BaseTool,
+        cache: ToolResultCache,
+        ttl_seconds: float,
+        namespace: str = "",
+        failure_ttl_seconds: float = 60.0
+    ) -> "CachedSearchTool":
+        """Wrap a tool, keeping its name, description and input schema"""
+        return cls(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            tool=tool,
+            cache=cache,
+            ttl_seconds=ttl_seconds,
+            failure_ttl_seconds=failure_ttl_seconds,
+            namespace=namespace or tool.name
+        )
+
+    def _key(self, query: str) -> str:
+        return f"{self.namespace}:{' '.join(str(query).lower().split())}"
+
+    def _claim(self, key: str) -> Tuple[Future, bool]:
+        """Get the in-flight call for a key, and whether the caller must make it"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            # A running future cannot be cancelled by a waiter that gives up
+            future.set_running_or_notify_cancel()
+            self._inflight[key] = future
+            return future, True
+
+    def _store(self, key: str, result: str) -> None:
+        """Cache a result, for the failure TTL if it reports a failure"""
+        failed = self.FAILURE_PATTERN.match(result) is not None
+        ttl_seconds = min(self.ttl_seconds, self.failure_ttl_seconds) if failed else self.ttl_seconds
+        if ttl_seconds > 0:
+            self.cache.put(key, result, ttl_seconds)
+
+    def _settle(self, key: str, future: Future, result: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        key = self._key(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        future, leader = self._claim(key)
+        if not leader:
+            self.cache.record_coalesced()
+            return future.result()
+
+        try:
+            config = {"callbacks": run_manager.get_child()} if run_manager else None
+            result = str(self.tool.invoke(query, config=config))
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        try:
+            self._store(key, result)
+        finally:
+            self._settle(key, future, result=result)
+        return result
+
+    async def _fetch(self, key: str, query: str, future: Future) -> None:
+        try:
+            result = str(await self.tool.ainvoke(query))
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            return
+        try:
+            await asyncio.to_thread(self._store, key, result)
+        finally:
+            self._settle(key, future, result=result)
+
+    async def _arun(self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        key = self._key(query)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+
+        future, leader = self._claim(key)
+        if leader:
+            # Run the outbound call as its own task so it outlives cancelled waiters
+            task = asyncio.create_task(self._fetch(key, query, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.cache.record_coalesced()
+        return await asyncio.shield(asyncio.wrap_future(future))
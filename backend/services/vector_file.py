@@ -0,0 +1,84 @@
+"""
+On-Disk Float32 Vectors for Exact Re-Ranking
+"""
+import os
+from typing import Optional
+
+import numpy as np
+
+
+class FloatVectorFile:
+    """
+    Append-only float32 copy of a session's vectors, read through a memory map.
+
+    Quantized indexes keep only compact codes in memory. This file keeps the
+    original vectors so retrieval can re-score its candidates exactly. Only
+    the candidate rows are paged in. Row ``i`` is the vector at index
+    position ``i``. An instance is a snapshot of the first ``count`` rows.
+    Appending writes to the end of the file and returns a new snapshot, so
+    readers of an older one are unaffected, like the copy-on-write stores.
+    """
+
+    def __init__(self, path: str, dimension: int, count: int):
+        self.path = path
+        self.dimension = dimension
+        self.count = count
+        self._vectors: Optional[np.ndarray] = None
+
+    @classmethod
+    def open(cls, path: str, dimension: int, expected_count: int) -> Optional["FloatVectorFile"]:
+        """
+        Open the file for an index holding ``expected_count`` vectors
+
+        Rows past ``expected_count``, left by an append whose index was never
+        saved or by another worker mid-append, are ignored; the next append
+        overwrites them. Returns None if the file is missing or shorter than
+        the index.
+        """
+        if not os.path.exists(path):
+            return None
+        count = os.path.getsize(path) // (dimension * 4)
+        if count < expected_count:
+            return None
+        return cls(path, dimension, expected_count)
+
+    @classmethod
+    def create(cls, path: str, vectors: np.ndarray) -> "FloatVectorFile":
+        """
+        Write a new file holding ``vectors``
+
+        The file is written aside and renamed over ``path``, so memory maps
+        of a previous file, in this or another process, stay valid.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(vectors.tobytes())
+        os.replace(temp_path, path)
+        return cls(path, vectors.shape[1], len(vectors))
+
+    def append(self, vectors: np.ndarray) -> "FloatVectorFile":
+        """Append rows and return a snapshot that includes them"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with open(self.path, "r+b") as f:
+            # Overwrite anything past this snapshot left by a failed append
+            f.seek(self.count * self.dimension * 4)
+            f.write(vectors.tobytes())
+            f.truncate()
+        return FloatVectorFile(self.path, self.dimension, self.count + len(vectors))
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The snapshot's rows as a read-only memory map"""
+        if self._vectors is None:
+            if self.count == 0:
+                self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+            else:
+                self._vectors = np.memmap(
+                    self.path, dtype=np.float32, mode="r", shape=(self.count, self.dimension)
+                )
+        return self._vectors
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,178 @@
+"""
+Embedding Backend Benchmark
+
+Measures chunks/sec, model load time and first-call (warm-up) latency of
+each embedding backend (torch, onnx, onnx_int8) on this host, at each
+intra-op thread count. Every backend's vectors are also compared with the
+PyTorch ones by cosine similarity, the parity check for switching
+EMBEDDING_BACKEND. Chunks are synthetic text of CHUNK_SIZE characters:
+
+    python -m benchmarks.embedding_backends --chunks 256 --threads 1,4
+    python -m benchmarks.embedding_backends --backends onnx_int8 --min-cosine 0.98 --fail-on-parity
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from backend.config import settings
+from backend.services.embedding_backends import EMBEDDING_BACKENDS, create_embeddings, warm_up
+from benchmarks.pipeline import parse_ints, summarize
+from benchmarks.synthetic import make_paragraphs
+
+
+def make_chunks(count: int, chunk_size: int, seed: int) -> List[str]:
+    """Synthetic chunks of about ``chunk_size`` characters"""
+    rng = random.Random(seed)
+    # Roughly 8 characters per vocabulary word and separator
+    return [make_paragraphs(rng, max(1, chunk_size // 8))[:chunk_size] for _ in range(count)]
+
+
+def embed_all(embeddings, chunks: List[str], batch_size: int) -> np.ndarray:
+    """Embed chunks in ingestion-sized batches"""
+    vectors = []
+    for start in range(0, len(chunks), batch_size):
+        vectors.extend(embeddings.embed_documents(chunks[start:start + batch_size]))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def parity(vectors: np.ndarray, reference: np.ndarray) -> Dict:
+    """Cosine similarity of each vector with its PyTorch counterpart"""
+    cosine = (vectors * reference).sum(axis=1) / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+    )
+    return {"mean_cosine": float(cosine.mean()), "min_cosine": float(cosine.min())}
+
+
+@contextmanager
+def restore_torch_threads() -> Iterator[None]:
+    """Undo a case's torch.set_num_threads, which is process-wide, once it is done"""
+    try:
+        import torch
+    except ImportError:
+        yield
+        return
+    previous = torch.get_num_threads()
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+def bench_backend(backend: str, threads: int, chunks: List[str], args: argparse.Namespace) -> Dict:
+    """Load, warm up and time one backend; returns the case and its vectors"""
+    # Later cases, and the torch parity reference, must not inherit this thread count
+    with restore_torch_threads():
+        return _bench_backend(backend, threads, chunks, args)
+
+
+def _bench_backend(backend: str, threads: int, chunks: List[str], args: argparse.Namespace) -> Dict:
+    start = time.perf_counter()
+    embeddings = create_embeddings(
+        backend,
+        settings.EMBEDDING_MODEL,
+        threads=threads,
+        quantization=args.quantization,
+        cache_dir=settings.EMBEDDING_ONNX_DIR
+    )
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm_up(embeddings, settings.CHUNK_SIZE, args.batch_size)
+    warmup_seconds = time.perf_counter() - start
+
+    timings = []
+    vectors = None
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        vectors = embed_all(embeddings, chunks, args.batch_size)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "backend": backend,
+        "threads": threads,
+        "load_seconds": load_seconds,
+        "warmup_seconds": warmup_seconds,
+        "chunks_per_second": len(chunks) / (min(timings) / 1000),
+        "latency": summarize(timings),
+        "vectors": vectors,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict:
+    chunks = make_chunks(args.chunks, settings.CHUNK_SIZE, args.seed)
+    cases = [
+        bench_backend(backend, threads, chunks, args)
+        for backend in args.backends
+        for threads in args.threads
+    ]
+    print(f"finished {len(cases)} backend runs", file=sys.stderr)
+
+    reference = next((case["vectors"] for case in cases if case["backend"] == "torch"), None)
+    if reference is None:
+        reference = embed_all(create_embeddings("torch", settings.EMBEDDING_MODEL), chunks, args.batch_size)
+
+    results = []
+    for case in cases:
+        vectors = case.pop("vectors")
+        result = {**case, **parity(vectors, reference)}
+        result["parity_ok"] = result["min_cosine"] >= args.min_cosine
+        results.append(result)
+
+    return {
+        "meta": {
+            "model": settings.EMBEDDING_MODEL,
+            "chunks": len(chunks),
+            "chunk_size": settings.CHUNK_SIZE,
+            "batch_size": args.batch_size,
+            "quantization": args.quantization,
+            "min_cosine": args.min_cosine,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", type=lambda v: v.split(","), default=list(EMBEDDING_BACKENDS),
+                        help="Comma-separated embedding backends")
+    parser.add_argument("--threads", type=parse_ints, default=[settings.EMBEDDING_THREADS],
+                        help="Comma-separated intra-op thread counts (0 = library default)")
+    parser.add_argument("--quantization", default=settings.EMBEDDING_ONNX_QUANTIZATION,
+                        help="int8 quantization target for onnx_int8 (arm64, avx2, avx512, avx512_vnni)")
+    parser.add_argument("--chunks", type=int, default=256, help="Number of synthetic chunks to embed")
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_EMBED_BATCH_SIZE)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the chunks per backend")
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Lowest cosine similarity with the PyTorch vectors that counts as parity")
+    parser.add_argument("--fail-on-parity", action="store_true", help="Exit non-zero if any backend misses parity")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    failed = [r for r in report["results"] if not r["parity_ok"]]
+    for result in failed:
+        print(
+            f"PARITY {result['backend']} (threads={result['threads']}): "
+            f"min cosine {result['min_cosine']:.4f} < {args.min_cosine}",
+            file=sys.stderr
+        )
+    return 1 if failed and args.fail_on_parity else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
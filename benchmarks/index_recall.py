@@ -0,0 +1,246 @@
+"""
+Approximate Index Recall Benchmark
+
+Measures recall@k against exact search, query latency, build time and index
+memory per 10k chunks for each index type (flat, hnsw, ivf_flat, ivf_pq) and
+vector storage (float32, fp16, sq8, pq) on a persisted session's own
+vectors. Quantized storage is measured both raw and with exact float32
+re-ranking of an oversampled candidate list, as retrieval does it.
+
+Queries are stored chunk vectors with Gaussian noise added, which stands in
+for questions phrased close to a passage. Pass --queries-file to embed real
+questions (one per line) with the configured embedding model instead.
+Sessions are read from SESSION_STORE_DIR. Use --synthetic for clustered
+random vectors when no large session is at hand:
+
+    python -m benchmarks.index_recall --session <session_id> --k 4,20
+    python -m benchmarks.index_recall --synthetic 100000 --nprobe 8,16,32 --ef-search 32,64,128
+    python -m benchmarks.index_recall --synthetic 10000 --types flat,hnsw --storage float32,fp16,sq8,pq
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+from dataclasses import replace
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from backend.config import settings
+from backend.services.index_factory import (
+    INDEX_TYPES, STORAGE_TYPES, IndexParams, build_index, index_type_of, is_quantized, prepare_index
+)
+from backend.services.mmr import rerank_exact
+from backend.services.session_store import SessionStore
+from backend.services.vector_file import FloatVectorFile
+from benchmarks.pipeline import parse_ints, summarize
+
+
+def load_session_vectors(session_id: str) -> np.ndarray:
+    """
+    The original float32 vectors of a persisted session, in index order
+
+    A quantized session's index only decodes lossy approximations, which
+    would make every configuration look closer to exact than it is, so its
+    float32 file is read instead.
+    """
+    store = SessionStore(settings.SESSION_STORE_DIR)
+    if not store.exists(session_id):
+        raise SystemExit(f"No persisted session {session_id!r} in {settings.SESSION_STORE_DIR}")
+    index, _ = store.load_index(session_id, mmap=False)
+    if not is_quantized(index):
+        return index.reconstruct_n(0, index.ntotal)
+    exact = FloatVectorFile.open(store.vectors_path(session_id), index.d, index.ntotal)
+    if exact is None:
+        raise SystemExit(
+            f"Session {session_id!r} has a quantized index and no complete float32 vectors file; "
+            "upload a file to the session to rebuild it, or use --synthetic"
+        )
+    return np.array(exact.vectors)
+
+
+def synthetic_vectors(count: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    """Normalized vectors drawn around random centres, like topical chunks"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors: np.ndarray, count: int, noise: float, seed: int) -> np.ndarray:
+    """Perturbed copies of randomly chosen stored vectors"""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)]
+    queries = picked + noise * rng.standard_normal(picked.shape).astype(np.float32)
+    return np.ascontiguousarray(queries / np.linalg.norm(queries, axis=1, keepdims=True), dtype=np.float32)
+
+
+def embed_queries(path: str) -> np.ndarray:
+    """Embed one question per line with the configured embedding model"""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    embeddings = HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL,
+        encode_kwargs={"normalize_embeddings": True}
+    )
+    return np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+
+
+def recall(found: np.ndarray, exact: np.ndarray) -> float:
+    """Mean fraction of the exact top-k present in the approximate top-k"""
+    hits = [len(set(row[row != -1]) & set(truth)) / len(truth) for row, truth in zip(found, exact)]
+    return float(np.mean(hits))
+
+
+def measure(
+    index: faiss.Index,
+    queries: np.ndarray,
+    exact: Dict[int, np.ndarray],
+    float_vectors: Optional[np.ndarray] = None,
+    oversample: int = 1
+) -> Dict:
+    """
+    Recall@k and single-query latency of one configured index
+
+    With ``float_vectors``, ``oversample * k`` candidates are fetched and
+    re-ranked against them before taking the top k.
+    """
+    result = {}
+    for k, truth in exact.items():
+        timings = []
+        found = []
+        for query in queries:
+            start = time.perf_counter()
+            if float_vectors is None:
+                _, positions = index.search(query[None, :], k)
+                positions = positions[0]
+            else:
+                _, positions = index.search(query[None, :], k * oversample)
+                positions = positions[0][positions[0] != -1]
+                positions, _ = rerank_exact(positions, index.reconstruct_batch(positions), query, float_vectors, k)
+            timings.append((time.perf_counter() - start) * 1000)
+            found.append(np.pad(positions, (0, k - len(positions)), constant_values=-1))
+        result[f"recall@{k}"] = recall(np.vstack(found), truth)
+        result[f"latency@{k}"] = summarize(timings)
+    return result
+
+
+def search_variants(index_type: str, params: IndexParams, args: argparse.Namespace) -> List[IndexParams]:
+    """Search-time parameter settings to sweep for an index type"""
+    if index_type == "hnsw":
+        return [replace(params, ef_search=ef) for ef in args.ef_search or [params.ef_search]]
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return [replace(params, nprobe=nprobe) for nprobe in args.nprobe or [params.nprobe]]
+    return [params]
+
+
+def run(args: argparse.Namespace) -> Dict:
+    if args.session:
+        vectors = load_session_vectors(args.session)
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dimension, args.clusters, args.seed)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = embed_queries(args.queries_file) if args.queries_file else make_queries(
+        vectors, args.queries, args.noise, args.seed
+    )
+
+    # Ground truth from exact search
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    exact = {k: flat.search(queries, k)[1] for k in args.k}
+
+    # Exact re-ranking reads the float32 originals from a memory-mapped file, as retrieval does
+    float_path = os.path.join(tempfile.mkdtemp(prefix="bench-vectors-"), "vectors.f32")
+    float_vectors = FloatVectorFile.create(float_path, vectors).vectors
+
+    results = []
+    for index_type in args.types:
+        for storage in args.storage:
+            params = replace(IndexParams.from_settings(), storage=storage)
+            start = time.perf_counter()
+            try:
+                index = build_index(vectors, index_type, params)
+            except ValueError as e:
+                print(f"skipping {index_type}/{storage}: {e}", file=sys.stderr)
+                continue
+            build_seconds = time.perf_counter() - start
+            try:
+                code_size = index.sa_code_size()
+            except (AttributeError, RuntimeError):
+                code_size = index.d * 4
+
+            for variant in search_variants(index_type, params, args):
+                prepare_index(index, variant)
+                case = {
+                    "index_type": index_type_of(index),
+                    "storage": storage,
+                    "ef_search": variant.ef_search if index_type == "hnsw" else None,
+                    "nprobe": variant.nprobe if index_type.startswith("ivf") else None,
+                    "build_seconds": build_seconds,
+                    "bytes_per_vector": code_size,
+                    # Vector codes only; graph links and list ids come on top
+                    "index_mb_per_10k_chunks": code_size * 10000 / (1024 * 1024),
+                }
+                results.append({**case, "rerank": False, **measure(index, queries, exact)})
+                if is_quantized(index):
+                    results.append({
+                        **case,
+                        "rerank": True,
+                        "oversample": args.oversample,
+                        **measure(index, queries, exact, float_vectors, args.oversample),
+                    })
+            print(f"finished {index_type}/{storage}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "vectors": len(vectors),
+            "dimension": vectors.shape[1],
+            "queries": len(queries),
+            "source": args.session or f"synthetic:{args.synthetic}",
+            "faiss_threads": faiss.omp_get_max_threads(),
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--session", help="Persisted session id to benchmark on")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic vectors instead of a session")
+    parser.add_argument("--types", type=lambda v: v.split(","), default=list(INDEX_TYPES), help="Comma-separated index types")
+    parser.add_argument("--storage", type=lambda v: v.split(","), default=["float32"],
+                        help=f"Comma-separated vector storage modes ({','.join(STORAGE_TYPES)})")
+    parser.add_argument("--oversample", type=int, default=settings.INDEX_RERANK_OVERSAMPLE,
+                        help="Candidates fetched per result before exact re-ranking")
+    parser.add_argument("--k", type=parse_ints, default=[4, 20], help="Comma-separated recall depths")
+    parser.add_argument("--queries", type=int, default=500, help="Number of sampled queries")
+    parser.add_argument("--queries-file", help="Questions to embed, one per line, instead of sampled queries")
+    parser.add_argument("--noise", type=float, default=0.05, help="Noise added to sampled query vectors")
+    parser.add_argument("--nprobe", type=parse_ints, help="IVF nprobe values to sweep (default: INDEX_NPROBE)")
+    parser.add_argument("--ef-search", type=parse_ints, help="HNSW efSearch values to sweep (default: INDEX_HNSW_EF_SEARCH)")
+    parser.add_argument("--dimension", type=int, default=384, help="Synthetic vector dimension")
+    parser.add_argument("--clusters", type=int, default=256, help="Synthetic topic clusters")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    output = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
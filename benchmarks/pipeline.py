@@ -0,0 +1,431 @@
+"""
+Ingestion and Chat Pipeline Benchmark
+
+Runs PDFService end to end with no network access: synthetic PDFs, a
+deterministic hashed bag-of-words embedding model and a fake chat model with
+configurable latency and token rate. Every stage of upload_pdfs (read, hash,
+parse, split, embed, index, persist) and chat_with_pdfs (rewrite, retrieve,
+MMR, answer) is timed across document sizes, followed by end-to-end runs at
+several concurrency levels. Dense MMR retrieval is also timed at several
+fetch_k pool sizes, batched and through LangChain's per-candidate loop. Results are written as JSON and can be compared
+against a previous run:
+
+    python -m benchmarks.pipeline --pages 10,100 --concurrency 1,4,16 --output run.json
+    python -m benchmarks.pipeline --baseline run.json --fail-on-regression
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import UploadFile
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.messages import AIMessage, HumanMessage
+
+from backend.config import settings
+from backend.models import ChatRequest
+from backend.services.embedding_cache import CachedChunk
+from backend.services.pdf_intake import read_uploads
+from backend.services.mmr import MMRRetriever
+from backend.services.pdf_service import PDFService
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from benchmarks.synthetic import make_pdf, make_questions
+
+
+def summarize(values: List[float]) -> Dict:
+    """Summary statistics of a list of millisecond timings"""
+    ordered = sorted(values)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "min_ms": ordered[0],
+        "max_ms": ordered[-1],
+    }
+
+
+class StageTimer:
+    """Collects wall-clock timings per named stage"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append((time.perf_counter() - started) * 1000)
+
+    def summary(self) -> Dict[str, Dict]:
+        return {name: summarize(values) for name, values in self.samples.items()}
+
+
+class BenchmarkPDFService(PDFService):
+    """PDFService wired to the offline embedding and chat models"""
+
+    def __init__(self, embeddings: FakeEmbeddings, llm: FakeChatModel):
+        self._fake_embeddings = embeddings
+        self._fake_llm = llm
+        super().__init__()
+
+    def _initialize_embeddings(self) -> FakeEmbeddings:
+        return self._fake_embeddings
+
+    def _get_llm(self, temperature: float, max_tokens: int) -> FakeChatModel:
+        return self._fake_llm
+
+
+def upload_file(data: bytes, filename: str) -> UploadFile:
+    """Wrap PDF bytes as a FastAPI upload"""
+    return UploadFile(file=io.BytesIO(data), filename=filename, size=len(data))
+
+
+def fetch_k(search_k: int) -> int:
+    """Candidate count the chat retriever fetches before MMR"""
+    return PDFService._fetch_k(ChatRequest(query="", session_id="", search_k=search_k))
+
+
+async def bench_ingest_stages(service: PDFService, pages: int, repeats: int) -> Dict:
+    """Time each ingestion stage for one document size"""
+    timer = StageTimer()
+    chunk_counts = []
+    for repeat in range(repeats):
+        session_id = f"bench-ingest-{pages}-{repeat}"
+        data = make_pdf(pages, seed=pages * 1000 + repeat)
+        with timer.stage("read"):
+            files = await read_uploads([upload_file(data, f"doc-{pages}-{repeat}.pdf")])
+        filename, buffer = files[0]
+        try:
+            with timer.stage("hash"):
+                view = buffer.view()
+                hashlib.sha256(view).hexdigest()
+                view.release()
+            with timer.stage("parse"):
+                docs = await service.pdf_parser.parse(buffer, filename)
+            with timer.stage("split"):
+                splits = service.text_splitter.split_documents(docs)
+            with timer.stage("embed"):
+                vectors = await asyncio.to_thread(
+                    service.embeddings.embed_documents, [split.page_content for split in splits]
+                )
+            chunks = [
+                CachedChunk(text=split.page_content, metadata=split.metadata, vector=vector)
+                for split, vector in zip(splits, vectors)
+            ]
+            with timer.stage("index"):
+                service._index_chunks(session_id, chunks)
+            service.processed_files.setdefault(session_id, set()).add(buffer.sha256)
+            with timer.stage("persist"):
+                service._persist_session(session_id)
+            chunk_counts.append(len(chunks))
+        finally:
+            buffer.close()
+            await service.clear_session(session_id)
+
+    return {
+        "benchmark": "ingest_stages",
+        "pages": pages,
+        "chunks": max(chunk_counts),
+        "stages": timer.summary(),
+    }
+
+
+async def bench_ingest_concurrency(service: PDFService, pages: int, concurrency: int) -> Dict:
+    """Time concurrent end-to-end uploads of distinct documents"""
+    documents = [make_pdf(pages, seed=pages * 7919 + i) for i in range(concurrency)]
+    latencies = []
+
+    async def upload(i: int) -> None:
+        started = time.perf_counter()
+        await service.upload_pdfs(
+            [upload_file(documents[i], f"doc-{i}.pdf")],
+            f"bench-upload-{pages}-{concurrency}-{i}"
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[upload(i) for i in range(concurrency)])
+    wall_seconds = time.perf_counter() - started
+
+    for i in range(concurrency):
+        await service.clear_session(f"bench-upload-{pages}-{concurrency}-{i}")
+    return {
+        "benchmark": "ingest_concurrency",
+        "pages": pages,
+        "concurrency": concurrency,
+        "latency": summarize(latencies),
+        "wall_ms": wall_seconds * 1000,
+        "pages_per_second": pages * concurrency / wall_seconds,
+    }
+
+
+async def bench_chat_stages(service: PDFService, pages: int, repeats: int, search_k: int) -> Dict:
+    """Time each chat stage against one indexed document"""
+    session_id = f"bench-chat-stages-{pages}"
+    await service.upload_pdfs([upload_file(make_pdf(pages, seed=pages), "chat.pdf")], session_id)
+    vector_store = service.vector_stores[session_id]
+    llm = service._get_llm(0.3, 2048)
+    answer_chain = create_stuff_documents_chain(llm, service.qa_prompt)
+    history = [HumanMessage(content="What is the coverage limit?"), AIMessage(content="The limit is stated in section 2.")]
+
+    timer = StageTimer()
+    try:
+        for query in make_questions(repeats, seed=pages):
+            # A follow-up with a reference forces the LLM rewrite; the suffix defeats its cache
+            follow_up = f"And what about its exclusions? {query}"
+            with timer.stage("rewrite"):
+                standalone = await service.question_rewriter.arewrite(llm, follow_up, history)
+            with timer.stage("retrieve"):
+                query_vector = await service.embeddings.aembed_query(standalone)
+                await asyncio.to_thread(
+                    vector_store.similarity_search_with_score_by_vector, query_vector, fetch_k(search_k)
+                )
+            with timer.stage("mmr"):
+                retriever = MMRRetriever(
+                    vector_store=vector_store,
+                    k=search_k,
+                    fetch_k=fetch_k(search_k),
+                    lambda_mult=settings.MMR_LAMBDA
+                )
+                docs = await asyncio.to_thread(retriever._search, query_vector)
+            with timer.stage("answer"):
+                await answer_chain.ainvoke({"input": standalone, "context": docs, "chat_history": history})
+    finally:
+        await service.clear_session(session_id)
+
+    return {
+        "benchmark": "chat_stages",
+        "pages": pages,
+        "search_k": search_k,
+        "fetch_k": fetch_k(search_k),
+        "stages": timer.summary(),
+    }
+
+
+async def bench_retrieval_fetch_k(
+    service: PDFService, pages: int, repeats: int, search_k: int, pools: List[int]
+) -> List[Dict]:
+    """Time dense MMR retrieval per fetch_k pool size, batched and via LangChain's loop"""
+    session_id = f"bench-fetch-k-{pages}"
+    await service.upload_pdfs([upload_file(make_pdf(pages, seed=pages), "retrieval.pdf")], session_id)
+    vector_store = service.vector_stores[session_id]
+    query_vectors = [await service.embeddings.aembed_query(query) for query in make_questions(repeats, seed=pages)]
+
+    results = []
+    try:
+        for pool in pools:
+            retriever = MMRRetriever(vector_store=vector_store, k=search_k, fetch_k=pool, lambda_mult=settings.MMR_LAMBDA)
+            timer = StageTimer()
+            for query_vector in query_vectors:
+                with timer.stage("batched_mmr"):
+                    retriever._search(query_vector)
+                with timer.stage("langchain_mmr"):
+                    vector_store.max_marginal_relevance_search_by_vector(
+                        query_vector, search_k, pool, settings.MMR_LAMBDA
+                    )
+            results.append({
+                "benchmark": "retrieval_fetch_k",
+                "pages": pages,
+                "chunks": vector_store.index.ntotal,
+                "search_k": search_k,
+                "fetch_k": pool,
+                "stages": timer.summary(),
+            })
+    finally:
+        await service.clear_session(session_id)
+    return results
+
+
+async def bench_chat_concurrency(service: PDFService, pages: int, concurrency: int, search_k: int) -> Dict:
+    """Time concurrent end-to-end chat requests, one session per client"""
+    data = make_pdf(pages, seed=pages)
+    session_ids = [f"bench-chat-{pages}-{concurrency}-{i}" for i in range(concurrency)]
+    for session_id in session_ids:
+        await service.upload_pdfs([upload_file(data, "chat.pdf")], session_id)
+
+    questions = make_questions(concurrency, seed=pages * 31 + concurrency)
+    latencies = []
+
+    async def chat(i: int) -> None:
+        started = time.perf_counter()
+        await service.chat_with_pdfs(ChatRequest(
+            query=questions[i],
+            session_id=session_ids[i],
+            search_k=search_k
+        ))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[chat(i) for i in range(concurrency)])
+    wall_seconds = time.perf_counter() - started
+
+    for session_id in session_ids:
+        await service.clear_session(session_id)
+    return {
+        "benchmark": "chat_concurrency",
+        "pages": pages,
+        "concurrency": concurrency,
+        "latency": summarize(latencies),
+        "wall_ms": wall_seconds * 1000,
+        "requests_per_second": concurrency / wall_seconds,
+    }
+
+
+def result_key(result: Dict) -> str:
+    """Stable identifier of a benchmark case across runs"""
+    parts = [result["benchmark"], f"pages={result['pages']}"]
+    if "concurrency" in result:
+        parts.append(f"concurrency={result['concurrency']}")
+    if result["benchmark"] == "retrieval_fetch_k":
+        parts.append(f"fetch_k={result['fetch_k']}")
+    return "/".join(parts)
+
+
+def flatten(results: List[Dict], metric: str) -> Dict[str, float]:
+    """Map every stage or latency of every case to one metric value"""
+    flat = {}
+    for result in results:
+        key = result_key(result)
+        for stage, summary in result.get("stages", {}).items():
+            flat[f"{key}/{stage}"] = summary[metric]
+        if "latency" in result:
+            flat[f"{key}/latency"] = result["latency"][metric]
+    return flat
+
+
+def compare(results: List[Dict], baseline: List[Dict], metric: str, threshold: float) -> List[Dict]:
+    """Compare a run against a baseline, flagging slowdowns beyond the threshold"""
+    current = flatten(results, metric)
+    previous = flatten(baseline, metric)
+    comparison = []
+    for key in sorted(current.keys() & previous.keys()):
+        ratio = current[key] / previous[key] if previous[key] else float("inf")
+        comparison.append({
+            "case": key,
+            "baseline_ms": previous[key],
+            "current_ms": current[key],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return comparison
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=parse_ints, default=[10, 100], help="Comma-separated document sizes in pages")
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 4, 16], help="Comma-separated concurrency levels")
+    parser.add_argument("--repeats", type=int, default=5, help="Samples per stage benchmark")
+    parser.add_argument("--search-k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=parse_ints, default=[20, 100, 500], help="Comma-separated MMR candidate pool sizes")
+    parser.add_argument("--retrieval-pages", type=int, default=1000, help="Document size for the fetch_k benchmark")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--llm-response-tokens", type=int, default=80)
+    parser.add_argument("--embed-ms-per-text", type=float, default=0.0, help="Simulated embedding cost per text")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Results JSON of a previous run to compare against")
+    parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p95_ms"])
+    parser.add_argument("--regression-threshold", type=float, default=0.2, help="Allowed slowdown ratio, e.g. 0.2 = 20%%")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit non-zero if any case regressed")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    # Isolate the run: throwaway session store, and no answer cache hiding pipeline cost
+    settings.SESSION_STORE_DIR = tempfile.mkdtemp(prefix="bench-sessions-")
+    settings.ANSWER_CACHE_ENABLED = False
+
+    service = BenchmarkPDFService(
+        FakeEmbeddings(ms_per_text=args.embed_ms_per_text),
+        FakeChatModel(
+            latency_ms=args.llm_latency_ms,
+            tokens_per_second=args.llm_tokens_per_second,
+            response_tokens=args.llm_response_tokens
+        )
+    )
+    results = []
+    try:
+        for pages in args.pages:
+            results.append(await bench_ingest_stages(service, pages, args.repeats))
+            results.append(await bench_chat_stages(service, pages, args.repeats, args.search_k))
+            for concurrency in args.concurrency:
+                results.append(await bench_ingest_concurrency(service, pages, concurrency))
+                results.append(await bench_chat_concurrency(service, pages, concurrency, args.search_k))
+            print(f"finished {pages}-page cases", file=sys.stderr)
+        results.extend(await bench_retrieval_fetch_k(
+            service, args.retrieval_pages, args.repeats, args.search_k, args.fetch_k
+        ))
+        print("finished fetch_k cases", file=sys.stderr)
+    finally:
+        service.shutdown()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        report["comparison"] = compare(report["results"], baseline, args.metric, args.regression_threshold)
+        regressions = [entry for entry in report["comparison"] if entry["regression"]]
+        for entry in regressions:
+            print(
+                f"REGRESSION {entry['case']}: {entry['baseline_ms']:.1f} -> {entry['current_ms']:.1f} ms "
+                f"({entry['ratio']:.2f}x)",
+                file=sys.stderr
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
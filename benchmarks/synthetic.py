@@ -0,0 +1,51 @@
+"""
+Synthetic PDF Generation
+"""
+import random
+from typing import List
+
+import fitz
+
+
+VOCABULARY = (
+    "policy coverage claim premium deductible insured benefit exclusion renewal "
+    "liability contract clause period notice amendment schedule limit payment "
+    "employee employer leave vacation remote travel expense reimbursement approval "
+    "security data privacy access retention incident breach audit compliance "
+    "model training dataset evaluation accuracy latency throughput memory index "
+    "vector embedding retrieval ranking search document page section table figure"
+).split()
+
+
+def make_paragraphs(rng: random.Random, words: int) -> str:
+    """Generate ``words`` words of pseudo-text split into short paragraphs"""
+    paragraphs: List[str] = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(40, 90))
+        sentence_words = [rng.choice(VOCABULARY) for _ in range(length)]
+        paragraphs.append(" ".join(sentence_words).capitalize() + ".")
+        remaining -= length
+    return "\n\n".join(paragraphs)
+
+
+def make_pdf(pages: int, words_per_page: int = 350, seed: int = 0) -> bytes:
+    """Build a PDF with ``pages`` pages of deterministic text"""
+    rng = random.Random(seed)
+    pdf = fitz.open()
+    for page_number in range(pages):
+        page = pdf.new_page()
+        text = f"Section {page_number + 1}\n\n" + make_paragraphs(rng, words_per_page)
+        page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=8)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def make_questions(count: int, seed: int = 0) -> List[str]:
+    """Generate distinct questions drawn from the synthetic vocabulary"""
+    rng = random.Random(seed)
+    return [
+        f"What does the document say about {rng.choice(VOCABULARY)} and {rng.choice(VOCABULARY)} (q{i})?"
+        for i in range(count)
+    ]
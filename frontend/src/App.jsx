@@ -3,13 +3,14 @@ import Header from './components/Header';
 import SettingsPanel from './components/SettingsPanel';
 import Sidebar from './components/Sidebar';
 import ChatArea from './components/ChatArea';
-import { uploadPDFs, sendChatMessage, sendSearchQuery } from './utils/api';
+import { uploadPDFs, streamChatMessage, sendSearchQuery } from './utils/api';
 
 function App() {
   const [activeTab, setActiveTab] = useState('chat');
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [uploadedFiles, setUploadedFiles] = useState([]);
   const [sessionId, setSessionId] = useState(`session_${Date.now()}`);
   const [showSettings, setShowSettings] = useState(false);
@@ -62,12 +63,30 @@ function App() {
     try {
       let data;
       if (activeTab === 'chat') {
-        data = await sendChatMessage(input, sessionId, settings);
-        setMessages(prev => [...prev, {
-          role: 'assistant',
-          content: data.answer,
-          sources: data.sources
-        }]);
+        const updateLastMessage = (update) => {
+          setMessages(prev => [...prev.slice(0, -1), update(prev[prev.length - 1])]);
+        };
+
+        let started = false;
+        data = await streamChatMessage(input, sessionId, settings, (token) => {
+          if (!started) {
+            started = true;
+            setStreaming(true);
+            setMessages(prev => [...prev, { role: 'assistant', content: token }]);
+          } else {
+            updateLastMessage(msg => ({ ...msg, content: msg.content + token }));
+          }
+        });
+
+        if (started) {
+          updateLastMessage(msg => ({ ...msg, content: data.answer, sources: data.sources }));
+        } else {
+          setMessages(prev => [...prev, {
+            role: 'assistant',
+            content: data.answer,
+            sources: data.sources
+          }]);
+        }
       } else {
         data = await sendSearchQuery(input, sessionId, settings);
         setMessages(prev => [...prev, {
@@ -83,6 +102,7 @@ function App() {
       }]);
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -136,6 +156,7 @@ function App() {
             activeTab={activeTab}
             messages={messages}
             loading={loading}
+            streaming={streaming}
             input={input}
             setInput={setInput}
             handleSendMessage={handleSendMessage}
@@ -7,6 +7,7 @@ const ChatArea = ({
   activeTab,
   messages, 
   loading, 
+  streaming,
   input, 
   setInput, 
   handleSendMessage,
@@ -37,7 +38,7 @@ const ChatArea = ({
             <Message key={idx} message={msg} />
           ))}
           
-          {loading && <LoadingIndicator />}
+          {loading && !streaming && <LoadingIndicator />}
           
           <div ref={messagesEndRef} />
         </div>
@@ -50,6 +50,79 @@ export const sendChatMessage = async (query, sessionId, settings) => {
   return response.json();
 };
 
+/**
+ * Send chat message to the streaming PDF chat endpoint
+ *
+ * Calls `onToken` with each answer token as it arrives and resolves with the
+ * final payload (answer, sources, session_id, timing) from the `done` event.
+ */
+export const streamChatMessage = async (query, sessionId, settings, onToken) => {
+  const response = await fetch(`${API_BASE_URL}/pdf/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      query,
+      session_id: sessionId,
+      temperature: settings.temperature,
+      max_tokens: settings.maxTokens,
+      search_k: settings.searchK
+    }),
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error('Failed to send chat message');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+
+  const handleEvent = (raw) => {
+    let event = 'message';
+    const dataLines = [];
+    raw.split('\n').forEach(line => {
+      if (line.startsWith('event:')) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        dataLines.push(line.slice(5).trimStart());
+      }
+    });
+    if (dataLines.length === 0) return;
+
+    const data = JSON.parse(dataLines.join('\n'));
+    if (event === 'token') {
+      onToken(data.token);
+    } else if (event === 'done') {
+      result = data;
+    } else if (event === 'error') {
+      throw new Error(data.detail || 'Failed to send chat message');
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      handleEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+
+  if (buffer.trim()) {
+    handleEvent(buffer);
+  }
+  if (!result) {
+    throw new Error('Chat stream ended unexpectedly');
+  }
+
+  return result;
+};
+
 /**
  * Send search query to web search endpoint
  */